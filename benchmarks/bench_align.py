@@ -0,0 +1,79 @@
+"""Time align/distribute/match-size/grid on large selections.
+
+Run from the repository root, e.g.::
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_align.py --sizes 10000 50000
+
+Each operation runs through CanvasView._align_items on a fully selected
+scene, followed by an undo; the per-item moveBy loop it replaced is timed
+for comparison.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from PySide6 import QtWidgets  # noqa: E402
+
+from canvas_view import CanvasView  # noqa: E402
+from items import RectItem  # noqa: E402
+
+MODES = ["left", "hcenter", "bottom", "distribute_x", "match_both", "grid"]
+
+
+def populate(view: CanvasView, n: int):
+    rnd = random.Random(1)
+    items = []
+    for _ in range(n):
+        it = RectItem(rnd.uniform(0, 20000), rnd.uniform(0, 20000), rnd.uniform(10, 80), rnd.uniform(10, 80))
+        it.setData(0, "Rectangle")
+        items.append(it)
+    scene = view.scene()
+    scene.add_items(items)
+    with scene.bulk_update():
+        for it in items:
+            it.setSelected(True)
+    return items
+
+
+def per_item_left(items):
+    brs = [it.sceneBoundingRect() for it in items]
+    target = min(br.left() for br in brs)
+    for it, br in zip(items, brs):
+        it.moveBy(target - br.left(), 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    for n in args.sizes:
+        view = CanvasView()
+        items = populate(view, n)
+        scene = view.scene()
+        app.processEvents()
+        print(f"== {n} selected items ==")
+        for mode in MODES:
+            t = time.perf_counter()
+            view._align_items(items, mode)
+            app.processEvents()
+            done = time.perf_counter() - t
+            t = time.perf_counter()
+            scene.undo_stack.undo()
+            app.processEvents()
+            undone = time.perf_counter() - t
+            print(f"{mode:14s} apply {done * 1000:8.1f}ms  undo {undone * 1000:8.1f}ms")
+        t = time.perf_counter()
+        per_item_left(items)
+        app.processEvents()
+        print(f"{'moveBy loop':14s} left  {(time.perf_counter() - t) * 1000:8.1f}ms")
+        scene.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Time the Clean up searches for duplicate and hidden shapes.
+
+Run from the repository root, e.g.::
+
+    python benchmarks/bench_cleanup.py --sizes 100000 1000000
+
+Rectangles are scattered at random; a tenth of them get a copy stacked on
+top, and one opaque rectangle per thousand shapes is laid over the rest.
+The scenes are built with scene_api, so no QApplication is needed.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import numpy as np  # noqa: E402
+
+from cleanup import find_duplicates, find_hidden  # noqa: E402
+from scene_api import Scene  # noqa: E402
+
+
+def build(n: int, rng) -> Scene:
+    scene = Scene()
+    copies = n // 10
+    x = rng.uniform(0, 50000, n - copies)
+    y = rng.uniform(0, 50000, n - copies)
+    w = rng.uniform(5, 40, n - copies).round()
+    scene.add_rects(x, y, w, 20)
+    scene.add_rects(x[:copies], y[:copies], w[:copies], 20)
+    covers = scene.add_rects(
+        rng.uniform(0, 50000, n // 1000), rng.uniform(0, 50000, n // 1000), 400, 300
+    )
+    scene.set_styles(covers, fill="#ffffff")
+    return scene
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    for n in args.sizes:
+        document = build(n, rng).document
+        for label, func in (("duplicates", find_duplicates), ("hidden", find_hidden)):
+            t = time.perf_counter()
+            found = func(document)
+            print(f"{n:8d} {label:10s} {len(found):8d} found {(time.perf_counter() - t) * 1000:9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Time building, styling, saving and exporting scenes with scene_api.
+
+Run from the repository root, e.g.::
+
+    python benchmarks/bench_scene_api.py --sizes 100000 1000000
+
+Half of the shapes are rectangles and half are three-point polylines. No
+QApplication is created; the script checks that Qt was never imported.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import numpy as np  # noqa: E402
+
+from scene_api import Scene  # noqa: E402
+
+
+def timed(label: str, func):
+    t = time.perf_counter()
+    result = func()
+    print(f"{label:14s} {(time.perf_counter() - t) * 1000:9.1f}ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--export", action="store_true", help="also time export_drawsvg()")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            half = n // 2
+            print(f"== {n} shapes ==")
+            scene = Scene()
+            rects = timed("add_rects", lambda: scene.add_rects(
+                rng.uniform(0, 50000, half), rng.uniform(0, 50000, half),
+                rng.uniform(5, 40, half), rng.uniform(5, 40, half),
+            ))
+            lines = timed("add_lines", lambda: scene.add_lines(
+                rng.uniform(0, 50000, (half * 3, 2)), 3
+            ))
+            fills = np.where(rng.random(half) < 0.5, "#e53935", "#43a047")
+            timed("set_styles", lambda: scene.set_styles(rects, fill=fills, stroke_width=1.0))
+            timed("set_styles", lambda: scene.set_styles(lines, stroke="#1e88e5"))
+            path = os.path.join(tmp, "scene.dsvc")
+            timed("save", lambda: scene.save(path))
+            print(f"{'file size':14s} {os.path.getsize(path) / 1e6:9.1f}MB")
+            if args.export:
+                timed("export_drawsvg", lambda: scene.export_drawsvg(os.path.join(tmp, "scene.py")))
+    assert not any(name.startswith("PySide6") for name in sys.modules)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare scene index strategies on large scenes.
+
+Run from the repository root, e.g.::
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_scene_index.py --sizes 10000 100000
+
+For each strategy it times populating the scene, point hit-tests (itemAt),
+rubber-band sized area queries and dragging a block of items.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from PySide6 import QtCore, QtGui, QtWidgets  # noqa: E402
+
+from canvas_scene import INDEX_BSP, INDEX_NONE, CanvasScene  # noqa: E402
+from items import RectItem  # noqa: E402
+
+STRATEGIES = {
+    "bsp-auto": dict(method=INDEX_BSP),
+    "bsp-depth-10": dict(method=INDEX_BSP, bsp_depth=10),
+    "bsp+suspend": dict(method=INDEX_BSP, suspend_on_move=True),
+    "none": dict(method=INDEX_NONE),
+    "bsp+grid": dict(method=INDEX_BSP, grid=True),
+}
+
+
+def make_items(n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    side = int((n * 60 * 60) ** 0.5)
+    items = []
+    for _ in range(n):
+        it = RectItem(rnd.uniform(0, side), rnd.uniform(0, side), 40, 30)
+        it.setData(0, "Rectangle")
+        items.append(it)
+    return items, side
+
+
+def timed(fn) -> float:
+    t = time.perf_counter()
+    fn()
+    return time.perf_counter() - t
+
+
+def run(n: int, name: str, options: dict, queries: int, moved: int) -> dict:
+    items, side = make_items(n)
+    scene = CanvasScene()
+    scene.set_index_strategy(**options)
+    view = QtWidgets.QGraphicsView(scene)
+    view.resize(1000, 800)
+    rnd = random.Random(2)
+    result = {}
+    result["populate"] = timed(lambda: scene.add_items(items))
+    # The first query pays for building Qt's index (and the grid).
+    result["first query"] = timed(lambda: scene.items(QtCore.QPointF(1, 1)))
+    if scene.shape_index is not None:
+        result["first query"] += timed(
+            lambda: scene.shapes_in_path(QtGui.QPainterPath(QtCore.QPointF(1, 1)))
+        )
+
+    points = [QtCore.QPointF(rnd.uniform(0, side), rnd.uniform(0, side)) for _ in range(queries)]
+    result["itemAt x%d" % queries] = timed(
+        lambda: [scene.itemAt(p, QtGui.QTransform()) for p in points]
+    )
+
+    rects = []
+    for _ in range(queries):
+        x, y = rnd.uniform(0, side), rnd.uniform(0, side)
+        path = QtGui.QPainterPath()
+        path.addRect(QtCore.QRectF(x, y, 600, 400))
+        rects.append(path)
+    result["area x%d" % queries] = timed(lambda: [scene.shapes_in_path(p) for p in rects])
+
+    block = items[:moved]
+
+    def drag():
+        if scene.suspend_index_on_move:
+            scene.suspend_index()
+        for step in range(20):
+            for it in block:
+                it.moveBy(3, 2)
+            # A view repaint after each mouse move queries the index.
+            scene.items(QtCore.QRectF(0, 0, 1000, 800))
+        if scene.suspend_index_on_move:
+            scene.resume_index()
+        scene.items(QtCore.QPointF(1, 1))
+
+    result["drag %d x20" % moved] = timed(drag)
+    scene.clear()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--strategies", nargs="+", choices=sorted(STRATEGIES), default=list(STRATEGIES))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--moved", type=int, default=500)
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)  # noqa: F841
+    for n in args.sizes:
+        print(f"== {n} items ==")
+        for name in args.strategies:
+            result = run(n, name, STRATEGIES[name], args.queries, args.moved)
+            cols = "  ".join(f"{k} {v * 1000:8.1f}ms" for k, v in result.items())
+            print(f"{name:14s} {cols}")
+
+
+if __name__ == "__main__":
+    main()
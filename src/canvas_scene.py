@@ -0,0 +1,538 @@
+import contextlib
+
+import numpy as np
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from commands import MoveItemsCommand, UndoStack
+from constants import ITEM_KINDS, PEN_SELECTED
+from document import Document
+from find_index import FindIndex
+from item_pool import ItemPool
+from snapping import SnapSession
+from spatial_index import GridIndex
+from virtual_canvas import Virtualizer
+from zorder import ZOrder
+
+# Qt index strategies selectable with CanvasScene.set_index_strategy().
+INDEX_BSP = "bsp"
+INDEX_NONE = "none"
+# Beyond this many selected shapes no per-shape handles are shown; one box
+# around the whole selection stands in for them.
+MAX_HANDLE_SETS = 200
+
+
+class MoveTransaction:
+    """Move of many items by one shared delta, committed as a single undo step.
+
+    Each update only sets positions (no per-item snapping or handle updates),
+    so drags and nudges cost one pass over the items per event.
+    """
+
+    def __init__(self, scene, items, text: str = "Move"):
+        self._scene = scene
+        self.items = list(items)
+        self._text = text
+        self._start = np.array(
+            [(p.x(), p.y()) for p in (it.pos() for it in self.items)], dtype=float
+        ).reshape(-1, 2)
+        self._delta = (0.0, 0.0)
+
+    def start_pos(self, item) -> QtCore.QPointF:
+        x, y = self._start[self.items.index(item)]
+        return QtCore.QPointF(x, y)
+
+    def move_by(self, dx: float, dy: float) -> None:
+        """Place every item at its start position plus (dx, dy)."""
+        if (dx, dy) != self._delta:
+            self._delta = (dx, dy)
+            self._scene.set_positions(self.items, self._start + self._delta)
+
+    def commit(self, mergeable: bool = False) -> None:
+        if self._delta != (0.0, 0.0):
+            self._scene.undo_stack.push(MoveItemsCommand(
+                self._scene, self.items, self._start, self._start + self._delta,
+                self._text, mergeable,
+            ))
+
+    def cancel(self) -> None:
+        self.move_by(0.0, 0.0)
+
+
+class CanvasScene(QtWidgets.QGraphicsScene):
+    """Scene with bulk add/remove paths, an undo stack for edits, the
+    stacking order of its shapes, a columnar document mirroring them and
+    configurable spatial indexing."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Items dropped for good are kept here for the next load to reuse.
+        self.item_pool = ItemPool()
+        self.undo_stack = UndoStack(self, self.item_pool.release)
+        self.zorder = ZOrder()
+        self.document = Document()
+        self.find_index = FindIndex(self.document)
+        self._bulk_depth = 0
+        self._bulk_signals_blocked = False
+        self._index_suspended = 0
+        self._index_method = self.itemIndexMethod()
+        self._bsp_depth = 0
+        # Drop Qt's index while items are dragged; see set_index_strategy().
+        self.suspend_index_on_move = False
+        # Optional grid hash of shape bounds, refreshed lazily from the items
+        # that changed since the last query.
+        self.shape_index: GridIndex | None = None
+        self._index_dirty: set = set()
+        self._grid_for_selection = False
+        # Grid spacing for snapping; set by the view, 0 disables it.
+        self.grid_size = 0
+        # content_bounds() as of the last change, shared by all views.
+        self._content_rect = QtCore.QRectF()
+        self.snap_objects = False
+        self.snap_session: SnapSession | None = None
+        # Non-zero while geometry_batch() is active: shapes then neither snap
+        # nor refresh their handles on position changes.
+        self.geometry_batch_depth = 0
+        self._batch_signals_blocked = False
+        # Shapes whose selection changed since handles were last laid out,
+        # and the shapes currently showing handles.
+        self._selection_dirty: set = set()
+        self._handle_items: set = set()
+        self._handles_scheduled = False
+        self._selection_depth = 0
+        self._selection_signals_blocked = False
+        # Drawn in the foreground instead of the handles of a large selection.
+        self._selection_box: QtCore.QRectF | None = None
+        # Creates items only for the visible part of large drawings; see
+        # set_virtualized().
+        self.virtualizer: Virtualizer | None = None
+        # Unselected groups paint their members into a pixmap cache.
+        self.cache_groups = False
+        self.changed.connect(self._content_changed)
+
+    # --- Virtualization ---
+    def set_virtualized(self, enabled: bool) -> None:
+        """Let large drawings be loaded as document rows that get items only
+        while they are in view. Switching it off creates all items."""
+        if enabled and self.virtualizer is None:
+            self.virtualizer = Virtualizer(self)
+        elif not enabled and self.virtualizer is not None:
+            self.virtualizer.materialize_all()
+            self.virtualizer.deleteLater()
+            self.virtualizer = None
+
+    def content_bounds(self) -> QtCore.QRectF:
+        """itemsBoundingRect(), including shapes that have no item."""
+        rect = self.itemsBoundingRect()
+        if self.virtualizer is not None and self.virtualizer.row_count():
+            rect = rect.united(self.virtualizer.bounds)
+        return rect
+
+    # --- Scene rect ---
+    def _content_changed(self, _regions=None) -> None:
+        """Measure the content once per batch of changes, for every view."""
+        self._content_rect = self.content_bounds()
+        self.update_scene_rect()
+
+    def update_scene_rect(self) -> None:
+        """Fit the scene rect around the content and the visible area of
+        every view, each padded by its view's scene_padding."""
+        rect = QtCore.QRectF()
+        for view in self.views():
+            area = view.mapToScene(view.viewport().rect()).boundingRect()
+            if not self._content_rect.isNull():
+                area = area.united(self._content_rect)
+            padding = getattr(view, "scene_padding", 0)
+            rect = rect.united(area.adjusted(-padding, -padding, padding, padding))
+        if rect.isNull() or rect == self.sceneRect():
+            return
+        self.setSceneRect(rect)
+        # Ensure newly exposed areas are repainted so drag handles don't
+        # leave trails.
+        for view in self.views():
+            view.viewport().update()
+
+    # --- Index strategies ---
+    def set_index_strategy(
+        self,
+        method: str = INDEX_BSP,
+        bsp_depth: int = 0,
+        suspend_on_move: bool = False,
+        grid: bool = False,
+    ) -> None:
+        """Choose how items are indexed.
+
+        method selects Qt's index (INDEX_BSP or INDEX_NONE); bsp_depth fixes
+        the BSP tree depth, 0 lets Qt pick it from the item count.
+        suspend_on_move drops Qt's index for the duration of a drag. grid
+        keeps a GridIndex of shape bounds for area selection.
+        """
+        if method == INDEX_NONE:
+            qt_method = QtWidgets.QGraphicsScene.ItemIndexMethod.NoIndex
+        else:
+            qt_method = QtWidgets.QGraphicsScene.ItemIndexMethod.BspTreeIndex
+        self._index_method = qt_method
+        if not self._index_suspended:
+            self.setItemIndexMethod(qt_method)
+            if method != INDEX_NONE:
+                self.setBspTreeDepth(bsp_depth)
+        self._bsp_depth = bsp_depth
+        self.suspend_index_on_move = suspend_on_move
+        self._grid_for_selection = grid
+        self._update_shape_index()
+
+    def set_object_snapping(self, enabled: bool) -> None:
+        """Snap dragged shapes to the edges, centres and line vertices of
+        nearby shapes; this keeps the grid index up to date."""
+        self.snap_objects = enabled
+        self._update_shape_index()
+
+    def _update_shape_index(self) -> None:
+        wanted = self._grid_for_selection or self.snap_objects
+        if wanted and self.shape_index is None:
+            self.shape_index = GridIndex()
+            self._index_dirty = set(self.zorder.items())
+        elif not wanted:
+            self.shape_index = None
+            self._index_dirty = set()
+
+    def begin_snap(self, items, tolerance: float) -> None:
+        """Start object snapping for a drag of items (tolerance in scene units)."""
+        if self.snap_objects and items:
+            self.snap_session = SnapSession(
+                self._refresh_shape_index(), items, tolerance
+            )
+
+    def end_snap(self) -> None:
+        self.snap_session = None
+
+    def suspend_index(self) -> None:
+        """Switch Qt's index off until the matching resume_index()."""
+        if self._index_suspended == 0:
+            self._index_method = self.itemIndexMethod()
+            self.setItemIndexMethod(QtWidgets.QGraphicsScene.ItemIndexMethod.NoIndex)
+        self._index_suspended += 1
+
+    def resume_index(self) -> None:
+        """Undo one suspend_index(); the last one rebuilds the index once."""
+        self._index_suspended -= 1
+        if self._index_suspended == 0:
+            self.setItemIndexMethod(self._index_method)
+            if self._index_method == QtWidgets.QGraphicsScene.ItemIndexMethod.BspTreeIndex:
+                self.setBspTreeDepth(self._bsp_depth)
+                # Build the tree now. Until then every item sits in Qt's
+                # unindexed list, and each move of an item searches it
+                # linearly.
+                self.itemAt(QtCore.QPointF(), QtGui.QTransform())
+
+    def shape_changed(self, item: QtWidgets.QGraphicsItem) -> None:
+        """Note that item's bounds may have changed (called by the shapes).
+        Group members are indexed through their group."""
+        if self.shape_index is not None and item.parentItem() is None:
+            self._index_dirty.add(item)
+
+    def _refresh_shape_index(self) -> GridIndex:
+        index = self.shape_index
+        for it in self._index_dirty:
+            if it.scene() is self:
+                r = it.sceneBoundingRect()
+                index.insert(it, (r.left(), r.top(), r.right(), r.bottom()))
+            else:
+                index.remove(it)
+        self._index_dirty.clear()
+        return index
+
+    def shapes_in_path(
+        self,
+        path: QtGui.QPainterPath,
+        mode: QtCore.Qt.ItemSelectionMode = QtCore.Qt.ItemSelectionMode.IntersectsItemShape,
+    ) -> list[QtWidgets.QGraphicsItem]:
+        """Shapes hit by path (in scene coordinates). Candidates come from
+        the grid index when it is enabled, else from the document's bounds."""
+        r = path.boundingRect()
+        box = (r.left(), r.top(), r.right(), r.bottom())
+        if self.shape_index is not None:
+            candidates = self._refresh_shape_index().query(box)
+        else:
+            # Rows without an item (virtualized off-screen shapes) are skipped.
+            document = self.document
+            candidates = [
+                it for it in map(document.item_at_row, document.rows_in_box(box).tolist())
+                if it is not None
+            ]
+        Mode = QtCore.Qt.ItemSelectionMode
+        hits = []
+        for it in candidates:
+            if mode in (Mode.IntersectsItemBoundingRect, Mode.ContainsItemBoundingRect):
+                outline = QtGui.QPainterPath()
+                outline.addPolygon(it.mapToScene(it.boundingRect()))
+            else:
+                outline = it.mapToScene(it.shape())
+            if mode in (Mode.ContainsItemShape, Mode.ContainsItemBoundingRect):
+                hit = path.contains(outline)
+            else:
+                hit = path.intersects(outline)
+            if hit:
+                hits.append(it)
+        return hits
+
+    @contextlib.contextmanager
+    def bulk_update(self):
+        """Suspend the index and scene signals for a batch of changes.
+
+        The index is rebuilt once when the outermost batch ends. Qt queues
+        the scene's own repaint/changed processing, so views receive a single
+        changed() notification for the whole batch.
+        """
+        if self._bulk_depth == 0:
+            self.suspend_index()
+            self._bulk_signals_blocked = self.blockSignals(True)
+        self._bulk_depth += 1
+        try:
+            yield
+        finally:
+            self._bulk_depth -= 1
+            if self._bulk_depth == 0:
+                self.blockSignals(self._bulk_signals_blocked)
+                self.resume_index()
+                self.selectionChanged.emit()
+                self.sync_handles()
+                self.update()
+
+    @contextlib.contextmanager
+    def geometry_batch(self):
+        """Apply computed positions and sizes as given, without snapping or
+        handle updates, and with scene signals blocked.
+
+        Unlike bulk_update() this keeps the index: moving items only updates
+        their own entries, which is cheaper than a full rebuild. Shapes do
+        not write through to the document meanwhile; the caller writes the
+        changed columns afterwards.
+        """
+        if self.geometry_batch_depth == 0:
+            self._batch_signals_blocked = self.blockSignals(True)
+        self.geometry_batch_depth += 1
+        try:
+            yield
+        finally:
+            self.geometry_batch_depth -= 1
+            if self.geometry_batch_depth == 0:
+                self.blockSignals(self._batch_signals_blocked)
+                self.update()
+
+    def set_positions(self, items, positions) -> None:
+        """Move items to positions (rows of x, y) in one batch."""
+        with self.geometry_batch():
+            for it, (x, y) in zip(items, positions.tolist()):
+                it.setPos(x, y)
+        self.document.set_positions(items, positions)
+        if self._selection_box is not None:
+            self._update_selection_box()
+
+    def begin_move(self, items, text: str = "Move") -> MoveTransaction:
+        return MoveTransaction(self, items, text)
+
+    def move_items(self, items, dx: float, dy: float, text: str = "Move", mergeable: bool = False) -> None:
+        """Move items by (dx, dy) as one undoable step."""
+        move = MoveTransaction(self, items, text)
+        move.move_by(dx, dy)
+        move.commit(mergeable)
+
+    def set_sizes(self, items, sizes) -> None:
+        """Resize shapes to sizes (rows of width, height) via set_size()."""
+        with self.geometry_batch():
+            for it, (w, h) in zip(items, sizes.tolist()):
+                it.set_size(w, h)
+                if it in self._handle_items:
+                    it.update_handles()
+        document = self.document
+        for it in items:
+            document.write(it, it.shape_row())
+        if self._selection_box is not None:
+            self._update_selection_box()
+
+    # --- Selection ---
+    @contextlib.contextmanager
+    def selection_batch(self):
+        """Change the selection of many items at once.
+
+        selectionChanged is emitted once at the end and handles are shown or
+        hidden in a single pass afterwards.
+        """
+        if self._selection_depth == 0:
+            self._selection_signals_blocked = self.blockSignals(True)
+        self._selection_depth += 1
+        try:
+            yield
+        finally:
+            self._selection_depth -= 1
+            if self._selection_depth == 0:
+                self.blockSignals(self._selection_signals_blocked)
+                self.selectionChanged.emit()
+                self.sync_handles()
+
+    def select_items(self, items, add: bool = False) -> None:
+        """Select items, replacing the current selection unless add is set."""
+        with self.selection_batch():
+            if not add:
+                self.clearSelection()
+            for it in items:
+                it.setSelected(True)
+
+    def select_all(self) -> None:
+        self.select_items(self.zorder.items())
+
+    def select_rows(self, rows) -> None:
+        """Select the shapes of document rows, e.g. find results. Virtualized
+        shapes get an item first, which is retired again once it is
+        deselected and out of view."""
+        document = self.document
+        items = []
+        unbound = []
+        for row in rows.tolist():
+            item = document.item_at_row(row)
+            if item is None:
+                unbound.append(row)
+            else:
+                items.append(item)
+        if unbound:
+            items += self.virtualizer.materialize_rows(unbound, for_good=False)
+        self.select_items(items)
+
+    def note_selection_change(self, item: QtWidgets.QGraphicsItem) -> None:
+        """Called by shapes whose selection changed; their handles are
+        updated together once the current batch or event is done."""
+        self._selection_dirty.add(item)
+        if self._selection_depth or self._handles_scheduled:
+            return
+        self._handles_scheduled = True
+        QtCore.QTimer.singleShot(0, self.sync_handles)
+
+    def sync_handles(self) -> None:
+        """Show handles on the selected shapes, or a single selection box
+        when more than MAX_HANDLE_SETS are selected."""
+        self._handles_scheduled = False
+        dirty, self._selection_dirty = self._selection_dirty, set()
+        selected = [it for it in self.selectedItems() if hasattr(it, "show_handles")]
+        wanted = set(selected) if len(selected) <= MAX_HANDLE_SETS else set()
+        for it in (self._handle_items | dirty) - wanted:
+            it.hide_handles()
+        for it in wanted - self._handle_items:
+            it.show_handles()
+        self._handle_items = wanted
+        if len(selected) > MAX_HANDLE_SETS:
+            self._update_selection_box(selected)
+        elif self._selection_box is not None:
+            self._set_selection_box(None)
+
+    def _update_selection_box(self, selected=None) -> None:
+        if selected is None:
+            selected = self.selectedItems()
+        bounds = QtCore.QRectF()
+        for it in selected:
+            bounds = bounds.united(it.sceneBoundingRect())
+        self._set_selection_box(bounds)
+
+    def _set_selection_box(self, bounds: QtCore.QRectF | None) -> None:
+        dirty = QtCore.QRectF()
+        for r in (self._selection_box, bounds):
+            if r is not None:
+                dirty = dirty.united(r)
+        self._selection_box = bounds
+        margin = PEN_SELECTED.widthF()
+        self.invalidate(
+            dirty.adjusted(-margin, -margin, margin, margin),
+            QtWidgets.QGraphicsScene.SceneLayer.ForegroundLayer,
+        )
+
+    def drawForeground(self, painter: QtGui.QPainter, rect: QtCore.QRectF):
+        super().drawForeground(painter, rect)
+        if self._selection_box is not None:
+            painter.setPen(PEN_SELECTED)
+            painter.setBrush(QtCore.Qt.BrushStyle.NoBrush)
+            painter.drawRect(self._selection_box)
+
+    def addItem(self, item: QtWidgets.QGraphicsItem) -> None:
+        super().addItem(item)
+        if item.data(0) in ITEM_KINDS:
+            self._register(item)
+
+    def removeItem(self, item: QtWidgets.QGraphicsItem) -> None:
+        if item.data(0) in ITEM_KINDS:
+            self._unregister(item)
+        super().removeItem(item)
+
+    def _register(self, item: QtWidgets.QGraphicsItem) -> None:
+        """Track a top-level shape or group in the z-order, the document
+        and the grid index."""
+        self.zorder.insert(item)
+        self.shape_changed(item)
+        if hasattr(item, "shape_row"):
+            self.document.add(item, item.shape_row())
+        if hasattr(item, "set_cache_rendering"):
+            item.set_cache_rendering(self.cache_groups)
+
+    def _unregister(self, item: QtWidgets.QGraphicsItem) -> None:
+        self.zorder.discard(item)
+        self.document.remove(item)
+        self._handle_items.discard(item)
+        if self.shape_index is not None:
+            self._index_dirty.discard(item)
+            self.shape_index.remove(item)
+
+    # --- Groups ---
+    def attach_group(self, group, members, states) -> None:
+        """Put top-level members into group, each at its (x, y, rotation, z)
+        in group coordinates, and add the group in their place."""
+        with self.bulk_update(), self.geometry_batch():
+            for it in members:
+                if it.scene() is self:
+                    self._unregister(it)
+            for it, (x, y, rotation, z) in zip(members, states):
+                group.add_member(it, x, y, rotation, z)
+            group.update_bounds()
+            self.addItem(group)
+
+    def detach_group(self, group, members, states) -> None:
+        """Remove group and make its members top-level items again, each at
+        its (x, y, rotation, z) in scene coordinates."""
+        with self.bulk_update(), self.geometry_batch():
+            self.removeItem(group)
+            for it, (x, y, rotation, z) in zip(members, states):
+                group.remove_member(it)
+                it.setPos(x, y)
+                it.setRotation(rotation)
+                it.setZValue(z)
+                self.addItem(it)
+
+    def set_group_caching(self, enabled: bool) -> None:
+        """Let unselected groups render from a pixmap cache."""
+        self.cache_groups = enabled
+        for it in self.zorder.items():
+            if hasattr(it, "set_cache_rendering"):
+                it.set_cache_rendering(enabled)
+
+    def add_items(self, items) -> None:
+        """Add many top-level items in one pass, keeping their given order."""
+        with self.bulk_update():
+            for it in items:
+                if it.scene() is not self:
+                    self.addItem(it)
+
+    def remove_items(self, items) -> None:
+        """Remove many items in one pass; they stay alive for undo."""
+        with self.bulk_update():
+            for it in items:
+                if it.scene() is self:
+                    self.removeItem(it)
+
+    def discard_items(self, items) -> None:
+        """Remove items for good, outside undo, and pool them for reuse."""
+        self.remove_items(items)
+        self.item_pool.release(items)
+
+    def top_level_items(self) -> list[QtWidgets.QGraphicsItem]:
+        """Items without a parent, bottom of the stacking order first."""
+        return [
+            it for it in self.items(QtCore.Qt.SortOrder.AscendingOrder)
+            if it.parentItem() is None
+        ]
@@ -1,11 +1,41 @@
+import numpy as np
 from PySide6 import QtCore, QtGui, QtWidgets
 
-from constants import PALETTE_MIME, SHAPES, DEFAULTS
-from items import RectItem, EllipseItem, LineItem, TextItem, TriangleItem
+from canvas_scene import CanvasScene
+from clipboard import ShapesMimeData, build_items, pack_items
+from commands import (
+    AddItemsCommand, GroupItemsCommand, MoveItemsCommand, RemoveItemsCommand,
+    ResizeItemsCommand, UngroupCommand,
+)
+from constants import ITEM_KINDS, OVERLAY_Z, PALETTE_MIME, SHAPES, SHAPES_MIME, DEFAULTS
+from items import (
+    RectItem, EllipseItem, GroupItem, LineItem, TextEditor, TextItem, TriangleItem,
+    SharedGeometry, group_root, snap_to_grid,
+)
+from layout_ops import align_offsets, distribute_offsets, grid_offsets, matched_sizes
+from export_drawsvg import snapshot_items
+from find_index import style_value
+from guides import GUIDE_TOLERANCE_PX, AlignmentGuides
+from snapping import SNAP_TOLERANCE_PX
+from shape_data import unpack_rows
 
 # Minimum mouse movement (in scene coordinates) required before
 # showing duplicates when Ctrl+dragging selected items.
 DUPLICATE_DRAG_THRESHOLD = 10.0
+GHOST_PEN = QtGui.QPen(QtGui.QColor("#1e88e5"), 0, QtCore.Qt.PenStyle.DashLine)
+GHOST_BRUSH = QtGui.QColor(30, 136, 229, 40)
+NUDGE_KEYS = {
+    QtCore.Qt.Key.Key_Left: (-1, 0),
+    QtCore.Qt.Key.Key_Right: (1, 0),
+    QtCore.Qt.Key.Key_Up: (0, -1),
+    QtCore.Qt.Key.Key_Down: (0, 1),
+}
+AREA_PEN = QtGui.QPen(QtGui.QColor("#1e88e5"), 0, QtCore.Qt.PenStyle.DashLine)
+AREA_BRUSH = QtGui.QColor(30, 136, 229, 30)
+GUIDE_PEN = QtGui.QPen(QtGui.QColor("#e91e63"), 0)
+SPACING_PEN = QtGui.QPen(QtGui.QColor("#ff9800"), 0, QtCore.Qt.PenStyle.DashLine)
+# Grid lines closer than this on screen are thinned out.
+MIN_GRID_SPACING_PX = 6.0
 
 
 class CornerRadiusDialog(QtWidgets.QDialog):
@@ -38,7 +68,15 @@ class CornerRadiusDialog(QtWidgets.QDialog):
 
 
 class CanvasView(QtWidgets.QGraphicsView):
-    def __init__(self, parent=None):
+    """Editable view of a CanvasScene.
+
+    Several views can show the same scene, e.g. at different zoom levels:
+    pass the scene of an existing view. Each view keeps its own pan, zoom,
+    background cache and drag state; the scene does the model work once
+    for all of them.
+    """
+
+    def __init__(self, scene: CanvasScene | None = None, parent=None):
         super().__init__(parent)
         self.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing, True)
         self.setDragMode(QtWidgets.QGraphicsView.DragMode.RubberBandDrag)
@@ -48,74 +86,106 @@ class CanvasView(QtWidgets.QGraphicsView):
             QtWidgets.QGraphicsView.ViewportUpdateMode.FullViewportUpdate
         )
 
-        scene = QtWidgets.QGraphicsScene(self)
-        self._scene_padding = 200
-        scene.setSceneRect(
-            -self._scene_padding,
-            -self._scene_padding,
-            self._scene_padding * 2,
-            self._scene_padding * 2,
-        )
-        scene.changed.connect(self._update_scene_rect)
+        # The grid only changes with the grid size, so each view keeps its
+        # background as a pixmap and redraws just the exposed parts.
+        self.setCacheMode(QtWidgets.QGraphicsView.CacheModeFlag.CacheBackground)
+        # Margin kept around the content and the visible area when scrolling.
+        self.scene_padding = 200
+        if scene is None:
+            scene = CanvasScene(self)
+            scene.setSceneRect(
+                -self.scene_padding,
+                -self.scene_padding,
+                self.scene_padding * 2,
+                self.scene_padding * 2,
+            )
+            scene.grid_size = 20
         self.setScene(scene)
         self.setBackgroundBrush(QtGui.QColor("#fafafa"))
-        self._grid_size = 20
 
         self._panning = False
         self._pan_start = QtCore.QPointF()
         self._prev_drag_mode = self.dragMode()
         self._right_button_pressed = False
         self._suppress_context_menu = False
+        self._area_item = None
+        self._index_move = False
+        self._move = None
+        self.show_guides = False
+        self._guides = None
+        self._guide_items = []
+        self._guide_lines = []
+        self._spacing_lines = []
+        # Last payload copied from this view and how often it was pasted.
+        self._clip_payload: bytes | None = None
+        self._paste_count = 0
+
+    @property
+    def _grid_size(self) -> int:
+        return self.scene().grid_size
+
+    @_grid_size.setter
+    def _grid_size(self, size: int) -> None:
+        scene = self.scene()
+        scene.grid_size = size
+        for view in scene.views():
+            view.resetCachedContent()
 
     def clear_canvas(self):
-        """Remove all items from the scene."""
-        self.scene().clear()
-        self._update_scene_rect()
+        """Remove all items from the scene (undoable)."""
+        scene = self.scene()
+        items = scene.top_level_items()
+        virtualizer = scene.virtualizer
+        if virtualizer is not None and virtualizer.row_count():
+            # Shapes without an item are not covered by undo commands.
+            virtualizer.clear()
+            # Clear the history first: it would pool the discarded items again.
+            scene.undo_stack.clear()
+            scene.discard_items(items)
+        elif items:
+            scene.undo_stack.push(RemoveItemsCommand(scene, items, "Clear canvas"))
+        scene.update_scene_rect()
+
+    def level_of_detail(self) -> float:
+        """Screen pixels per scene unit at this view's zoom."""
+        return QtWidgets.QStyleOptionGraphicsItem.levelOfDetailFromTransform(self.transform())
 
     def drawBackground(self, painter: QtGui.QPainter, rect: QtCore.QRectF):
         super().drawBackground(painter, rect)
-        left = int(rect.left()) - int(rect.left()) % self._grid_size
-        top = int(rect.top()) - int(rect.top()) % self._grid_size
+        # Zoomed out, only every 2nd, 4th, ... grid line is drawn.
+        step = self._grid_size
+        lod = self.level_of_detail()
+        while step * lod < MIN_GRID_SPACING_PX:
+            step *= 2
+        left = int(rect.left()) - int(rect.left()) % step
+        top = int(rect.top()) - int(rect.top()) % step
         lines = []
         x = left
         while x < rect.right():
             lines.append(QtCore.QLineF(x, rect.top(), x, rect.bottom()))
-            x += self._grid_size
+            x += step
         y = top
         while y < rect.bottom():
             lines.append(QtCore.QLineF(rect.left(), y, rect.right(), y))
-            y += self._grid_size
+            y += step
         pen = QtGui.QPen(QtGui.QColor("#D0D0D0"))
         painter.setPen(pen)
         painter.drawLines(lines)
 
-    def _update_scene_rect(self):
-        scene = self.scene()
-        padding = self._scene_padding
-        items_rect = scene.itemsBoundingRect()
-        viewport_rect = self.mapToScene(self.viewport().rect()).boundingRect()
-        if items_rect.isNull():
-            combined = viewport_rect
-        else:
-            combined = items_rect.united(viewport_rect)
-        if combined.isNull():
-            new_rect = QtCore.QRectF(
-                -padding,
-                -padding,
-                padding * 2,
-                padding * 2,
-            )
-        else:
-            new_rect = combined.adjusted(-padding, -padding, padding, padding)
-        if new_rect != scene.sceneRect():
-            scene.setSceneRect(new_rect)
-            # ensure newly exposed areas are repainted so drag handles don't leave trails
-            self.viewport().update()
-
     def resizeEvent(self, event: QtGui.QResizeEvent):
         """Ensure scene rect grows with the view."""
         super().resizeEvent(event)
-        self._update_scene_rect()
+        self.scene().update_scene_rect()
+        self._visible_area_changed()
+
+    def scrollContentsBy(self, dx: int, dy: int):
+        super().scrollContentsBy(dx, dy)
+        self._visible_area_changed()
+
+    def _visible_area_changed(self):
+        virtualizer = self.scene().virtualizer
+        if virtualizer is not None:
+            virtualizer.schedule()
 
     # --- Drag and drop from the palette ---
     def dragEnterEvent(self, event: QtGui.QDragEnterEvent):
@@ -173,7 +243,7 @@ class CanvasView(QtWidgets.QGraphicsView):
         item.setData(0, shape)  # for export
         self.scene().addItem(item)
         item.setSelected(True)
-        self._update_scene_rect()
+        self.scene().update_scene_rect()
         event.acceptProposedAction()
 
     # --- Duplicate selected items with Ctrl+drag ---
@@ -195,11 +265,13 @@ class CanvasView(QtWidgets.QGraphicsView):
             return
         if event.button() == QtCore.Qt.MouseButton.LeftButton:
             mods = event.modifiers()
+            item = self.itemAt(event.pos())
+            if item is not None:
+                item = group_root(item)
             if mods & (
                 QtCore.Qt.KeyboardModifier.ControlModifier
                 | QtCore.Qt.KeyboardModifier.ShiftModifier
             ):
-                item = self.itemAt(event.pos())
                 if item:
                     if (
                         mods & QtCore.Qt.KeyboardModifier.ControlModifier
@@ -210,8 +282,7 @@ class CanvasView(QtWidgets.QGraphicsView):
                             # Store initial state but postpone cloning until the mouse
                             # has moved far enough to avoid duplicates appearing in place.
                             self._dup_source = list(selected)
-                            self._dup_items = None
-                            self._dup_orig = None
+                            self._dup_ghost = None
                             self._dup_start = self.mapToScene(
                                 event.position().toPoint()
                             )
@@ -221,7 +292,97 @@ class CanvasView(QtWidgets.QGraphicsView):
                         item.setSelected(True)
                         event.accept()
                         return
+            scene = self.scene()
+            if item is None:
+                lasso = bool(mods & QtCore.Qt.KeyboardModifier.AltModifier)
+                if lasso or scene.shape_index is not None:
+                    self._start_area_select(event, lasso)
+                    event.accept()
+                    return
+            elif scene.suspend_index_on_move and not self._index_move:
+                scene.suspend_index()
+                self._index_move = True
         super().mousePressEvent(event)
+        if event.button() == QtCore.Qt.MouseButton.LeftButton:
+            self._begin_move(event)
+            self._begin_drag_aids()
+
+    def _begin_move(self, event: QtGui.QMouseEvent):
+        """Take over dragging of the selection from Qt, which would move and
+        snap every item separately on each mouse event."""
+        scene = self.scene()
+        grabber = scene.mouseGrabberItem()
+        if grabber is None or grabber.data(0) not in ITEM_KINDS or not grabber.isSelected():
+            return
+        movable = QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsMovable
+        if not grabber.flags() & movable:
+            return
+        if isinstance(grabber, TextItem) and grabber.is_editing():
+            return
+        items = [
+            it for it in scene.selectedItems()
+            if it.data(0) in ITEM_KINDS and it.flags() & movable
+        ]
+        self._move = scene.begin_move(items)
+        self._move_anchor = grabber
+        self._move_anchor_start = self._move.start_pos(grabber)
+        self._move_press = self.mapToScene(event.position().toPoint())
+
+    def _update_move(self, event: QtGui.QMouseEvent):
+        delta = self.mapToScene(event.position().toPoint()) - self._move_press
+        target = self._move_anchor_start + delta
+        if not event.modifiers() & QtCore.Qt.KeyboardModifier.AltModifier:
+            # Snap the grabbed item once; the rest of the selection follows.
+            target = snap_to_grid(self._move_anchor, target)
+        delta = target - self._move_anchor_start
+        self._move.move_by(delta.x(), delta.y())
+
+    def _begin_drag_aids(self):
+        """Set up object snapping and alignment guides for the drag or
+        resize that just grabbed the mouse."""
+        scene = self.scene()
+        if scene.mouseGrabberItem() is None:
+            return
+        if not (scene.snap_objects or self.show_guides):
+            return
+        moving = [it for it in scene.selectedItems() if it.data(0) in ITEM_KINDS]
+        scene.begin_snap(moving, SNAP_TOLERANCE_PX / self.transform().m11())
+        if self.show_guides and moving:
+            skip = set(moving)
+            self._guides = AlignmentGuides(
+                it.sceneBoundingRect() for it in scene.zorder.items() if it not in skip
+            )
+            self._guide_items = moving
+
+    def set_show_guides(self, enabled: bool):
+        """Show alignment and equal-spacing guides while dragging or resizing."""
+        self.show_guides = enabled
+
+    def _update_guides(self):
+        bounds = QtCore.QRectF()
+        for it in self._guide_items:
+            bounds = bounds.united(it.sceneBoundingRect())
+        tol = GUIDE_TOLERANCE_PX / self.transform().m11()
+        self._guide_lines = self._guides.alignment_lines(bounds, tol)
+        self._spacing_lines = self._guides.spacing_lines(bounds, tol)
+        self.viewport().update()
+
+    def _end_guides(self):
+        if self._guides is not None:
+            self._guides = None
+            self._guide_items = []
+            self._guide_lines = []
+            self._spacing_lines = []
+            self.viewport().update()
+
+    def drawForeground(self, painter: QtGui.QPainter, rect: QtCore.QRectF):
+        super().drawForeground(painter, rect)
+        if self._guide_lines:
+            painter.setPen(GUIDE_PEN)
+            painter.drawLines(self._guide_lines)
+        if self._spacing_lines:
+            painter.setPen(SPACING_PEN)
+            painter.drawLines(self._spacing_lines)
 
     def mouseMoveEvent(self, event: QtGui.QMouseEvent):
         if self._panning or self._right_button_pressed:
@@ -244,30 +405,32 @@ class CanvasView(QtWidgets.QGraphicsView):
                 vbar.setValue(vbar.value() - int(delta.y()))
                 event.accept()
                 return
+        if self._area_item is not None:
+            self._update_area_select(self.mapToScene(event.position().toPoint()))
+            event.accept()
+            return
+        if self._move is not None:
+            self._update_move(event)
+            if self._guides is not None:
+                self._update_guides()
+            event.accept()
+            return
         if getattr(self, "_dup_source", None):
             pos = self.mapToScene(event.position().toPoint())
             delta = pos - self._dup_start
-            if self._dup_items is None:
-                # Only create clones after surpassing the threshold.
+            if self._dup_ghost is None:
+                # Only show the preview after surpassing the threshold.
                 if delta.manhattanLength() < DUPLICATE_DRAG_THRESHOLD:
                     event.accept()
                     return
-                self._dup_items = []
-                self._dup_orig = []
-                for it in self._dup_source:
-                    clone = self._clone_item(it)
-                    if clone:
-                        self.scene().addItem(clone)
-                        self._dup_items.append(clone)
-                        self._dup_orig.append(clone.pos())
-                self.scene().clearSelection()
-                for it in self._dup_items:
-                    it.setSelected(True)
-            for it, start in zip(self._dup_items, self._dup_orig):
-                it.setPos(start + delta)
+                self._dup_ghost = self._make_ghost(self._dup_source)
+                self.scene().addItem(self._dup_ghost)
+            self._dup_ghost.setPos(self._snap_delta(delta))
             event.accept()
             return
         super().mouseMoveEvent(event)
+        if self._guides is not None:
+            self._update_guides()
 
     def mouseReleaseEvent(self, event: QtGui.QMouseEvent):
         if event.button() == QtCore.Qt.MouseButton.RightButton:
@@ -294,10 +457,15 @@ class CanvasView(QtWidgets.QGraphicsView):
             event.accept()
             return
         if event.button() == QtCore.Qt.MouseButton.LeftButton:
-            if getattr(self, "_dup_items", None):
-                self._dup_items = []
-                self._dup_orig = []
-                self._dup_source = []
+            self.scene().end_snap()
+            self._end_guides()
+            if self._move is not None:
+                self._move.commit()
+                self._move = None
+            if getattr(self, "_dup_ghost", None):
+                self._finish_duplicate(
+                    self.mapToScene(event.position().toPoint()) - self._dup_start
+                )
                 event.accept()
                 return
             if getattr(self, "_dup_source", None):
@@ -305,8 +473,112 @@ class CanvasView(QtWidgets.QGraphicsView):
                 self._dup_source = []
                 event.accept()
                 return
+            if self._area_item is not None:
+                self._finish_area_select()
+                event.accept()
+                return
+            if self._index_move:
+                super().mouseReleaseEvent(event)
+                self._index_move = False
+                self.scene().resume_index()
+                return
         super().mouseReleaseEvent(event)
 
+    # --- Rubber-band and lasso selection through the scene's shape index ---
+    def _start_area_select(self, event: QtGui.QMouseEvent, lasso: bool):
+        scene = self.scene()
+        origin = self.mapToScene(event.position().toPoint())
+        self._area_origin = origin
+        self._area_points = [origin]
+        self._area_lasso = lasso
+        if event.modifiers() & QtCore.Qt.KeyboardModifier.ControlModifier:
+            self._area_keep = set(scene.selectedItems())
+        else:
+            self._area_keep = set()
+            scene.clearSelection()
+        self._area_hits = set()
+        self._area_item = QtWidgets.QGraphicsPathItem()
+        self._area_item.setPen(AREA_PEN)
+        self._area_item.setBrush(AREA_BRUSH)
+        self._area_item.setZValue(OVERLAY_Z)
+        scene.addItem(self._area_item)
+
+    def _update_area_select(self, pos: QtCore.QPointF):
+        path = QtGui.QPainterPath()
+        if self._area_lasso:
+            self._area_points.append(pos)
+            path.addPolygon(QtGui.QPolygonF(self._area_points))
+            path.closeSubpath()
+        else:
+            path.addRect(QtCore.QRectF(self._area_origin, pos).normalized())
+        self._area_item.setPath(path)
+        # Only items entering or leaving the area change selection state.
+        scene = self.scene()
+        hits = set(scene.shapes_in_path(path))
+        keep = self._area_keep
+        with scene.selection_batch():
+            for it in self._area_hits - hits:
+                if it not in keep:
+                    it.setSelected(False)
+            for it in hits - self._area_hits:
+                it.setSelected(True)
+        self._area_hits = hits
+
+    def _finish_area_select(self):
+        self.scene().removeItem(self._area_item)
+        self._area_item = None
+        self._area_hits = set()
+        self._area_keep = set()
+
+    def _make_ghost(self, items) -> QtWidgets.QGraphicsPathItem:
+        """Outline of items as one cached path item, used as drag preview."""
+        path = QtGui.QPainterPath()
+        for it in items:
+            path.addPath(it.mapToScene(it.shape()))
+        ghost = QtWidgets.QGraphicsPathItem(path)
+        ghost.setPen(GHOST_PEN)
+        ghost.setBrush(GHOST_BRUSH)
+        ghost.setZValue(OVERLAY_Z)
+        ghost.setCacheMode(QtWidgets.QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        return ghost
+
+    def _snap_delta(self, delta: QtCore.QPointF) -> QtCore.QPointF:
+        """Round delta to the grid, like the clones will be on drop."""
+        mods = QtWidgets.QApplication.keyboardModifiers()
+        if mods & QtCore.Qt.KeyboardModifier.AltModifier:
+            return delta
+        size = self._grid_size
+        return QtCore.QPointF(
+            round(delta.x() / size) * size, round(delta.y() / size) * size
+        )
+
+    def _drop_ghost(self):
+        if getattr(self, "_dup_ghost", None) is not None:
+            self.scene().removeItem(self._dup_ghost)
+        self._dup_ghost = None
+        self._dup_source = []
+
+    def _finish_duplicate(self, delta: QtCore.QPointF):
+        """Build all clones in one batch and select them."""
+        source = self._dup_source
+        self._drop_ghost()
+        # The offset the ghost showed; every clone moves by exactly this, so
+        # the copies keep their spacing instead of each snapping on its own.
+        delta = self._snap_delta(delta)
+        clones = []
+        for it in source:
+            clone = self._clone_item(it)
+            if clone:
+                # Placed before it has a scene, where setPos() does not snap.
+                clone.setPos(it.pos() + delta)
+                clones.append(clone)
+        if not clones:
+            return
+        scene = self.scene()
+        scene.undo_stack.push(AddItemsCommand(scene, clones, "Duplicate"))
+        with scene.bulk_update():
+            scene.select_items(clones)
+
     def _clone_item(self, item: QtWidgets.QGraphicsItem):
         if isinstance(item, RectItem):
             r = item.rect()
@@ -319,8 +591,7 @@ class CanvasView(QtWidgets.QGraphicsView):
             clone.setBrush(item.brush())
             clone.setPen(item.pen())
         elif isinstance(item, TriangleItem):
-            br = item.boundingRect()
-            clone = TriangleItem(item.x(), item.y(), br.width(), br.height())
+            clone = TriangleItem(item.x(), item.y(), item._w, item._h)
             clone.setBrush(item.brush())
             clone.setPen(item.pen())
         elif isinstance(item, LineItem):
@@ -340,10 +611,24 @@ class CanvasView(QtWidgets.QGraphicsView):
             clone.setDefaultTextColor(item.defaultTextColor())
             br = clone.boundingRect()
             clone.setTransformOriginPoint(br.width() / 2.0, br.height() / 2.0)
+        elif isinstance(item, GroupItem):
+            clone = GroupItem(item.x(), item.y())
+            for member in item.members():
+                copy = self._clone_item(member)
+                if copy is not None:
+                    clone.add_member(copy, member.x(), member.y(), member.rotation(), member.zValue())
+            clone.setTransformOriginPoint(item.transformOriginPoint())
+            clone.setRotation(item.rotation())
+            clone.update_bounds()
+            return clone
         else:
             return None
         clone.setRotation(item.rotation())
         clone.setData(0, item.data(0))
+        # Link original and clone so export can emit them as one symbol.
+        shared = item.shared_geometry or SharedGeometry()
+        item.shared_geometry = shared
+        clone.shared_geometry = shared
         return clone
 
     # --- Mouse wheel zooming and scrolling ---
@@ -363,56 +648,216 @@ class CanvasView(QtWidgets.QGraphicsView):
             factor = 1.2 if delta > 0 else 1 / 1.2
             self.scale(factor, factor)
             self.setTransformationAnchor(anchor)
-            self._update_scene_rect()
+            self.scene().update_scene_rect()
+            self._visible_area_changed()
             event.accept()
             return
         super().wheelEvent(event)
 
-    # --- Keyboard shortcut to delete selected items ---
+    # --- Keyboard shortcuts: delete, nudge, cancel drags ---
     def keyPressEvent(self, event: QtGui.QKeyEvent):
-        if event.key() == QtCore.Qt.Key.Key_Delete:
-            selected = self.scene().selectedItems()
+        if event.key() == QtCore.Qt.Key.Key_Escape and getattr(self, "_dup_source", None):
+            # Cancel a Ctrl+drag duplication; nothing has been built yet.
+            self._drop_ghost()
+            event.accept()
+            return
+        if event.key() == QtCore.Qt.Key.Key_Escape and self._move is not None:
+            # Cancel a drag: put the items back, record nothing.
+            self._move.cancel()
+            self._move = None
+            event.accept()
+            return
+        if event.key() in NUDGE_KEYS and self._nudge(event):
+            event.accept()
+            return
+        if event.key() == QtCore.Qt.Key.Key_Delete and not isinstance(
+            self.scene().focusItem(), TextEditor
+        ):
+            scene = self.scene()
+            selected = scene.selectedItems()
             if selected:
-                for it in selected:
-                    self.scene().removeItem(it)
+                scene.undo_stack.push(RemoveItemsCommand(scene, selected))
                 event.accept()
                 return
         super().keyPressEvent(event)
 
+    def _nudge(self, event: QtGui.QKeyEvent) -> bool:
+        """Move the selection with the arrow keys: 1 unit, or one grid step
+        with Shift. Repeated nudges merge into one undo step."""
+        scene = self.scene()
+        if isinstance(scene.focusItem(), TextEditor):
+            return False
+        items = [it for it in scene.selectedItems() if it.data(0) in ITEM_KINDS]
+        if not items or self._move is not None:
+            return False
+        step = self._grid_size if event.modifiers() & QtCore.Qt.KeyboardModifier.ShiftModifier else 1
+        dx, dy = NUDGE_KEYS[event.key()]
+        scene.move_items(items, dx * step, dy * step, "Nudge", mergeable=True)
+        return True
+
+    # --- Groups ---
+    def group_selection(self):
+        """Group the selected shapes and groups into a new group (undoable)."""
+        scene = self.scene()
+        items = [it for it in scene.selectedItems() if it.data(0) in ITEM_KINDS]
+        if len(items) < 2:
+            return
+        group = GroupItem()
+        scene.undo_stack.push(GroupItemsCommand(scene, items, group))
+        scene.select_items([group])
+
+    def ungroup_selection(self, groups=None):
+        """Dissolve the selected groups, or the given ones, and select their
+        members (undoable)."""
+        scene = self.scene()
+        if groups is None:
+            groups = scene.selectedItems()
+        groups = [it for it in groups if isinstance(it, GroupItem)]
+        if not groups:
+            return
+        members = []
+        scene.undo_stack.beginMacro("Ungroup")
+        for group in groups:
+            members.extend(group.members())
+            scene.undo_stack.push(UngroupCommand(scene, group))
+        scene.undo_stack.endMacro()
+        scene.select_items(members)
+
+    # --- Clipboard ---
+    def _selected_top_level(self) -> list[QtWidgets.QGraphicsItem]:
+        items = [
+            it for it in self.scene().selectedItems()
+            if it.data(0) in ITEM_KINDS and it.parentItem() is None
+        ]
+        items.sort(key=lambda it: it.zValue())
+        return items
+
+    def copy_selection(self) -> bool:
+        """Put the selected objects on the clipboard; returns False if
+        nothing is selected."""
+        scene = self.scene()
+        items = self._selected_top_level()
+        if not items or isinstance(scene.focusItem(), TextEditor):
+            return False
+        rect = QtCore.QRectF()
+        for it in items:
+            rect = rect.united(it.sceneBoundingRect())
+        payload = pack_items(scene.document, items)
+        snapshot = snapshot_items(scene, items, rect)
+        QtWidgets.QApplication.clipboard().setMimeData(ShapesMimeData(payload, snapshot))
+        self._clip_payload = payload
+        self._paste_count = 0
+        return True
+
+    def cut_selection(self):
+        """Copy the selected objects and remove them (undoable)."""
+        if self.copy_selection():
+            scene = self.scene()
+            scene.undo_stack.push(RemoveItemsCommand(scene, self._selected_top_level(), "Cut"))
+
+    def paste(self):
+        """Add the objects on the clipboard on top of the drawing and select
+        them (undoable). Pasting what was copied here offsets each paste by
+        one grid step."""
+        scene = self.scene()
+        md = QtWidgets.QApplication.clipboard().mimeData()
+        if md is None or not md.hasFormat(SHAPES_MIME) or isinstance(scene.focusItem(), TextEditor):
+            return
+        payload = bytes(md.data(SHAPES_MIME))
+        try:
+            rows, parents = unpack_rows(payload)
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Paste", str(e))
+            return
+        if payload == self._clip_payload:
+            self._paste_count += 1
+            offset = self._grid_size * self._paste_count
+            rows = [
+                row._replace(x=row.x + offset, y=row.y + offset) if parent < 0 else row
+                for row, parent in zip(rows, parents)
+            ]
+        items = build_items(rows, parents, scene.item_pool)
+        for it, z in zip(items, scene.zorder.top_keys(len(items))):
+            it.setZValue(z)
+        scene.undo_stack.push(AddItemsCommand(scene, items, "Paste"))
+        scene.select_items(items)
+
+    # --- Find ---
+    def select_same(self, item: QtWidgets.QGraphicsItem, field: str) -> None:
+        """Select every shape with the same type ("kind"), fill or stroke
+        colour as item."""
+        scene = self.scene()
+        document = scene.document
+        row = document.row(document.row_of(item))
+        if field == "kind":
+            rows = scene.find_index.find(kind=row.shape)
+        else:
+            rows = scene.find_index.find(**{field: style_value(field, row.style)})
+        scene.select_rows(rows)
+
+    # --- Clean up ---
+    def remove_rows(self, rows, text: str = "Delete") -> None:
+        """Remove the shapes of document rows (undoable)."""
+        scene = self.scene()
+        document = scene.document
+        items = []
+        unbound = []
+        for row in rows.tolist():
+            item = document.item_at_row(row)
+            if item is None:
+                unbound.append(row)
+            else:
+                items.append(item)
+        if unbound:
+            # Undo commands hold items, so shapes without one get an item
+            # first.
+            items += scene.virtualizer.materialize_rows(unbound)
+        if items:
+            scene.undo_stack.push(RemoveItemsCommand(scene, items, text))
+        scene.update_scene_rect()
+
     # --- Alignment helpers ---
     def _align_items(self, items, mode: str):
-        brs = [it.sceneBoundingRect() for it in items]
+        """Align, distribute, match sizes or snap items to the grid.
+
+        Targets are computed for all items at once on the document's
+        columns and applied in one batch, as a single undo step.
+        """
+        scene = self.scene()
+        items = [it for it in items if it.data(0) in ITEM_KINDS]
+        if mode.startswith("match_"):
+            items = [it for it in items if hasattr(it, "set_size")]
+            if len(items) < 2:
+                return
+            rows = scene.document.rows_of(items)
+            sizes = np.column_stack((scene.document.w[rows], scene.document.h[rows]))
+            new_sizes = matched_sizes(sizes, mode[len("match_"):])
+            if not np.array_equal(sizes, new_sizes):
+                scene.undo_stack.push(
+                    ResizeItemsCommand(scene, items, sizes, new_sizes, "Match size")
+                )
+            return
+        if not items:
+            return
+        document = scene.document
+        rows = document.rows_of(items)
+        positions = np.column_stack((document.x[rows], document.y[rows]))
         if mode == "grid":
-            size = self._grid_size
-            for it, br in zip(items, brs):
-                new_x = round(br.left() / size) * size
-                new_y = round(br.top() / size) * size
-                it.moveBy(new_x - br.left(), new_y - br.top())
+            offsets = grid_offsets(positions, self._grid_size)
+            text = "Snap to grid"
+        else:
+            bounds = document.scene_bounds(rows)
+            if mode.startswith("distribute_"):
+                offsets = distribute_offsets(bounds, mode[-1])
+                text = "Distribute"
+            else:
+                offsets = align_offsets(bounds, mode)
+                text = "Align"
+        if not offsets.any():
             return
-        if mode == "left":
-            target = min(br.left() for br in brs)
-            for it, br in zip(items, brs):
-                it.moveBy(target - br.left(), 0)
-        elif mode == "hcenter":
-            target = sum(br.center().x() for br in brs) / len(brs)
-            for it, br in zip(items, brs):
-                it.moveBy(target - br.center().x(), 0)
-        elif mode == "right":
-            target = max(br.right() for br in brs)
-            for it, br in zip(items, brs):
-                it.moveBy(target - br.right(), 0)
-        elif mode == "top":
-            target = min(br.top() for br in brs)
-            for it, br in zip(items, brs):
-                it.moveBy(0, target - br.top())
-        elif mode == "vcenter":
-            target = sum(br.center().y() for br in brs) / len(brs)
-            for it, br in zip(items, brs):
-                it.moveBy(0, target - br.center().y())
-        elif mode == "bottom":
-            target = max(br.bottom() for br in brs)
-            for it, br in zip(items, brs):
-                it.moveBy(0, target - br.bottom())
+        scene.undo_stack.push(
+            MoveItemsCommand(scene, items, positions, positions + offsets, text)
+        )
 
     # --- Context menu for adjusting colors and line width ---
     def contextMenuEvent(self, event: QtGui.QContextMenuEvent):
@@ -422,12 +867,15 @@ class CanvasView(QtWidgets.QGraphicsView):
             return
         pos = event.pos()
         item = self.itemAt(pos)
+        if item is not None:
+            item = group_root(item)
         if not item:
             menu = QtWidgets.QMenu(self)
             reset_act = menu.addAction("Reset zoom")
             action = menu.exec(event.globalPos())
             if action is reset_act:
                 self.resetTransform()
+                self._visible_area_changed()
             else:
                 super().contextMenuEvent(event)
             return
@@ -436,6 +884,7 @@ class CanvasView(QtWidgets.QGraphicsView):
         fill_act = opacity_act = stroke_act = width_act = None
         color_act = size_act = corner_act = None
         start_arrow_act = end_arrow_act = None
+        group_act = ungroup_act = None
 
         selected = self.scene().selectedItems()
         align_actions = {}
@@ -448,8 +897,17 @@ class CanvasView(QtWidgets.QGraphicsView):
             align_actions[align_menu.addAction("Top")] = "top"
             align_actions[align_menu.addAction("Middle")] = "vcenter"
             align_actions[align_menu.addAction("Bottom")] = "bottom"
+            if len(selected) >= 3:
+                align_menu.addSeparator()
+                align_actions[align_menu.addAction("Distribute horizontally")] = "distribute_x"
+                align_actions[align_menu.addAction("Distribute vertically")] = "distribute_y"
+            align_menu.addSeparator()
+            align_actions[align_menu.addAction("Match width")] = "match_width"
+            align_actions[align_menu.addAction("Match height")] = "match_height"
+            align_actions[align_menu.addAction("Match size")] = "match_both"
             align_menu.addSeparator()
             align_actions[align_menu.addAction("Snap to grid")] = "grid"
+            group_act = menu.addAction("Group")
             menu.addSeparator()
         if isinstance(item, RectItem):
             fill_act = menu.addAction("Set fill color…")
@@ -483,9 +941,19 @@ class CanvasView(QtWidgets.QGraphicsView):
         elif isinstance(item, TextItem):
             color_act = menu.addAction("Set text color…")
             size_act = menu.addAction("Set font size…")
+        elif isinstance(item, GroupItem):
+            ungroup_act = menu.addAction("Ungroup")
         else:
             stroke_act = menu.addAction("Set stroke color…")
             width_act = menu.addAction("Set stroke width…")
+        same_actions = {}
+        if item in self.scene().document:
+            same_menu = menu.addMenu("Select same")
+            if fill_act or color_act:
+                same_actions[same_menu.addAction("Text color" if color_act else "Fill color")] = "fill"
+            if stroke_act:
+                same_actions[same_menu.addAction("Stroke color")] = "stroke"
+            same_actions[same_menu.addAction("Type")] = "kind"
         menu.addSeparator()
         back1_act = menu.addAction("Send backward")
         front1_act = menu.addAction("Bring forward")
@@ -499,6 +967,12 @@ class CanvasView(QtWidgets.QGraphicsView):
 
         if action in align_actions:
             self._align_items(selected, align_actions[action])
+        elif action in same_actions:
+            self.select_same(item, same_actions[action])
+        elif action is group_act:
+            self.group_selection()
+        elif action is ungroup_act:
+            self.ungroup_selection([item] if item not in selected else None)
         elif action is fill_act:
             brush = item.brush()
             color = QtWidgets.QColorDialog.getColor(brush.color(), self, "Fill color")
@@ -549,19 +1023,15 @@ class CanvasView(QtWidgets.QGraphicsView):
                 br = item.boundingRect()
                 item.setTransformOriginPoint(br.width() / 2.0, br.height() / 2.0)
         elif action in (back1_act, front1_act, back_act, front_act):
-            scene = self.scene()
-            items = [it for it in scene.items() if it.data(0) in SHAPES]
-            items.sort(key=lambda it: it.zValue())
-            idx = items.index(item)
-            if action == back1_act and idx > 0:
-                items[idx - 1], items[idx] = items[idx], items[idx - 1]
-            elif action == front1_act and idx < len(items) - 1:
-                items[idx + 1], items[idx] = items[idx], items[idx + 1]
+            zorder = self.scene().zorder
+            targets = selected if item in selected else [item]
+            if action == back1_act:
+                zorder.send_backward(targets)
+            elif action == front1_act:
+                zorder.bring_forward(targets)
             elif action == back_act:
-                items.insert(0, items.pop(idx))
+                zorder.send_to_back(targets)
             elif action == front_act:
-                items.append(items.pop(idx))
-            for z, it in enumerate(items):
-                it.setZValue(z)
+                zorder.bring_to_front(targets)
         else:
             super().contextMenuEvent(event)
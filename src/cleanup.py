@@ -0,0 +1,200 @@
+import math
+
+import numpy as np
+
+from document import FREE
+
+# Like document, this module stays free of Qt.
+
+# Geometry differences up to this many units (and rotations up to this many
+# degrees) still count as the same shape.
+DEFAULT_TOLERANCE = 0.5
+# Group rows only hold the group's frame; their members are not rows, so two
+# groups can't be compared.
+_GROUP = "Group"
+# Shapes whose fill can hide what lies below: convex, so a box is inside
+# one when its four corners are.
+_OCCLUDERS = ("Rectangle", "Ellipse", "Circle")
+# The occluder grid gets coarser until occluders cover at most this many
+# cells per shape in the drawing.
+_CELLS_PER_SHAPE = 4
+
+
+def _group_ids(*columns) -> np.ndarray:
+    """One small integer per distinct combination of the integer columns."""
+    key = np.zeros(len(columns[0]), dtype=np.int64)
+    for column in columns:
+        _, column = np.unique(column, return_inverse=True)
+        key = np.unique(key * (int(column.max(initial=0)) + 1) + column.reshape(-1), return_inverse=True)[1]
+        key = key.reshape(-1)
+    return key
+
+
+def _join(order: np.ndarray, sorted_keys: np.ndarray, query: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Index pairs (i, j) with query[i] == keys[j], given the argsort order
+    of keys and the sorted keys."""
+    lo = np.searchsorted(sorted_keys, query, side="left")
+    hi = np.searchsorted(sorted_keys, query, side="right")
+    counts = hi - lo
+    left = np.repeat(np.arange(len(query)), counts)
+    # Position of each pair within its query's run of matches.
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return left, order[np.repeat(lo, counts) + offsets]
+
+
+def find_duplicates(document, tolerance: float = DEFAULT_TOLERANCE) -> np.ndarray:
+    """Live rows with a near-identical shape stacked above them.
+
+    Shapes match when they have the same type, style, arrow heads, text and
+    number of vertices, and their position, size, transform origin, corner
+    radii, rotation and vertices differ by at most tolerance. The topmost
+    shape of each stack is kept, so removing the returned rows leaves one
+    copy of each.
+
+    Rows are hashed into a grid of at least twice the tolerance by their
+    rotation pivot, and only rows of the same fingerprint in neighbouring
+    cells are compared, which keeps the work near-linear.
+    """
+    rows = document.live_rows()
+    if _GROUP in document.kinds:
+        rows = rows[document.kind[rows] != document.kinds.index(_GROUP)]
+    if len(rows) < 2:
+        return rows[:0]
+    texts = document.text
+    text_ids: dict[str, int] = {}
+    text_id = np.fromiter((text_ids.setdefault(texts[r], len(text_ids)) for r in rows.tolist()), dtype=np.int64)
+    fingerprint = _group_ids(
+        document.kind[rows], document.style[rows], document.flags[rows], document.pts_len[rows], text_id
+    )
+    px = document.x[rows] + document.ox[rows]
+    py = document.y[rows] + document.oy[rows]
+    # Cells of at least 2 * tolerance, coarser on huge drawings so that
+    # fingerprint and cell fit in one int64 key. One spare cell on each
+    # side serves the neighbour lookups.
+    side = math.isqrt((1 << 62) // (int(fingerprint.max()) + 1)) - 3
+    extent = max(float(np.ptp(px)), float(np.ptp(py)))
+    cell = max(2.0 * tolerance, extent / side, 1e-9)
+    cx = ((px - px.min()) // cell).astype(np.int64) + 1
+    cy = ((py - py.min()) // cell).astype(np.int64) + 1
+    stride = int(cy.max()) + 2
+    base = fingerprint * ((int(cx.max()) + 2) * stride)
+    keys = base + cx * stride + cy
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    left = []
+    right = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            # Queries in key order keep the binary searches cache-friendly.
+            i, j = _join(order, sorted_keys, sorted_keys + (dx * stride + dy))
+            i = order[i]
+            above = document.z[rows[j]] > document.z[rows[i]]
+            left.append(i[above])
+            right.append(j[above])
+    a = rows[np.concatenate(left)]
+    b = rows[np.concatenate(right)]
+    close = np.ones(len(a), dtype=bool)
+    for name in ("x", "y", "w", "h", "ox", "oy", "rx", "ry"):
+        column = getattr(document, name)
+        close &= np.abs(column[a] - column[b]) <= tolerance
+    turn = np.abs(np.mod(document.rotation[a] - document.rotation[b] + 180.0, 360.0) - 180.0)
+    close &= turn <= tolerance
+    a = a[close]
+    b = b[close]
+    # Vertices, one pass per vertex count.
+    close = np.ones(len(a), dtype=bool)
+    lengths = document.pts_len[a]
+    for length in np.unique(lengths[lengths > 0]).tolist():
+        pick = np.flatnonzero(lengths == length)
+        span = np.arange(length)
+        pa = document.points[document.pts_start[a[pick]][:, None] + span]
+        pb = document.points[document.pts_start[b[pick]][:, None] + span]
+        close[pick] = np.abs(pa - pb).max(axis=1) <= tolerance
+    return np.unique(a[close])
+
+
+def find_hidden(document) -> np.ndarray:
+    """Live rows whose bounds lie entirely inside the opaque fill of a
+    rectangle, ellipse or circle stacked above them.
+
+    Occluders are hashed into a grid over their bounds; a shape is only
+    tested against the occluders registered in the cell of its top-left
+    corner, since any shape covering it must cover that corner. Rotated
+    occluders and rounded corners are handled exactly; shapes inside
+    groups neither hide nor count as hidden.
+    """
+    rows = document.live_rows()
+    if not len(rows):
+        return rows
+    styles = document.styles.styles
+    opaque_styles = np.array([s[0] is not None and s[1] >= 1.0 for s in styles], dtype=bool)
+    occluder_kinds = [document.kinds.index(k) for k in _OCCLUDERS if k in document.kinds]
+    occluders = rows[
+        np.isin(document.kind[rows], occluder_kinds) & opaque_styles[document.style[rows]]
+    ]
+    if not len(occluders):
+        return rows[:0]
+    bounds = document.scene_bounds()
+    boxes = bounds[rows]
+    covers = bounds[occluders]
+    origin = boxes[:, :2].min(axis=0)
+    # Start from the typical shape size and coarsen until the occluders
+    # cover a bounded number of cells.
+    cell = max(float(np.median(np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]))), 1e-6)
+    while True:
+        c0 = ((covers[:, :2] - origin) // cell).astype(np.int64)
+        c1 = ((covers[:, 2:] - origin) // cell).astype(np.int64)
+        spans = c1 - c0 + 1
+        counts = spans[:, 0] * spans[:, 1]
+        if counts.sum() <= _CELLS_PER_SHAPE * len(rows) + len(occluders):
+            break
+        cell *= 2.0
+    # Every (cell, occluder) pair, the cell as one integer key.
+    owner = np.repeat(np.arange(len(occluders)), counts)
+    k = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    span_y = spans[owner, 1]
+    gx = c0[owner, 0] + k // span_y
+    gy = c0[owner, 1] + k % span_y
+    width = int(max(c1[:, 1].max(), 0)) + 2
+    corner = ((boxes[:, :2] - origin) // cell).astype(np.int64)
+    inside_grid = corner[:, 1] < width
+    keys = gx * width + gy
+    order = np.argsort(keys)
+    i, j = _join(order, keys[order], np.where(inside_grid, corner[:, 0] * width + corner[:, 1], -1))
+    shape = rows[i]
+    cover = occluders[owner[j]]
+    above = document.z[cover] > document.z[shape]
+    shape = shape[above]
+    cover = cover[above]
+    i = i[above]
+    # Corners of the shape's box in the occluder's local coordinates.
+    rad = np.radians(document.rotation[cover])
+    c = np.cos(rad)
+    s = np.sin(rad)
+    ox = document.ox[cover]
+    oy = document.oy[cover]
+    pivot_x = document.x[cover] + ox
+    pivot_y = document.y[cover] + oy
+    w = document.w[cover]
+    h = document.h[cover]
+    rect_kind = document.kinds.index("Rectangle") if "Rectangle" in document.kinds else FREE
+    rounded = document.kind[cover] == rect_kind
+    # Corner radii; an ellipse is a box rounded all the way, and Qt clamps
+    # larger radii the same way.
+    rx = np.where(rounded, np.minimum(document.rx[cover], w / 2.0), w / 2.0)
+    ry = np.where(rounded, np.minimum(document.ry[cover], h / 2.0), h / 2.0)
+    hidden = np.ones(len(cover), dtype=bool)
+    for qx, qy in ((0, 1), (2, 1), (0, 3), (2, 3)):
+        dx = boxes[i, qx] - pivot_x
+        dy = boxes[i, qy] - pivot_y
+        lx = ox + c * dx + s * dy
+        ly = oy - s * dx + c * dy
+        hidden &= (lx >= 0.0) & (lx <= w) & (ly >= 0.0) & (ly <= h)
+        # Distance into the corner arc, in radii.
+        ex = np.maximum(np.abs(lx - w / 2.0) - (w / 2.0 - rx), 0.0)
+        ey = np.maximum(np.abs(ly - h / 2.0) - (h / 2.0 - ry), 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ex = np.where(ex > 0.0, ex / rx, 0.0)
+            ey = np.where(ey > 0.0, ey / ry, 0.0)
+        hidden &= ex * ex + ey * ey <= 1.0
+    return np.unique(shape[hidden])
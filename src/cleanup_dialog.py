@@ -0,0 +1,79 @@
+import time
+
+import numpy as np
+from PySide6 import QtWidgets
+
+from cleanup import DEFAULT_TOLERANCE, find_duplicates, find_hidden
+
+
+class CleanupDialog(QtWidgets.QDialog):
+    """Finds duplicate and fully hidden shapes and selects or removes them."""
+
+    def __init__(self, view, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Clean up")
+        self._view = view
+        self._rows = np.zeros(0, dtype=np.int64)
+
+        layout = QtWidgets.QFormLayout(self)
+
+        self.duplicates = QtWidgets.QCheckBox("Duplicate shapes")
+        self.duplicates.setChecked(True)
+        self.duplicates.toggled.connect(self.scan)
+        layout.addRow(self.duplicates)
+
+        self.tolerance = QtWidgets.QDoubleSpinBox()
+        self.tolerance.setRange(0.0, 10.0)
+        self.tolerance.setDecimals(2)
+        self.tolerance.setSingleStep(0.1)
+        self.tolerance.setValue(DEFAULT_TOLERANCE)
+        self.tolerance.setToolTip("Largest difference in position, size or rotation")
+        self.tolerance.valueChanged.connect(self.scan)
+        self.duplicates.toggled.connect(self.tolerance.setEnabled)
+        layout.addRow("Tolerance", self.tolerance)
+
+        self.hidden = QtWidgets.QCheckBox("Shapes hidden behind opaque shapes")
+        self.hidden.setChecked(True)
+        self.hidden.toggled.connect(self.scan)
+        layout.addRow(self.hidden)
+
+        self.result_label = QtWidgets.QLabel()
+        layout.addRow(self.result_label)
+
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close)
+        self.select_btn = buttons.addButton("Select", QtWidgets.QDialogButtonBox.ActionRole)
+        self.remove_btn = buttons.addButton("Remove", QtWidgets.QDialogButtonBox.DestructiveRole)
+        self.select_btn.clicked.connect(self.select)
+        self.remove_btn.clicked.connect(self.remove)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+        self.scan()
+
+    def scan(self) -> None:
+        """Look for the checked kinds of redundant shapes."""
+        document = self._view.scene().document
+        t = time.perf_counter()
+        duplicates = hidden = np.zeros(0, dtype=np.int64)
+        if self.duplicates.isChecked():
+            duplicates = find_duplicates(document, self.tolerance.value())
+        if self.hidden.isChecked():
+            hidden = find_hidden(document)
+        self._rows = np.union1d(duplicates, hidden)
+        ms = (time.perf_counter() - t) * 1000.0
+        self.result_label.setText(
+            f"{len(duplicates)} duplicates, {len(hidden)} hidden shapes ({ms:.0f} ms)"
+        )
+        self.select_btn.setEnabled(bool(len(self._rows)))
+        self.remove_btn.setEnabled(bool(len(self._rows)))
+
+    def select(self) -> None:
+        self._view.scene().select_rows(self._rows)
+        self.accept()
+
+    def remove(self) -> None:
+        self._view.remove_rows(self._rows, "Clean up")
+        self.accept()
+
+
+def clean_up(view, parent: QtWidgets.QWidget | None = None) -> None:
+    CleanupDialog(view, parent).exec()
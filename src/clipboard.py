@@ -0,0 +1,101 @@
+from PySide6 import QtCore, QtWidgets
+
+from constants import GROUP, SHAPES_MIME
+from document import ShapeRow
+from drawsvg_code import ExportSnapshot, generate_drawsvg_code
+from items import GroupItem
+from shape_data import pack_rows
+
+
+def _member_rows(tops) -> tuple[list[ShapeRow], list[int]]:
+    """Rows and parent indices of the members of the groups among tops."""
+    rows: list[ShapeRow] = []
+    parents: list[int] = []
+    queue = [(i, it) for i, it in enumerate(tops) if isinstance(it, GroupItem)]
+    n = len(tops)
+    while queue:
+        index, group = queue.pop(0)
+        for member in group.members():
+            if isinstance(member, GroupItem):
+                queue.append((n + len(rows), member))
+            rows.append(member.shape_row())
+            parents.append(index)
+    return rows, parents
+
+
+def pack_items(document, tops) -> bytes:
+    """Serialise top-level items, given bottom first, with their group
+    members."""
+    members, member_parents = _member_rows(tops)
+    return pack_rows(document, document.rows_of(tops), members, member_parents)
+
+
+def build_items(rows, parents, pool) -> list:
+    """Create the items described by shape_data.unpack_rows() output,
+    taking shapes from pool; returns the top-level ones."""
+    items = []
+    members: dict[int, list] = {}
+    for i, (row, parent) in enumerate(zip(rows, parents)):
+        if row.shape == GROUP:
+            item = GroupItem(row.x, row.y)
+            item.setTransformOriginPoint(row.ox, row.oy)
+            item.setRotation(row.rotation)
+            item.setZValue(row.z)
+        else:
+            item = pool.acquire_row(row)
+        items.append(item)
+        if parent >= 0:
+            members.setdefault(parent, []).append(i)
+    # Members always come after their group, so inner groups are filled
+    # first and the outer ones see their final bounds.
+    for index in sorted(members, reverse=True):
+        group = items[index]
+        for i in members[index]:
+            row = rows[i]
+            group.add_member(items[i], row.x, row.y, row.rotation, row.z)
+        group.update_bounds()
+    return [it for it, parent in zip(items, parents) if parent < 0]
+
+
+class ShapesMimeData(QtCore.QMimeData):
+    """Copied shapes in the binary format plus their drawsvg code as text.
+
+    The code is only generated when an application asks for the text, from
+    a snapshot taken at copy time.
+    """
+
+    def __init__(self, payload: bytes, snapshot: ExportSnapshot):
+        super().__init__()
+        self.setData(SHAPES_MIME, payload)
+        self._snapshot = snapshot
+        self._code: str | None = None
+
+    def formats(self):
+        return super().formats() + ["text/plain"]
+
+    def hasFormat(self, mime_type):
+        return mime_type == "text/plain" or super().hasFormat(mime_type)
+
+    def retrieveData(self, mime_type, preferred_type):
+        if mime_type == "text/plain":
+            if self._code is None:
+                self._code = generate_drawsvg_code(self._snapshot)
+            return self._code
+        return super().retrieveData(mime_type, preferred_type)
+
+    def settled(self) -> QtCore.QMimeData:
+        """A plain copy with the text generated, which the clipboard can
+        keep after this application's Python objects are gone."""
+        md = QtCore.QMimeData()
+        md.setData(SHAPES_MIME, self.data(SHAPES_MIME))
+        md.setText(self.retrieveData("text/plain", None))
+        return md
+
+
+def settle_clipboard() -> None:
+    """Swap copied shapes on the clipboard for a plain copy, before the
+    application quits."""
+    clipboard = QtWidgets.QApplication.clipboard()
+    md = clipboard.mimeData()
+    if isinstance(md, ShapesMimeData):
+        clipboard.setMimeData(md.settled())
@@ -0,0 +1,214 @@
+from PySide6 import QtCore, QtGui
+
+# QUndoCommand.id() shared by moves that may be merged, e.g. repeated nudges.
+MERGEABLE_MOVE_ID = 1
+
+
+def _held_items(commands) -> list:
+    """Items kept alive by commands and their child commands."""
+    items = []
+    for cmd in commands:
+        held = getattr(cmd, "held_items", None)
+        if held is not None:
+            items.extend(held())
+        items.extend(_held_items(cmd.child(i) for i in range(cmd.childCount())))
+    return items
+
+
+class UndoStack(QtGui.QUndoStack):
+    """QUndoStack that hands the items of the commands it drops to
+    `discarded`.
+
+    Commands are dropped when the stack is cleared and when a push or a new
+    macro replaces the undone ones; items of theirs that are not in a scene
+    are then referenced by nothing else.
+    """
+
+    def __init__(self, parent=None, discarded=None):
+        super().__init__(parent)
+        self._discarded = discarded
+        self._macro_depth = 0
+
+    def _undone_items(self) -> list:
+        if self._macro_depth:
+            return []
+        return _held_items(self.command(i) for i in range(self.index(), self.count()))
+
+    def _discard(self, items) -> None:
+        if items and self._discarded is not None:
+            # An item held by several commands is handed over once.
+            self._discarded([it for it in dict.fromkeys(items) if it.scene() is None])
+
+    def push(self, cmd):
+        dropped = self._undone_items()
+        super().push(cmd)
+        self._discard(dropped)
+
+    def beginMacro(self, text):
+        dropped = self._undone_items()
+        self._macro_depth += 1
+        super().beginMacro(text)
+        self._discard(dropped)
+
+    def endMacro(self):
+        super().endMacro()
+        self._macro_depth -= 1
+
+    def clear(self):
+        dropped = _held_items(self.command(i) for i in range(self.count()))
+        super().clear()
+        self._discard(dropped)
+
+
+class AddItemsCommand(QtGui.QUndoCommand):
+    """Undoable insertion of a batch of items."""
+
+    def __init__(self, scene, items, text: str = "Add"):
+        super().__init__(text)
+        self._scene = scene
+        self._items = list(items)
+
+    def held_items(self):
+        return self._items
+
+    def redo(self):
+        self._scene.add_items(self._items)
+
+    def undo(self):
+        self._scene.remove_items(self._items)
+
+
+class RemoveItemsCommand(QtGui.QUndoCommand):
+    """Undoable removal of a batch of items.
+
+    The command keeps the removed items alive, so undo re-adds the very same
+    objects instead of rebuilding them.
+    """
+
+    def __init__(self, scene, items, text: str = "Delete"):
+        super().__init__(text)
+        self._scene = scene
+        # Re-adding bottom-most first keeps the relative stacking order.
+        self._items = sorted(items, key=lambda it: it.zValue())
+
+    def held_items(self):
+        return self._items
+
+    def redo(self):
+        self._scene.remove_items(self._items)
+
+    def undo(self):
+        self._scene.add_items(self._items)
+
+
+class MoveItemsCommand(QtGui.QUndoCommand):
+    """Undoable move of a batch of items; positions are (n, 2) arrays.
+
+    Consecutive mergeable moves of the same items collapse into one step.
+    """
+
+    def __init__(
+        self, scene, items, old_positions, new_positions,
+        text: str = "Move", mergeable: bool = False,
+    ):
+        super().__init__(text)
+        self._scene = scene
+        self._items = list(items)
+        self._old = old_positions
+        self._new = new_positions
+        self._mergeable = mergeable
+
+    def id(self):
+        return MERGEABLE_MOVE_ID if self._mergeable else -1
+
+    def mergeWith(self, other):
+        if other._items != self._items:
+            return False
+        self._new = other._new
+        return True
+
+    def redo(self):
+        self._scene.set_positions(self._items, self._new)
+
+    def undo(self):
+        self._scene.set_positions(self._items, self._old)
+
+
+class ResizeItemsCommand(QtGui.QUndoCommand):
+    """Undoable resize of a batch of shapes; sizes are (n, 2) arrays of
+    width and height."""
+
+    def __init__(self, scene, items, old_sizes, new_sizes, text: str = "Resize"):
+        super().__init__(text)
+        self._scene = scene
+        self._items = list(items)
+        self._old = old_sizes
+        self._new = new_sizes
+
+    def redo(self):
+        self._scene.set_sizes(self._items, self._new)
+
+    def undo(self):
+        self._scene.set_sizes(self._items, self._old)
+
+
+class GroupItemsCommand(QtGui.QUndoCommand):
+    """Undoable grouping of top-level shapes into group.
+
+    The group is placed at the top-left of the shapes' bounds and takes the
+    stacking position of the topmost one. Both the scene and the group
+    placement of every member are kept, so undo and redo restore them
+    exactly.
+    """
+
+    def __init__(self, scene, items, group, text: str = "Group"):
+        super().__init__(text)
+        self._scene = scene
+        self._group = group
+        self._items = sorted(items, key=lambda it: it.zValue())
+        bounds = QtCore.QRectF()
+        for it in self._items:
+            bounds = bounds.united(it.sceneBoundingRect())
+        gx, gy = bounds.left(), bounds.top()
+        group.setPos(gx, gy)
+        group.setZValue(self._items[-1].zValue())
+        self._scene_states = [
+            (it.x(), it.y(), it.rotation(), it.zValue()) for it in self._items
+        ]
+        self._group_states = [
+            (x - gx, y - gy, rotation, z) for x, y, rotation, z in self._scene_states
+        ]
+
+    def redo(self):
+        self._scene.attach_group(self._group, self._items, self._group_states)
+
+    def undo(self):
+        self._scene.detach_group(self._group, self._items, self._scene_states)
+
+
+class UngroupCommand(QtGui.QUndoCommand):
+    """Undoable dissolving of a group; its members keep their place on the
+    canvas and take the group's position in the stacking order."""
+
+    def __init__(self, scene, group, text: str = "Ungroup"):
+        super().__init__(text)
+        self._scene = scene
+        self._group = group
+        self._items = group.members()
+        self._group_states = [
+            (it.x(), it.y(), it.rotation(), it.zValue()) for it in self._items
+        ]
+        keys = scene.zorder.slot_keys(group, len(self._items))
+        self._scene_states = []
+        for it, z in zip(self._items, keys):
+            origin = it.transformOriginPoint()
+            pos = group.mapToScene(it.pos() + origin) - origin
+            self._scene_states.append(
+                (pos.x(), pos.y(), it.rotation() + group.rotation(), z)
+            )
+
+    def redo(self):
+        self._scene.detach_group(self._group, self._items, self._scene_states)
+
+    def undo(self):
+        self._scene.attach_group(self._group, self._items, self._group_states)
@@ -1,6 +1,10 @@
 from PySide6 import QtCore, QtGui
 
 PALETTE_MIME = "application/x-drawsvg-shape"
+# Copied shapes in the binary format of shape_data.py.
+SHAPES_MIME = "application/x-drawsvg-canvas-shapes"
+# Above any shape key the z-order can hand out.
+OVERLAY_Z = 1e15
 SHAPES = (
     "Rectangle",
     "Ellipse",
@@ -10,6 +14,10 @@ SHAPES = (
     "Arrow",
     "Text",
 )
+# Containers made with Edit → Group; not offered in the palette.
+GROUP = "Group"
+# Everything the canvas tracks as a top-level object.
+ITEM_KINDS = SHAPES + (GROUP,)
 
 DEFAULTS = {
     "Rectangle": (160.0, 100.0),   # w, h
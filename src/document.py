@@ -0,0 +1,518 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from shape_records import ShapeRecord
+
+# Like shape_records, this module stays free of Qt: the columns can be read
+# and processed without touching the canvas items.
+
+FREE = -1
+ARROW_START = 1
+ARROW_END = 2
+# Extent of an arrow head, which lines add around their bounds.
+ARROW_SIZE = 10.0
+_INITIAL_ROWS = 64
+
+_FLOAT_COLUMNS = (
+    "x", "y", "w", "h", "rotation", "ox", "oy", "z", "rx", "ry",
+    # Local bounding rect: left, top, width, height.
+    "bx", "by", "bw", "bh",
+)
+_INT_COLUMNS = ("kind", "style", "flags", "pts_start", "pts_len")
+
+
+class ShapeRow(NamedTuple):
+    """Plain values of one shape, as written into a Document row."""
+
+    shape: str
+    x: float
+    y: float
+    w: float
+    h: float
+    rotation: float
+    ox: float  # transform origin, local coordinates
+    oy: float
+    z: float
+    bounds: tuple[float, float, float, float]  # local bounding rect x, y, w, h
+    style: tuple  # fill, fill_opacity, stroke, stroke_width, font_size
+    rx: float = 0.0
+    ry: float = 0.0
+    points: tuple[float, ...] = ()  # local coordinates x0, y0, x1, y1, ...
+    flags: int = 0
+    text: str = ""
+
+
+class StyleTable:
+    """Interned style tuples; rows store the index of theirs."""
+
+    def __init__(self):
+        self._ids: dict[tuple, int] = {}
+        self.styles: list[tuple] = []
+
+    def intern(self, style: tuple) -> int:
+        sid = self._ids.get(style)
+        if sid is None:
+            sid = self._ids[style] = len(self.styles)
+            self.styles.append(style)
+        return sid
+
+    def __len__(self) -> int:
+        return len(self.styles)
+
+
+class Document:
+    """Columnar store of the shapes on a canvas.
+
+    Every shape owns one row of parallel numpy columns (type, position,
+    size, rotation, transform origin, style id, z, ...). Polyline and
+    triangle vertices live in a shared points arena that rows reference by
+    offset and length. Shapes write their changes through to their row, so
+    export, alignment and hit-testing can work on whole columns at once
+    instead of asking each item.
+
+    Rows may also exist without an item ("unbound"), e.g. the off-screen
+    part of a virtualized drawing; bind() attaches an item to such a row.
+    """
+
+    def __init__(self):
+        self.kinds: list[str] = []
+        self._kind_ids: dict[str, int] = {}
+        self.styles = StyleTable()
+        self.text: list[str] = []
+        # Rows whose text changed since the last take_text_changes().
+        self._text_changes: set[int] = set()
+        self._rows: dict[object, int] = {}
+        self._owners: list[object] = []
+        self._free: list[int] = []
+        self._capacity = 0
+        self._allocate(_INITIAL_ROWS)
+        # Vertices of all rows; _arena_owner holds the row of every slot,
+        # FREE for slots left behind by edits.
+        self.points = np.zeros(_INITIAL_ROWS * 2)
+        self._arena_owner = np.full(_INITIAL_ROWS * 2, FREE, dtype=np.int64)
+        self._arena_used = 0
+        self._arena_live = 0
+        self._version = 0
+        self._bounds_cache: tuple[int, np.ndarray] | None = None
+
+    def _allocate(self, capacity: int) -> None:
+        old = self._capacity
+        for name in _FLOAT_COLUMNS:
+            column = np.zeros(capacity)
+            if old:
+                column[:old] = getattr(self, name)
+            setattr(self, name, column)
+        for name in _INT_COLUMNS:
+            column = np.full(capacity, FREE if name == "kind" else 0, dtype=np.int64)
+            if old:
+                column[:old] = getattr(self, name)
+            setattr(self, name, column)
+        self._capacity = capacity
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, item) -> bool:
+        return item in self._rows
+
+    def row_of(self, item) -> int:
+        return self._rows[item]
+
+    def rows_of(self, items) -> np.ndarray:
+        rows = self._rows
+        return np.fromiter((rows[it] for it in items), dtype=np.int64)
+
+    def item_at_row(self, row: int):
+        return self._owners[row]
+
+    def live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.kind[: len(self._owners)] != FREE)
+
+    # --- Writing ---
+    def _new_row(self) -> int:
+        if self._free:
+            return self._free.pop()
+        index = len(self._owners)
+        if index == self._capacity:
+            self._allocate(self._capacity * 2)
+        self._owners.append(None)
+        self.text.append("")
+        return index
+
+    def add(self, item, row: ShapeRow) -> int:
+        if item in self._rows:
+            self.write(item, row)
+            return self._rows[item]
+        index = self._new_row()
+        self._owners[index] = item
+        self._rows[item] = index
+        self.write(item, row)
+        return index
+
+    def add_row(self, row: ShapeRow) -> int:
+        """Store a shape that has no item; returns its row index."""
+        index = self._new_row()
+        self._write_row(index, row)
+        return index
+
+    def add_columns(
+        self,
+        kinds: list[str],
+        kind: np.ndarray,
+        styles: list[tuple],
+        style: np.ndarray,
+        columns: dict[str, np.ndarray],
+        flags: np.ndarray | None = None,
+        points: np.ndarray | None = None,
+        pts_len: np.ndarray | None = None,
+        text: list[str] | None = None,
+    ) -> np.ndarray:
+        """Append shapes without items in one go; returns their row indices.
+
+        kind and style index into kinds and styles. columns maps float
+        column names to values, missing ones are 0. points holds the local
+        points of all rows back to back, pts_len how many values each has.
+        """
+        n = len(kind)
+        start = len(self._owners)
+        if start + n > self._capacity:
+            capacity = self._capacity
+            while capacity < start + n:
+                capacity *= 2
+            self._allocate(capacity)
+        rows = np.arange(start, start + n)
+        kind_ids = np.array([self._kind_id(k) for k in kinds], dtype=np.int64)
+        self.kind[start : start + n] = kind_ids[kind]
+        style_ids = np.array([self.styles.intern(s) for s in styles], dtype=np.int64)
+        self.style[start : start + n] = style_ids[style]
+        for name in _FLOAT_COLUMNS:
+            getattr(self, name)[start : start + n] = columns.get(name, 0.0)
+        self.flags[start : start + n] = 0 if flags is None else flags
+        self._owners.extend([None] * n)
+        if text is not None:
+            self.text.extend(text)
+            self._text_changes.update(i for i, t in enumerate(text, start) if t)
+        else:
+            self.text.extend([""] * n)
+        if pts_len is None:
+            self.pts_len[start : start + n] = 0
+        else:
+            total = int(pts_len.sum())
+            if self._arena_used + total > len(self.points):
+                self._grow_arena(total)
+            used = self._arena_used
+            self.points[used : used + total] = points
+            self._arena_owner[used : used + total] = np.repeat(rows, pts_len)
+            self.pts_start[start : start + n] = used + np.cumsum(pts_len) - pts_len
+            self.pts_len[start : start + n] = pts_len
+            self._arena_used += total
+            self._arena_live += total
+        self._version += 1
+        return rows
+
+    def remove(self, item) -> None:
+        index = self._rows.get(item)
+        if index is not None:
+            self.remove_row(index)
+
+    def remove_row(self, index: int) -> None:
+        owner = self._owners[index]
+        if owner is not None:
+            del self._rows[owner]
+        self._release_points(index)
+        self.kind[index] = FREE
+        if self.text[index]:
+            self._text_changes.add(index)
+        self.text[index] = ""
+        self._owners[index] = None
+        self._free.append(index)
+        self._version += 1
+
+    def bind(self, item, index: int) -> None:
+        """Make item the owner of the unbound row index."""
+        self._owners[index] = item
+        self._rows[item] = index
+
+    def unbind(self, item) -> int:
+        """Detach item from its row, which stays in the document."""
+        index = self._rows.pop(item)
+        self._owners[index] = None
+        return index
+
+    def unbound_rows(self) -> np.ndarray:
+        owners = self._owners
+        return np.fromiter(
+            (i for i in self.live_rows().tolist() if owners[i] is None), dtype=np.int64
+        )
+
+    def row(self, index: int) -> ShapeRow:
+        """The values stored in row index."""
+        n = self.pts_len[index]
+        start = self.pts_start[index]
+        return ShapeRow(
+            self.kinds[self.kind[index]],
+            float(self.x[index]), float(self.y[index]),
+            float(self.w[index]), float(self.h[index]),
+            float(self.rotation[index]), float(self.ox[index]), float(self.oy[index]),
+            float(self.z[index]),
+            (float(self.bx[index]), float(self.by[index]), float(self.bw[index]), float(self.bh[index])),
+            self.styles.styles[self.style[index]],
+            float(self.rx[index]), float(self.ry[index]),
+            tuple(self.points[start : start + n].tolist()),
+            int(self.flags[index]), self.text[index],
+        )
+
+    def write(self, item, row: ShapeRow) -> None:
+        """Overwrite all columns of item's row."""
+        self._write_row(self._rows[item], row)
+
+    def _kind_id(self, shape: str) -> int:
+        kind = self._kind_ids.get(shape)
+        if kind is None:
+            kind = self._kind_ids[shape] = len(self.kinds)
+            self.kinds.append(shape)
+        return kind
+
+    def _write_row(self, index: int, row: ShapeRow) -> None:
+        self.kind[index] = self._kind_id(row.shape)
+        self.x[index] = row.x
+        self.y[index] = row.y
+        self.w[index] = row.w
+        self.h[index] = row.h
+        self.rotation[index] = row.rotation
+        self.ox[index] = row.ox
+        self.oy[index] = row.oy
+        self.z[index] = row.z
+        self.rx[index] = row.rx
+        self.ry[index] = row.ry
+        self.bx[index], self.by[index], self.bw[index], self.bh[index] = row.bounds
+        self.style[index] = self.styles.intern(row.style)
+        self.flags[index] = row.flags
+        if self.text[index] != row.text:
+            self._text_changes.add(index)
+            self.text[index] = row.text
+        self._store_points(index, row.points)
+        self._version += 1
+
+    def set_position(self, item, x: float, y: float) -> None:
+        index = self._rows.get(item)
+        if index is not None:
+            self.x[index] = x
+            self.y[index] = y
+            self._version += 1
+
+    def set_positions(self, items, positions: np.ndarray) -> None:
+        """Write an (n, 2) array of positions for items in one go; items
+        without a row are skipped."""
+        rows = self._rows
+        index = np.fromiter((rows.get(it, FREE) for it in items), dtype=np.int64)
+        mask = index != FREE
+        self.x[index[mask]] = positions[mask, 0]
+        self.y[index[mask]] = positions[mask, 1]
+        self._version += 1
+
+    def set_rotation(self, item, angle: float) -> None:
+        index = self._rows.get(item)
+        if index is not None:
+            self.rotation[index] = angle
+            self._version += 1
+
+    def set_origin(self, item, ox: float, oy: float) -> None:
+        index = self._rows.get(item)
+        if index is not None:
+            self.ox[index] = ox
+            self.oy[index] = oy
+            self._version += 1
+
+    def set_z(self, item, z: float) -> None:
+        index = self._rows.get(item)
+        if index is not None:
+            self.z[index] = z
+
+    def invalidate(self) -> None:
+        """Note a change written to the columns directly."""
+        self._version += 1
+
+    def take_text_changes(self) -> set[int]:
+        """Rows whose text changed since the last call, e.g. for a text
+        index to bring itself up to date."""
+        changes = self._text_changes
+        self._text_changes = set()
+        return changes
+
+    def kind_of(self, index: int) -> str:
+        return self.kinds[self.kind[index]]
+
+    # --- Points arena ---
+    def _store_points(self, index: int, points) -> None:
+        n = len(points)
+        start = self.pts_start[index]
+        if n and n <= self.pts_len[index]:
+            self._arena_owner[start + n : start + self.pts_len[index]] = FREE
+        else:
+            self._release_points(index)
+            if not n:
+                return
+            if self._arena_used + n > len(self.points):
+                self._grow_arena(n)
+            start = self._arena_used
+            self._arena_used += n
+            self._arena_owner[start : start + n] = index
+        self.points[start : start + n] = points
+        self._arena_live += n - self.pts_len[index]
+        self.pts_start[index] = start
+        self.pts_len[index] = n
+
+    def _release_points(self, index: int) -> None:
+        n = self.pts_len[index]
+        if n:
+            start = self.pts_start[index]
+            self._arena_owner[start : start + n] = FREE
+            self._arena_live -= n
+            self.pts_len[index] = 0
+
+    def _grow_arena(self, extra: int) -> None:
+        if self._arena_live * 2 < self._arena_used:
+            self._compact_arena()
+        needed = self._arena_used + extra
+        size = len(self.points)
+        if needed <= size:
+            return
+        while size < needed:
+            size *= 2
+        points = np.zeros(size)
+        points[: self._arena_used] = self.points[: self._arena_used]
+        owner = np.full(size, FREE, dtype=np.int64)
+        owner[: self._arena_used] = self._arena_owner[: self._arena_used]
+        self.points = points
+        self._arena_owner = owner
+
+    def _compact_arena(self) -> None:
+        """Drop slots left behind by edits, keeping the order of the rest."""
+        used = self._arena_used
+        keep = np.flatnonzero(self._arena_owner[:used] != FREE)
+        owner = self._arena_owner[keep]
+        self.points[: len(keep)] = self.points[keep]
+        self._arena_owner[: len(keep)] = owner
+        self._arena_owner[len(keep) : used] = FREE
+        # Each row's first slot is where its run starts now.
+        first = np.ones(len(owner), dtype=bool)
+        first[1:] = owner[1:] != owner[:-1]
+        self.pts_start[owner[first]] = np.flatnonzero(first)
+        self._arena_used = len(keep)
+
+    def scene_points(self) -> np.ndarray:
+        """The arena with every vertex translated to scene coordinates
+        (rotation excluded, as in the export); free slots are undefined."""
+        used = self._arena_used
+        owner = self._arena_owner[:used]
+        rows = np.where(owner == FREE, 0, owner)
+        offset = np.where(np.arange(used) % 2 == 0, self.x[rows], self.y[rows])
+        return self.points[:used] + offset
+
+    # --- Queries ---
+    def scene_bounds(self, rows: np.ndarray | None = None) -> np.ndarray:
+        """(n, 4) array of left, top, right, bottom scene bounds: the local
+        bounding rect rotated about the transform origin and translated."""
+        if rows is None:
+            cached = self._bounds_cache
+            if cached is not None and cached[0] == self._version:
+                return cached[1]
+            rows = np.arange(len(self._owners))
+            result = self._scene_bounds(rows)
+            self._bounds_cache = (self._version, result)
+            return result
+        return self._scene_bounds(rows)
+
+    def _scene_bounds(self, rows: np.ndarray) -> np.ndarray:
+        x0 = self.bx[rows]
+        y0 = self.by[rows]
+        x1 = x0 + self.bw[rows]
+        y1 = y0 + self.bh[rows]
+        rad = np.radians(self.rotation[rows])
+        c = np.cos(rad)
+        s = np.sin(rad)
+        # Exact quarter turns, as QTransform.rotate() uses.
+        quarter = np.mod(self.rotation[rows], 90.0) == 0.0
+        c = np.where(quarter, np.round(c), c)
+        s = np.where(quarter, np.round(s), s)
+        ox = self.ox[rows]
+        oy = self.oy[rows]
+        xs = []
+        ys = []
+        for cx, cy in ((x0, y0), (x1, y0), (x0, y1), (x1, y1)):
+            dx = cx - ox
+            dy = cy - oy
+            xs.append(ox + c * dx - s * dy)
+            ys.append(oy + s * dx + c * dy)
+        px = self.x[rows]
+        py = self.y[rows]
+        # Unrotated rects are translated the way QRectF.translated() does,
+        # so their bounds match sceneBoundingRect() exactly.
+        flat = self.rotation[rows] == 0.0
+        left = np.where(flat, x0 + px, np.minimum.reduce(xs) + px)
+        top = np.where(flat, y0 + py, np.minimum.reduce(ys) + py)
+        right = np.where(flat, left + self.bw[rows], np.maximum.reduce(xs) + px)
+        bottom = np.where(flat, top + self.bh[rows], np.maximum.reduce(ys) + py)
+        return np.column_stack((left, top, right, bottom))
+
+    def rows_in_box(self, box: tuple[float, float, float, float]) -> np.ndarray:
+        """Live rows whose scene bounds intersect box (x0, y0, x1, y1)."""
+        bounds = self.scene_bounds()
+        x0, y0, x1, y1 = box
+        hit = (
+            (bounds[:, 0] <= x1) & (bounds[:, 2] >= x0)
+            & (bounds[:, 1] <= y1) & (bounds[:, 3] >= y0)
+            & (self.kind[: len(self._owners)] != FREE)
+        )
+        return np.flatnonzero(hit)
+
+    def records(self, rows) -> list[ShapeRecord]:
+        """Export records of rows, read from the columns alone."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return []
+        pts = self.scene_points().tolist() if self._arena_used else []
+        kinds = self.kinds
+        styles = self.styles.styles
+        text = self.text
+        columns = zip(
+            rows.tolist(), self.kind[rows].tolist(), self.x[rows].tolist(),
+            self.y[rows].tolist(), self.w[rows].tolist(), self.h[rows].tolist(),
+            self.rotation[rows].tolist(), self.ox[rows].tolist(),
+            self.oy[rows].tolist(), self.rx[rows].tolist(), self.ry[rows].tolist(),
+            self.bw[rows].tolist(), self.bh[rows].tolist(),
+            self.style[rows].tolist(), self.flags[rows].tolist(),
+            self.pts_start[rows].tolist(), self.pts_len[rows].tolist(),
+        )
+        result = []
+        for row, kind, x, y, w, h, ang, ox, oy, rx, ry, bw, bh, sid, flags, start, n in columns:
+            shape = kinds[kind]
+            fill, fill_opacity, stroke, stroke_width, font_size = styles[sid]
+            if shape in ("Rectangle", "Ellipse", "Circle"):
+                rec = ShapeRecord(
+                    shape, x, y, w, h, ang, x + w / 2.0, y + h / 2.0,
+                    fill, fill_opacity, stroke, stroke_width, rx, ry,
+                )
+            elif shape == "Triangle":
+                rec = ShapeRecord(
+                    shape, x, y, bw, bh, ang, x + bw / 2.0, y + bh / 2.0,
+                    fill, fill_opacity, stroke, stroke_width,
+                    points=tuple(pts[start : start + n]),
+                )
+            elif shape in ("Line", "Arrow"):
+                rec = ShapeRecord(
+                    shape, x, y, angle=ang, cx=x + ox, cy=y + oy,
+                    stroke=stroke, stroke_width=stroke_width,
+                    points=tuple(pts[start : start + n]),
+                    arrow_start=bool(flags & ARROW_START),
+                    arrow_end=bool(flags & ARROW_END),
+                )
+            else:
+                rec = ShapeRecord(
+                    shape, x, y, bw, bh, ang, x + bw / 2.0, y + bh / 2.0,
+                    fill, fill_opacity, text=text[row], font_size=font_size,
+                )
+            result.append(rec)
+        return result
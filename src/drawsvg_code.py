@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Callable, NamedTuple
+
+from shape_records import (
+    ExportPlan,
+    ShapeRecord,
+    drawing_footer,
+    drawing_header,
+    format_line_run,
+    format_record,
+    format_records,
+    format_symbol_def,
+    format_use,
+    plan_export,
+)
+
+# Like shape_records, this module stays free of Qt: it turns snapshots into
+# drawsvg code for the editor's export as well as for the headless scene API.
+
+# Scenes with at least this many shapes are formatted in a process pool on
+# multi-core machines; smaller ones are formatted in the export thread, where
+# process start-up and pickling would cost more than they save.
+PROCESS_POOL_THRESHOLD = 100000
+PROCESS_CHUNK_SIZE = 20000
+PROGRESS_STEP = 500
+# Seconds between checks for cancel while a pooled chunk is formatted.
+CANCEL_POLL_INTERVAL = 0.1
+
+
+class ExportSnapshot(NamedTuple):
+    width: int
+    height: int
+    ox: int
+    oy: int
+    records: tuple[ShapeRecord, ...]
+    # Per record: (item uid, revision) and the cached fragment, if any.
+    keys: tuple[tuple[int, int], ...] = ()
+    fragments: tuple[str | None, ...] = ()
+    coalesce_lines: bool = False
+    instance_symbols: bool = False
+    # Per record: a number shared by shapes linked as copies, or 0.
+    links: tuple[int, ...] = ()
+
+    def plan(self) -> ExportPlan:
+        return plan_export(self.records, self.coalesce_lines, self.instance_symbols, self.links)
+
+
+def _format_sequential(records, progress, is_cancelled) -> list[str] | None:
+    fragments = []
+    total = len(records)
+    for i, rec in enumerate(records):
+        if i % PROGRESS_STEP == 0:
+            if is_cancelled():
+                return None
+            progress(i, total)
+        fragments.append(format_record(rec))
+    return fragments
+
+
+def _format_in_pool(records, progress, is_cancelled) -> list[str] | None:
+    chunks = [
+        records[i:i + PROCESS_CHUNK_SIZE]
+        for i in range(0, len(records), PROCESS_CHUNK_SIZE)
+    ]
+    workers = min(len(chunks), os.cpu_count() or 1)
+    # "spawn" avoids forking a process that runs Qt threads.
+    ctx = multiprocessing.get_context("spawn")
+    fragments: list[str] = []
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+    cancelled = False
+    try:
+        futures = [pool.submit(format_records, chunk) for chunk in chunks]
+        # Results are consumed in submission order, which keeps the z-order.
+        for fut in futures:
+            # Waiting in short steps lets a cancel stop a running chunk.
+            while True:
+                if is_cancelled():
+                    cancelled = True
+                    return None
+                if wait([fut], timeout=CANCEL_POLL_INTERVAL).done:
+                    break
+            fragments.extend(fut.result())
+            progress(len(fragments), len(records))
+    finally:
+        # A cancelled export drops the pending chunks and does not wait for
+        # the running ones.
+        pool.shutdown(wait=not cancelled, cancel_futures=cancelled)
+    return fragments
+
+
+def format_fragments(
+    snapshot: ExportSnapshot,
+    plan: ExportPlan,
+    progress: Callable[[int, int], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> list[str | None] | None:
+    """Return one code fragment per record, formatting only uncached ones.
+
+    Records that plan merges into a path or replaces by a symbol reference
+    are left as None. Returns None when cancelled.
+    """
+    progress = progress or (lambda done, total: None)
+    is_cancelled = is_cancelled or (lambda: False)
+    cached = snapshot.fragments or (None,) * len(snapshot.records)
+    skipped = plan.skipped()
+    dirty = [i for i, frag in enumerate(cached) if frag is None and i not in skipped]
+    dirty_records = [snapshot.records[i] for i in dirty]
+    if len(dirty_records) >= PROCESS_POOL_THRESHOLD and (os.cpu_count() or 1) > 1:
+        formatted = _format_in_pool(dirty_records, progress, is_cancelled)
+    else:
+        formatted = _format_sequential(dirty_records, progress, is_cancelled)
+    if formatted is None:
+        return None
+    fragments = list(cached)
+    for i in skipped:
+        fragments[i] = None
+    for i, frag in zip(dirty, formatted):
+        fragments[i] = frag
+    progress(len(dirty_records), len(dirty_records))
+    return fragments
+
+
+def build_body(
+    snapshot: ExportSnapshot, plan: ExportPlan, fragments: list[str | None]
+) -> tuple[list[str], int]:
+    """Splice fragments together, applying the merges and symbols of plan.
+
+    Returns the body fragments and the number of elements saved by merging
+    lines.
+    """
+    records = snapshot.records
+    body = [format_symbol_def(n, records[i]) for n, i in enumerate(plan.symbols)]
+    removed = 0
+    run_stops = dict(plan.runs)
+    i = 0
+    while i < len(records):
+        stop = run_stops.get(i)
+        if stop is not None:
+            body.append(format_line_run(records[i:stop]))
+            removed += stop - i - 1
+            i = stop
+            continue
+        number = plan.instances.get(i)
+        if number is not None:
+            body.append(format_use(number, records[i]))
+        else:
+            body.append(fragments[i])
+        i += 1
+    return body, removed
+
+
+def assemble_code(snapshot: ExportSnapshot, body: list[str]) -> str:
+    lines = drawing_header(snapshot.width, snapshot.height, snapshot.ox, snapshot.oy)
+    lines.extend(body)
+    lines.extend(drawing_footer())
+    return "\n".join(lines)
+
+
+def generate_drawsvg_code(
+    snapshot: ExportSnapshot,
+    progress: Callable[[int, int], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> str | None:
+    """Build the drawsvg script for snapshot; returns None when cancelled."""
+    plan = snapshot.plan()
+    fragments = format_fragments(snapshot, plan, progress, is_cancelled)
+    if fragments is None:
+        return None
+    body, _ = build_body(snapshot, plan, fragments)
+    return assemble_code(snapshot, body)
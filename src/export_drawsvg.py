@@ -1,282 +1,371 @@
 from PySide6 import QtCore, QtGui, QtWidgets
 
-from constants import SHAPES
-from items import LineItem
+from constants import ITEM_KINDS
+from drawsvg_code import (
+    ExportSnapshot,
+    assemble_code,
+    build_body,
+    format_fragments,
+)
+from items import GroupItem, LineItem, TextItem
+from shape_records import ExportPlan, ShapeRecord
+from virtual_canvas import RowStandIn
 
+# Keeps export threads alive until they finish, even without a parent widget.
+_running: set["ExportThread"] = set()
 
-def export_drawsvg_py(scene: QtWidgets.QGraphicsScene, parent: QtWidgets.QWidget | None = None):
-    rect = scene.itemsBoundingRect()
-    width = int(rect.width())
-    height = int(rect.height())
-    ox = int(rect.x())
-    oy = int(rect.y())
 
-    items = [it for it in scene.items() if it.data(0) in SHAPES]
-    items.reverse()
+class ExportCache:
+    """Records and code fragments of exported items keyed by uid and revision.
 
-    lines = []
-    lines.append("# Auto-generated from PySide6 Canvas to drawsvg")
-    lines.append("import drawsvg as draw")
-    lines.append("")
-    lines.append("def build_drawing():")
-    lines.append(f"    d = draw.Drawing({width}, {height}, origin=({ox}, {oy}))")
-    lines.append("")
+    Items bump their revision on every exported change, so an entry whose
+    revision still matches can be spliced into the next export unchanged.
+    """
 
-    for it in items:
-        shape = it.data(0)
-        if shape == "Rectangle" and isinstance(it, QtWidgets.QGraphicsRectItem):
-            r = it.rect()
-            x = it.pos().x()
-            y = it.pos().y()
-            w = r.width()
-            h = r.height()
-            cx = x + w / 2.0
-            cy = y + h / 2.0
-            ang = it.rotation()
-            brush = it.brush()
-            pen = it.pen()
-            attrs = []
-            if brush.style() == QtCore.Qt.BrushStyle.NoBrush:
-                attrs.append("fill='none'")
-            else:
-                bcol = brush.color()
-                attrs.append(f"fill='{bcol.name()}'")
-                attrs.append(f"fill_opacity={bcol.alphaF():.2f}")
-            attrs.append(f"stroke='{pen.color().name()}'")
-            attrs.append(f"stroke_width={pen.widthF():.2f}")
-            rx = getattr(it, "rx", 0)
-            ry = getattr(it, "ry", 0)
-            if rx:
-                attrs.append(f"rx={rx:.2f}")
-            if ry:
-                attrs.append(f"ry={ry:.2f}")
-            attr_str = ", ".join(attrs)
-            if abs(ang) > 1e-6:
-                lines.append(
-                    f"    _rect = draw.Rectangle({x:.2f}, {y:.2f}, {w:.2f}, {h:.2f}, {attr_str}, transform='rotate({ang:.2f} {cx:.2f} {cy:.2f})')"
-                )
-            else:
-                lines.append(
-                    f"    _rect = draw.Rectangle({x:.2f}, {y:.2f}, {w:.2f}, {h:.2f}, {attr_str})"
-                )
-            lines.append("    d.append(_rect)")
-            lines.append("")
-
-        elif shape == "Ellipse" and isinstance(it, QtWidgets.QGraphicsEllipseItem):
-            r = it.rect()
-            x = it.pos().x()
-            y = it.pos().y()
-            w = r.width()
-            h = r.height()
-            cx = x + w / 2.0
-            cy = y + h / 2.0
-            rx = w / 2.0
-            ry = h / 2.0
-            ang = it.rotation()
-            brush = it.brush()
-            pen = it.pen()
-            attrs = []
-            if brush.style() == QtCore.Qt.BrushStyle.NoBrush:
-                attrs.append("fill='none'")
-            else:
-                bcol = brush.color()
-                attrs.append(f"fill='{bcol.name()}'")
-                attrs.append(f"fill_opacity={bcol.alphaF():.2f}")
-            attrs.append(f"stroke='{pen.color().name()}'")
-            attrs.append(f"stroke_width={pen.widthF():.2f}")
-            attr_str = ", ".join(attrs)
-            if abs(ang) > 1e-6:
-                lines.append(
-                    f"    _ell = draw.Ellipse({cx:.2f}, {cy:.2f}, {rx:.2f}, {ry:.2f}, {attr_str}, transform='rotate({ang:.2f} {cx:.2f} {cy:.2f})')"
-                )
-            else:
-                lines.append(
-                    f"    _ell = draw.Ellipse({cx:.2f}, {cy:.2f}, {rx:.2f}, {ry:.2f}, {attr_str})"
-                )
-            lines.append("    d.append(_ell)")
-            lines.append("")
-
-        elif shape == "Circle" and isinstance(it, QtWidgets.QGraphicsEllipseItem):
-            r = it.rect()
-            x = it.pos().x()
-            y = it.pos().y()
-            w = r.width()
-            h = r.height()
-            d_avg = (w + h) / 2.0
-            radius = d_avg / 2.0
-            cx = x + w / 2.0
-            cy = y + h / 2.0
-            ang = it.rotation()
-            brush = it.brush()
-            pen = it.pen()
-            attrs = []
-            if brush.style() == QtCore.Qt.BrushStyle.NoBrush:
-                attrs.append("fill='none'")
-            else:
-                bcol = brush.color()
-                attrs.append(f"fill='{bcol.name()}'")
-                attrs.append(f"fill_opacity={bcol.alphaF():.2f}")
-            attrs.append(f"stroke='{pen.color().name()}'")
-            attrs.append(f"stroke_width={pen.widthF():.2f}")
-            attr_str = ", ".join(attrs)
-            if abs(ang) > 1e-6:
-                lines.append(
-                    f"    _circ = draw.Circle({cx:.2f}, {cy:.2f}, {radius:.2f}, {attr_str}, transform='rotate({ang:.2f} {cx:.2f} {cy:.2f})')"
-                )
-            else:
-                lines.append(
-                    f"    _circ = draw.Circle({cx:.2f}, {cy:.2f}, {radius:.2f}, {attr_str})"
-                )
-            lines.append("    d.append(_circ)")
-            lines.append("")
-
-        elif shape == "Triangle" and isinstance(it, QtWidgets.QGraphicsPolygonItem):
-            poly = it.polygon()
-            x = it.pos().x()
-            y = it.pos().y()
-            pts = []
-            for p in poly:
-                pts.extend([x + p.x(), y + p.y()])
-            br = it.boundingRect()
-            cx = x + br.width() / 2.0
-            cy = y + br.height() / 2.0
-            ang = it.rotation()
-            brush = it.brush()
-            pen = it.pen()
-            attrs = []
-            if brush.style() == QtCore.Qt.BrushStyle.NoBrush:
-                attrs.append("fill='none'")
-            else:
-                bcol = brush.color()
-                attrs.append(f"fill='{bcol.name()}'")
-                attrs.append(f"fill_opacity={bcol.alphaF():.2f}")
-            attrs.append(f"stroke='{pen.color().name()}'")
-            attrs.append(f"stroke_width={pen.widthF():.2f}")
-            attr_str = ", ".join(attrs)
-            coord_str = ", ".join(f"{v:.2f}" for v in pts)
-            if abs(ang) > 1e-6:
-                lines.append(
-                    f"    _tri = draw.Lines({coord_str}, close=True, {attr_str}, transform='rotate({ang:.2f} {cx:.2f} {cy:.2f})')"
-                )
-            else:
-                lines.append(
-                    f"    _tri = draw.Lines({coord_str}, close=True, {attr_str})"
-                )
-            lines.append("    d.append(_tri)")
-            lines.append("")
-
-        elif shape in ("Line", "Arrow") and isinstance(it, LineItem):
-            pen = it.pen()
-            ang = it.rotation()
-            cx = it.pos().x() + it.transformOriginPoint().x()
-            cy = it.pos().y() + it.transformOriginPoint().y()
-            abs_pts: list[float] = []
-            for p in it._points:
-                abs_pts.extend([it.pos().x() + p.x(), it.pos().y() + p.y()])
-            arrow_start = getattr(it, "arrow_start", False)
-            arrow_end = getattr(it, "arrow_end", False)
-            if arrow_start or arrow_end:
-                lines.append("    _arrow = draw.Marker(-0.1, -0.51, 0.9, 0.5, scale=4, orient='auto')")
-                lines.append(
-                    f"    _arrow.append(draw.Lines(-0.1, 0.5, -0.1, -0.5, 0.9, 0, fill='{pen.color().name()}', close=True))"
-                )
-                path_cmd = "M " + " L ".join(
-                    f"{abs_pts[i]:.2f} {abs_pts[i+1]:.2f}" for i in range(0, len(abs_pts), 2)
-                )
-                attrs = [
-                    f"stroke='{pen.color().name()}'",
-                    f"stroke_width={pen.widthF():.2f}",
-                    "fill='none'",
-                ]
-                if arrow_start:
-                    attrs.append("marker_start=_arrow")
-                if arrow_end:
-                    attrs.append("marker_end=_arrow")
-                attr_str = ", ".join(attrs)
-                if abs(ang) > 1e-6:
-                    lines.append(
-                        f"    _path = draw.Path('{path_cmd}', {attr_str}, transform='rotate({ang:.2f} {cx:.2f} {cy:.2f})')"
-                    )
-                else:
-                    lines.append(f"    _path = draw.Path('{path_cmd}', {attr_str})")
-                lines.append("    d.append(_arrow)")
-                lines.append("    d.append(_path)")
-                lines.append("")
+    def __init__(self):
+        self._entries: dict[int, tuple[int, ShapeRecord, str | None]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, uid: int, revision: int) -> tuple[ShapeRecord, str | None] | None:
+        entry = self._entries.get(uid)
+        if entry is not None and entry[0] == revision:
+            return entry[1], entry[2]
+        return None
+
+    def store(self, snapshot: ExportSnapshot, fragments: list[str | None]) -> None:
+        """Replace the cache content with the items of a finished export."""
+        self._entries = {
+            uid: (rev, rec, frag)
+            for (uid, rev), rec, frag in zip(snapshot.keys, snapshot.records, fragments)
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def _fill_of(brush: QtGui.QBrush) -> tuple[str | None, float]:
+    if brush.style() == QtCore.Qt.BrushStyle.NoBrush:
+        return None, 1.0
+    color = brush.color()
+    return color.name(), color.alphaF()
+
+
+def _link_of(it) -> int:
+    """Plain number of the SharedGeometry linking it to its copies, or 0."""
+    shared = getattr(it, "shared_geometry", None)
+    return id(shared) if shared is not None else 0
+
+
+def snapshot_item(it: QtWidgets.QGraphicsItem, container: str = "d") -> ShapeRecord | None:
+    """Copy the exported state of a canvas item into a plain record.
+
+    Members of a group are read in the coordinates of the group they are in,
+    whose variable name is given as container.
+    """
+    shape = it.data(0)
+    pos = it.pos()
+    x = pos.x()
+    y = pos.y()
+    ang = it.rotation()
+    if isinstance(it, GroupItem):
+        origin = it.transformOriginPoint()
+        return ShapeRecord(
+            shape, x, y, angle=ang, cx=origin.x(), cy=origin.y(),
+            text=f"_g{it.uid()}", container=container,
+        )
+    if (shape == "Rectangle" and isinstance(it, QtWidgets.QGraphicsRectItem)) or (
+        shape in ("Ellipse", "Circle") and isinstance(it, QtWidgets.QGraphicsEllipseItem)
+    ):
+        r = it.rect()
+        w = r.width()
+        h = r.height()
+        fill, fill_opacity = _fill_of(it.brush())
+        pen = it.pen()
+        return ShapeRecord(
+            shape, x, y, w, h, ang, x + w / 2.0, y + h / 2.0,
+            fill, fill_opacity, pen.color().name(), pen.widthF(),
+            float(getattr(it, "rx", 0.0)), float(getattr(it, "ry", 0.0)),
+            container=container,
+        )
+    if shape == "Triangle" and isinstance(it, QtWidgets.QGraphicsPolygonItem):
+        pts: list[float] = []
+        for p in it.polygon():
+            pts.extend([x + p.x(), y + p.y()])
+        br = it.boundingRect()
+        fill, fill_opacity = _fill_of(it.brush())
+        pen = it.pen()
+        return ShapeRecord(
+            shape, x, y, br.width(), br.height(), ang,
+            x + br.width() / 2.0, y + br.height() / 2.0,
+            fill, fill_opacity, pen.color().name(), pen.widthF(),
+            points=tuple(pts), container=container,
+        )
+    if shape in ("Line", "Arrow") and isinstance(it, LineItem):
+        pen = it.pen()
+        origin = it.transformOriginPoint()
+        pts = []
+        for p in it._points:
+            pts.extend([x + p.x(), y + p.y()])
+        return ShapeRecord(
+            shape, x, y, angle=ang, cx=x + origin.x(), cy=y + origin.y(),
+            stroke=pen.color().name(), stroke_width=pen.widthF(),
+            points=tuple(pts),
+            arrow_start=bool(getattr(it, "arrow_start", False)),
+            arrow_end=bool(getattr(it, "arrow_end", False)),
+            container=container,
+        )
+    if shape == "Text" and isinstance(it, TextItem):
+        br = it.boundingRect()
+        font = it.font()
+        size = font.pointSizeF()
+        if size <= 0:  # fall back to pixel size when point size is unset
+            size = float(font.pixelSize())
+        color = it.defaultTextColor()
+        return ShapeRecord(
+            shape, x, y, br.width(), br.height(), ang,
+            x + br.width() / 2.0, y + br.height() / 2.0,
+            color.name(), color.alphaF(),
+            text=it.toPlainText(), font_size=size, container=container,
+        )
+    return None
+
+
+def snapshot_scene(
+    scene: QtWidgets.QGraphicsScene,
+    cache: ExportCache | None = None,
+    coalesce_lines: bool = False,
+    instance_symbols: bool = False,
+) -> ExportSnapshot:
+    """Collect plain records of all shapes in z-order (bottom first).
+
+    This is the only part of the export that touches Qt items and therefore
+    the only part that has to run on the GUI thread. Items found unchanged
+    in cache are not read at all; the others are read from the scene's
+    document columns when it has one.
+    """
+    content_bounds = getattr(scene, "content_bounds", None)
+    rect = content_bounds() if content_bounds is not None else scene.itemsBoundingRect()
+    zorder = getattr(scene, "zorder", None)
+    if zorder is not None:
+        items = zorder.entries()
+    else:
+        items = [
+            it for it in scene.items() if it.data(0) in ITEM_KINDS and it.parentItem() is None
+        ]
+        items.reverse()
+    return snapshot_items(scene, items, rect, cache, coalesce_lines, instance_symbols)
+
+
+def snapshot_items(
+    scene: QtWidgets.QGraphicsScene,
+    items,
+    rect: QtCore.QRectF,
+    cache: ExportCache | None = None,
+    coalesce_lines: bool = False,
+    instance_symbols: bool = False,
+) -> ExportSnapshot:
+    """Collect records of top-level items, given bottom first, for a
+    drawing covering rect; see snapshot_scene()."""
+    document = getattr(scene, "document", None)
+    records = []
+    keys = []
+    fragments = []
+    links = []
+    # Indices into records still to be filled from document rows.
+    pending = []
+    pending_rows = []
+    hits = misses = 0
+
+    def add_unrowed(it, container):
+        # Groups and their members aren't document rows; a group's record
+        # is followed by its members' records, bottom member first.
+        nonlocal hits, misses
+        key = (it.uid(), it.revision())
+        cached = cache.lookup(*key) if cache is not None else None
+        if cached is not None:
+            rec, frag = cached
+            # An entry without a fragment still has to be formatted.
+            if frag is None:
+                misses += 1
             else:
-                attr_str = f"stroke='{pen.color().name()}', stroke_width={pen.widthF():.2f}"
-                if len(abs_pts) == 4:
-                    x1, y1, x2, y2 = abs_pts
-                    if abs(ang) > 1e-6:
-                        lines.append(
-                            f"    _line = draw.Line({x1:.2f}, {y1:.2f}, {x2:.2f}, {y2:.2f}, {attr_str}, transform='rotate({ang:.2f} {cx:.2f} {cy:.2f})')"
-                        )
-                    else:
-                        lines.append(
-                            f"    _line = draw.Line({x1:.2f}, {y1:.2f}, {x2:.2f}, {y2:.2f}, {attr_str})"
-                        )
-                    lines.append("    d.append(_line)")
-                    lines.append("")
-                else:
-                    coord_str = ", ".join(f"{v:.2f}" for v in abs_pts)
-                    if abs(ang) > 1e-6:
-                        lines.append(
-                            f"    _line = draw.Lines({coord_str}, {attr_str}, transform='rotate({ang:.2f} {cx:.2f} {cy:.2f})')"
-                        )
-                    else:
-                        lines.append(
-                            f"    _line = draw.Lines({coord_str}, {attr_str})"
-                        )
-                    lines.append("    d.append(_line)")
-                    lines.append("")
-
-        elif shape == "Text" and isinstance(it, QtWidgets.QGraphicsTextItem):
-            x = it.pos().x()
-            y = it.pos().y()
-            br = it.boundingRect()
-            cx = x + br.width() / 2.0
-            cy = y + br.height() / 2.0
-            ang = it.rotation()
-            font = it.font()
-            size = font.pointSizeF()
-            if size <= 0:  # fall back to pixel size when point size is unset
-                size = float(font.pixelSize())
-            text = it.toPlainText().replace("'", "\'")
-            color = it.defaultTextColor()
-            attrs = [f"fill='{color.name()}'"]
-            if color.alphaF() < 1.0:
-                attrs.append(f"fill_opacity={color.alphaF():.2f}")
-            attr_str = ", ".join(attrs)
-            baseline = y + br.height()
-            if abs(ang) > 1e-6:
-                lines.append(
-                    f"    _text = draw.Text('{text}', {size:.2f}, {x:.2f}, {baseline:.2f}, {attr_str}, transform='rotate({ang:.2f} {cx:.2f} {cy:.2f})')"
-                )
+                hits += 1
+        else:
+            rec = snapshot_item(it, container)
+            frag = None
+            if rec is None:
+                return
+            misses += 1
+        records.append(rec)
+        keys.append(key)
+        fragments.append(frag)
+        links.append(_link_of(it))
+        if isinstance(it, GroupItem):
+            for member in it.members():
+                add_unrowed(member, rec.text)
+
+    for it in items:
+        if isinstance(it, GroupItem):
+            add_unrowed(it, "d")
+            continue
+        if isinstance(it, RowStandIn):
+            # A virtualized shape without an item: only its row exists.
+            pending.append(len(records))
+            pending_rows.append(it.row)
+            records.append(None)
+            keys.append((0, 0))
+            fragments.append(None)
+            links.append(0)
+            misses += 1
+            continue
+        key = (it.uid(), it.revision()) if hasattr(it, "revision") else (0, 0)
+        cached = cache.lookup(*key) if cache is not None and key[0] else None
+        if cached is not None:
+            rec, frag = cached
+            if frag is None:
+                misses += 1
             else:
-                lines.append(
-                    f"    _text = draw.Text('{text}', {size:.2f}, {x:.2f}, {baseline:.2f}, {attr_str})"
-                )
-            lines.append("    d.append(_text)")
-            lines.append("")
-
-    lines.append("    return d")
-    lines.append("")
-    lines.append("if __name__ == '__main__':")
-    lines.append("    d = build_drawing()")
-    lines.append("    # Creates an SVG file next to the script:")
-    lines.append("    d.save_svg('canvas.svg')")
-
-    code = "\n".join(lines)
+                hits += 1
+        elif document is not None and it in document:
+            pending.append(len(records))
+            pending_rows.append(document.row_of(it))
+            rec = frag = None
+            misses += 1
+        else:
+            rec = snapshot_item(it)
+            frag = None
+            if rec is None:
+                continue
+            misses += 1
+        records.append(rec)
+        keys.append(key)
+        fragments.append(frag)
+        links.append(_link_of(it))
+    if pending:
+        for i, rec in zip(pending, document.records(pending_rows)):
+            records[i] = rec
+    if cache is not None:
+        cache.hits = hits
+        cache.misses = misses
+    return ExportSnapshot(
+        int(rect.width()), int(rect.height()), int(rect.x()), int(rect.y()),
+        tuple(records), tuple(keys), tuple(fragments),
+        coalesce_lines, instance_symbols, tuple(links),
+    )
+
+
+class ExportThread(QtCore.QThread):
+    """Formats and writes a snapshot without blocking the GUI thread."""
+
+    progress = QtCore.Signal(int, int)
+    succeeded = QtCore.Signal(str)
+    failed = QtCore.Signal(str)
+    cancelled = QtCore.Signal()
+
+    def __init__(self, snapshot: ExportSnapshot, path: str, parent=None):
+        super().__init__(parent)
+        self._snapshot = snapshot
+        self._path = path
+        self._cancel_requested = False
+        self.fragments: list[str | None] | None = None
+        self.plan: ExportPlan | None = None
+        self.removed_elements = 0
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def run(self):
+        try:
+            self.plan = self._snapshot.plan()
+            fragments = format_fragments(
+                self._snapshot, self.plan, self.progress.emit, lambda: self._cancel_requested
+            )
+            if fragments is None:
+                self.cancelled.emit()
+                return
+            body, self.removed_elements = build_body(self._snapshot, self.plan, fragments)
+            with open(self._path, "w", encoding="utf-8") as f:
+                f.write(assemble_code(self._snapshot, body))
+            self.fragments = fragments
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.succeeded.emit(self._path)
+
+
+def export_drawsvg_py(
+    scene: QtWidgets.QGraphicsScene,
+    parent: QtWidgets.QWidget | None = None,
+    cache: ExportCache | None = None,
+    coalesce_lines: bool = False,
+    instance_symbols: bool = False,
+) -> ExportThread | None:
     path, _ = QtWidgets.QFileDialog.getSaveFileName(
         parent,
         "Save as drawsvg-.py…",
         "canvas_drawsvg.py",
         "Python (*.py)",
     )
-    if path:
-        try:
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(code)
-            if parent is not None:
-                parent.statusBar().showMessage(f"Exported: {path}", 5000)
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(parent, "Error saving file", str(e))
+    if not path:
+        return None
+    snapshot = snapshot_scene(scene, cache, coalesce_lines, instance_symbols)
+
+    thread = ExportThread(snapshot, path, parent)
+    dlg = QtWidgets.QProgressDialog("Exporting drawsvg code…", "Cancel", 0, max(1, len(snapshot.records)), parent)
+    dlg.setWindowTitle("Export")
+    # Non-modal so the canvas stays editable; the snapshot is immutable.
+    dlg.setWindowModality(QtCore.Qt.WindowModality.NonModal)
+    dlg.setMinimumDuration(300)
+    dlg.setAutoClose(False)
+    dlg.setAutoReset(False)
+    dlg.canceled.connect(thread.cancel)
+
+    def on_progress(done: int, total: int):
+        dlg.setMaximum(max(1, total))
+        dlg.setValue(done)
+
+    def on_succeeded(p: str):
+        notes = []
+        if cache is not None:
+            cache.store(snapshot, thread.fragments)
+            notes.append(f"cache: {cache.hits} hits, {cache.misses} misses")
+        if coalesce_lines:
+            notes.append(f"line merging removed {thread.removed_elements} elements")
+        if instance_symbols:
+            notes.append(
+                f"{len(thread.plan.instances)} shapes reference {len(thread.plan.symbols)} symbols"
+            )
+        msg = f"Exported: {p}"
+        if notes:
+            msg += f" ({'; '.join(notes)})"
+        if parent is not None:
+            parent.statusBar().showMessage(msg, 5000)
+
+    def on_failed(msg: str):
+        QtWidgets.QMessageBox.critical(parent, "Error saving file", msg)
+
+    def on_cancelled():
+        if parent is not None:
+            parent.statusBar().showMessage("Export cancelled", 5000)
+
+    def on_finished():
+        dlg.close()
+        dlg.deleteLater()
+        _running.discard(thread)
+        thread.deleteLater()
+
+    thread.progress.connect(on_progress)
+    thread.succeeded.connect(on_succeeded)
+    thread.failed.connect(on_failed)
+    thread.cancelled.connect(on_cancelled)
+    thread.finished.connect(on_finished)
+    _running.add(thread)
+    thread.start()
+    return thread
+
+
+def cancel_running_exports():
+    """Cancel and join running export threads, e.g. before the app quits."""
+    for thread in list(_running):
+        thread.cancel()
+        thread.wait()
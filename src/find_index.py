@@ -0,0 +1,137 @@
+import re
+
+import numpy as np
+
+from document import ARROW_END, ARROW_START, FREE
+
+# Like document, this module stays free of Qt.
+
+_TOKEN_RE = re.compile(r"\w+")
+# Searchable style values, by position in the style tuple.
+STYLE_FIELDS = {"fill": 0, "stroke": 2, "stroke_width": 3}
+# Group rows only hold the group's frame; their placeholder style is not a
+# fill or stroke anyone drew.
+_GROUP = "Group"
+
+
+def text_tokens(text: str) -> frozenset[str]:
+    """Lower-case words of text."""
+    return frozenset(_TOKEN_RE.findall(text.lower()))
+
+
+def style_value(name: str, style: tuple):
+    """Value of a searchable style field, as find() compares it: colours in
+    lower case with "none" for no fill, widths rounded to the precision of
+    the export."""
+    value = style[STYLE_FIELDS[name]]
+    if name == "stroke_width":
+        return round(float(value), 2)
+    return "none" if value is None else str(value).lower()
+
+
+class FindIndex:
+    """Inverted indexes over the rows of a Document for find and select-same.
+
+    Each searchable style value maps to the interned styles that have it,
+    and each text token to the rows whose text contains it. Both are brought
+    up to date at the start of every query from the styles interned and the
+    texts changed since the previous one, so edits, loads and deletes never
+    need a rescan. The type, style and arrow conditions of a query then take
+    one pass over the document's integer columns.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self._styles_seen = 0
+        self._by_style: dict[str, dict[object, list[int]]] = {name: {} for name in STYLE_FIELDS}
+        self._postings: dict[str, set[int]] = {}
+        self._row_tokens: dict[int, frozenset[str]] = {}
+
+    def _update(self) -> None:
+        styles = self.document.styles.styles
+        for sid in range(self._styles_seen, len(styles)):
+            for name, index in self._by_style.items():
+                index.setdefault(style_value(name, styles[sid]), []).append(sid)
+        self._styles_seen = len(styles)
+        text = self.document.text
+        for row in self.document.take_text_changes():
+            for token in self._row_tokens.pop(row, ()):
+                posting = self._postings[token]
+                posting.discard(row)
+                if not posting:
+                    del self._postings[token]
+            tokens = text_tokens(text[row])
+            if tokens:
+                self._row_tokens[row] = tokens
+                for token in tokens:
+                    self._postings.setdefault(token, set()).add(row)
+
+    def _text_rows(self, query: str) -> set[int]:
+        """Rows with a word containing each word of query."""
+        rows: set[int] | None = None
+        for word in text_tokens(query):
+            matches: set[int] = set()
+            for token, posting in self._postings.items():
+                if word in token:
+                    matches |= posting
+            rows = matches if rows is None else rows & matches
+            if not rows:
+                break
+        return rows or set()
+
+    def find(
+        self,
+        kind: str | None = None,
+        fill: str | None = None,
+        stroke: str | None = None,
+        stroke_width: float | None = None,
+        arrows: bool | None = None,
+        text: str | None = None,
+    ) -> np.ndarray:
+        """Live rows matching every given condition, in row order.
+
+        Colours are compared as style_value() gives them, so "none" finds
+        shapes without fill. arrows selects lines with (True) or shapes
+        without (False) arrow heads; text matches words containing each word
+        of the query.
+        """
+        self._update()
+        document = self.document
+        n = len(document.text)
+        mask = document.kind[:n] != FREE
+        if kind is not None:
+            kind_id = document.kinds.index(kind) if kind in document.kinds else FREE
+            mask &= document.kind[:n] == kind_id
+        styled = (("fill", fill), ("stroke", stroke), ("stroke_width", stroke_width))
+        if _GROUP in document.kinds and any(value is not None for _, value in styled):
+            mask &= document.kind[:n] != document.kinds.index(_GROUP)
+        for name, value in styled:
+            if value is not None:
+                key = round(float(value), 2) if name == "stroke_width" else str(value).lower()
+                mask &= np.isin(document.style[:n], self._by_style[name].get(key, []))
+        if arrows is not None:
+            has_arrows = (document.flags[:n] & (ARROW_START | ARROW_END)) != 0
+            mask &= has_arrows if arrows else ~has_arrows
+        if text:
+            hits = np.zeros(n, dtype=bool)
+            hits[np.fromiter(self._text_rows(text), dtype=np.int64)] = True
+            mask &= hits
+        return np.flatnonzero(mask)
+
+    def values(self, name: str) -> list:
+        """Distinct values of a style field among the live rows other than
+        groups, sorted."""
+        self._update()
+        document = self.document
+        styles = document.styles.styles
+        rows = document.live_rows()
+        if _GROUP in document.kinds:
+            rows = rows[document.kind[rows] != document.kinds.index(_GROUP)]
+        used = np.unique(document.style[rows])
+        return sorted({style_value(name, styles[sid]) for sid in used.tolist()})
+
+    def kinds(self) -> list[str]:
+        """Shape types of the live rows, sorted."""
+        document = self.document
+        used = np.unique(document.kind[document.live_rows()])
+        return sorted(document.kinds[k] for k in used.tolist())
@@ -0,0 +1,110 @@
+import time
+
+from PySide6 import QtCore, QtWidgets
+
+# Refresh the value lists this long after the last scene change.
+REFRESH_DELAY_MS = 300
+
+
+class FindPanel(QtWidgets.QWidget):
+    """Finds shapes by type, colours, stroke width, arrowheads and text
+    through the scene's FindIndex, and selects them."""
+
+    def __init__(self, view, parent=None):
+        super().__init__(parent)
+        self._view = view
+        scene = view.scene()
+
+        self.kind_box = QtWidgets.QComboBox()
+        self.fill_box = QtWidgets.QComboBox()
+        self.stroke_box = QtWidgets.QComboBox()
+        self.width_box = QtWidgets.QComboBox()
+        self.arrows_box = QtWidgets.QComboBox()
+        self.arrows_box.addItem("Any", None)
+        self.arrows_box.addItem("With arrowheads", True)
+        self.arrows_box.addItem("Without arrowheads", False)
+        self.text_edit = QtWidgets.QLineEdit()
+        self.text_edit.setPlaceholderText("Words in texts")
+        self.text_edit.setClearButtonEnabled(True)
+        self.result_label = QtWidgets.QLabel()
+        self.result_label.setWordWrap(True)
+        select_button = QtWidgets.QPushButton("Select")
+        select_button.clicked.connect(self.select_matches)
+        self.text_edit.returnPressed.connect(self.select_matches)
+
+        layout = QtWidgets.QFormLayout(self)
+        layout.addRow("Type:", self.kind_box)
+        layout.addRow("Fill:", self.fill_box)
+        layout.addRow("Stroke:", self.stroke_box)
+        layout.addRow("Width:", self.width_box)
+        layout.addRow("Arrows:", self.arrows_box)
+        layout.addRow("Text:", self.text_edit)
+        layout.addRow(select_button)
+        layout.addRow(self.result_label)
+
+        for box in (self.kind_box, self.fill_box, self.stroke_box, self.width_box, self.arrows_box):
+            box.currentIndexChanged.connect(self.update_count)
+        self.text_edit.textChanged.connect(self.update_count)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(REFRESH_DELAY_MS)
+        self._timer.timeout.connect(self.refresh)
+        scene.changed.connect(self._scene_changed)
+
+    def _scene_changed(self, _regions=None):
+        if self.isVisible():
+            self._timer.start()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def focus_text(self) -> None:
+        self.text_edit.setFocus()
+        self.text_edit.selectAll()
+
+    def _fill_box(self, box: QtWidgets.QComboBox, values, label=str) -> None:
+        """Replace the entries of box by values, keeping the current one."""
+        current = box.currentData()
+        box.blockSignals(True)
+        box.clear()
+        box.addItem("Any", None)
+        for value in values:
+            box.addItem(label(value), value)
+        index = box.findData(current)
+        box.setCurrentIndex(max(index, 0))
+        box.blockSignals(False)
+
+    def refresh(self) -> None:
+        """Offer the values present in the drawing and recount the matches."""
+        index = self._view.scene().find_index
+        self._fill_box(self.kind_box, index.kinds())
+        self._fill_box(self.fill_box, index.values("fill"))
+        self._fill_box(self.stroke_box, index.values("stroke"))
+        self._fill_box(self.width_box, index.values("stroke_width"), lambda w: f"{w:g}")
+        self.update_count()
+
+    def query(self) -> dict:
+        return {
+            "kind": self.kind_box.currentData(),
+            "fill": self.fill_box.currentData(),
+            "stroke": self.stroke_box.currentData(),
+            "stroke_width": self.width_box.currentData(),
+            "arrows": self.arrows_box.currentData(),
+            "text": self.text_edit.text().strip() or None,
+        }
+
+    def _find(self):
+        t = time.perf_counter()
+        rows = self._view.scene().find_index.find(**self.query())
+        return rows, (time.perf_counter() - t) * 1000.0
+
+    def update_count(self) -> None:
+        rows, ms = self._find()
+        self.result_label.setText(f"{len(rows)} matches ({ms:.1f} ms)")
+
+    def select_matches(self) -> None:
+        rows, ms = self._find()
+        self._view.scene().select_rows(rows)
+        self.result_label.setText(f"{len(rows)} matches ({ms:.1f} ms), all selected")
@@ -0,0 +1,99 @@
+import time
+
+from PySide6 import QtCore, QtGui
+
+# Upper bound for interactive edits per second; 0 follows the display's
+# refresh rate.
+_edit_rate_cap = 0.0
+
+
+class PacingStats:
+    """Pointer events received by frame pacers and how many were applied."""
+
+    def __init__(self):
+        self.received = 0
+        self.applied = 0
+
+    @property
+    def dropped(self) -> int:
+        return self.received - self.applied
+
+    def reset(self) -> None:
+        self.received = 0
+        self.applied = 0
+
+    def summary(self) -> str:
+        share = 100.0 * self.dropped / self.received if self.received else 0.0
+        return (
+            f"Interactive edits: {self.applied} applied, {self.dropped} of "
+            f"{self.received} pointer events coalesced ({share:.0f}%)"
+        )
+
+
+STATS = PacingStats()
+
+
+def set_edit_rate_cap(hz: float) -> None:
+    """Limit interactive edits to hz per second (0 = display refresh rate)."""
+    global _edit_rate_cap
+    _edit_rate_cap = float(hz)
+
+
+def edit_rate_cap() -> float:
+    return _edit_rate_cap
+
+
+def frame_interval() -> float:
+    """Seconds between applied edits: one display frame, or longer if the
+    edit rate is capped below the refresh rate."""
+    screen = QtGui.QGuiApplication.primaryScreen()
+    rate = screen.refreshRate() if screen is not None else 60.0
+    if rate <= 0:
+        rate = 60.0
+    if _edit_rate_cap > 0:
+        rate = min(rate, _edit_rate_cap)
+    return 1.0 / rate
+
+
+class FramePacer(QtCore.QObject):
+    """Coalesces high-rate pointer input into at most one edit per frame.
+
+    push() keeps only the latest state. An edit is applied immediately when
+    a frame has passed since the previous one; otherwise a single-shot timer
+    applies the newest state when the frame is due. flush() applies what is
+    still pending, e.g. on mouse release.
+    """
+
+    def __init__(self, apply, parent=None):
+        super().__init__(parent)
+        self._apply = apply
+        self._pending = None
+        self._has_pending = False
+        self._last = 0.0
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self.flush)
+
+    def push(self, state) -> None:
+        STATS.received += 1
+        self._pending = state
+        self._has_pending = True
+        if self._timer.isActive():
+            return
+        wait = self._last + frame_interval() - time.perf_counter()
+        if wait <= 0:
+            self.flush()
+        else:
+            self._timer.start(max(1, round(wait * 1000)))
+
+    def flush(self) -> None:
+        self._timer.stop()
+        if not self._has_pending:
+            return
+        state = self._pending
+        self._pending = None
+        self._has_pending = False
+        self._last = time.perf_counter()
+        STATS.applied += 1
+        self._apply(state)
@@ -0,0 +1,131 @@
+import bisect
+
+from PySide6 import QtCore
+
+# Distance in screen pixels at which bounds count as lined up.
+GUIDE_TOLERANCE_PX = 1.0
+# How many nearest edges to inspect when looking for a spacing neighbour.
+SPACING_SCAN = 32
+
+
+class _Edges:
+    """Unique coordinates along one axis, sorted for bisect, each with the
+    extent of the shapes sharing it on the other axis."""
+
+    def __init__(self, entries):
+        spans: dict[float, list[float]] = {}
+        for value, lo, hi in entries:
+            span = spans.get(value)
+            if span is None:
+                spans[value] = [lo, hi]
+            else:
+                span[0] = min(span[0], lo)
+                span[1] = max(span[1], hi)
+        self.values = sorted(spans)
+        self.spans = [spans[v] for v in self.values]
+
+    def matches(self, value: float, tol: float):
+        i = bisect.bisect_left(self.values, value - tol)
+        values = self.values
+        while i < len(values) and values[i] <= value + tol:
+            yield values[i], self.spans[i]
+            i += 1
+
+
+class _Neighbours:
+    """Rects sorted by one edge, for finding the nearest one past a point."""
+
+    def __init__(self, rects, key):
+        rects = sorted(rects, key=key)
+        self.keys = [key(r) for r in rects]
+        self.rects = rects
+
+
+class AlignmentGuides:
+    """Alignment and equal-spacing guides for one drag or resize gesture.
+
+    The edges and centres of the shapes that stay put are sorted once when
+    the gesture starts; every mouse move then only does a few bisects.
+    """
+
+    def __init__(self, rects):
+        rects = list(rects)
+        self._x = _Edges(
+            (v, r.top(), r.bottom())
+            for r in rects
+            for v in (r.left(), r.center().x(), r.right())
+        )
+        self._y = _Edges(
+            (v, r.left(), r.right())
+            for r in rects
+            for v in (r.top(), r.center().y(), r.bottom())
+        )
+        self._by_right = _Neighbours(rects, QtCore.QRectF.right)
+        self._by_left = _Neighbours(rects, QtCore.QRectF.left)
+        self._by_bottom = _Neighbours(rects, QtCore.QRectF.bottom)
+        self._by_top = _Neighbours(rects, QtCore.QRectF.top)
+
+    def alignment_lines(self, rect: QtCore.QRectF, tol: float) -> list[QtCore.QLineF]:
+        """Lines through every edge or centre of rect that another shape
+        shares, spanning rect and those shapes."""
+        lines = []
+        for x in (rect.left(), rect.center().x(), rect.right()):
+            for value, (lo, hi) in self._x.matches(x, tol):
+                lines.append(QtCore.QLineF(
+                    value, min(lo, rect.top()), value, max(hi, rect.bottom())
+                ))
+        for y in (rect.top(), rect.center().y(), rect.bottom()):
+            for value, (lo, hi) in self._y.matches(y, tol):
+                lines.append(QtCore.QLineF(
+                    min(lo, rect.left()), value, max(hi, rect.right()), value
+                ))
+        return lines
+
+    def spacing_lines(self, rect: QtCore.QRectF, tol: float) -> list[QtCore.QLineF]:
+        """Gap markers when rect sits midway between its nearest neighbours."""
+        lines = []
+        before = _nearest_before(self._by_right, rect.left() + tol, rect.top(), rect.bottom(), vertical=True)
+        after = _nearest_after(self._by_left, rect.right() - tol, rect.top(), rect.bottom(), vertical=True)
+        if before is not None and after is not None:
+            gap1 = rect.left() - before.right()
+            gap2 = after.left() - rect.right()
+            if gap1 > 0 and abs(gap1 - gap2) <= tol:
+                y = rect.center().y()
+                lines.append(QtCore.QLineF(before.right(), y, rect.left(), y))
+                lines.append(QtCore.QLineF(rect.right(), y, after.left(), y))
+        before = _nearest_before(self._by_bottom, rect.top() + tol, rect.left(), rect.right(), vertical=False)
+        after = _nearest_after(self._by_top, rect.bottom() - tol, rect.left(), rect.right(), vertical=False)
+        if before is not None and after is not None:
+            gap1 = rect.top() - before.bottom()
+            gap2 = after.top() - rect.bottom()
+            if gap1 > 0 and abs(gap1 - gap2) <= tol:
+                x = rect.center().x()
+                lines.append(QtCore.QLineF(x, before.bottom(), x, rect.top()))
+                lines.append(QtCore.QLineF(x, rect.bottom(), x, after.top()))
+        return lines
+
+
+def _overlaps(r: QtCore.QRectF, lo: float, hi: float, vertical: bool) -> bool:
+    if vertical:
+        return r.top() < hi and r.bottom() > lo
+    return r.left() < hi and r.right() > lo
+
+
+def _nearest_before(index: _Neighbours, limit: float, lo: float, hi: float, vertical: bool):
+    i = bisect.bisect_right(index.keys, limit) - 1
+    stop = max(i - SPACING_SCAN, -1)
+    while i > stop:
+        if _overlaps(index.rects[i], lo, hi, vertical):
+            return index.rects[i]
+        i -= 1
+    return None
+
+
+def _nearest_after(index: _Neighbours, limit: float, lo: float, hi: float, vertical: bool):
+    i = bisect.bisect_left(index.keys, limit)
+    stop = min(i + SPACING_SCAN, len(index.keys))
+    while i < stop:
+        if _overlaps(index.rects[i], lo, hi, vertical):
+            return index.rects[i]
+        i += 1
+    return None
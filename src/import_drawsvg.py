@@ -7,14 +7,29 @@ from typing import Any
 
 from PySide6 import QtCore, QtGui, QtWidgets
 
-from items import RectItem, EllipseItem, LineItem, TextItem, TriangleItem
+from canvas_scene import CanvasScene
+from clipboard import build_items
+from commands import AddItemsCommand, RemoveItemsCommand
+from item_pool import ItemPool
+from items import (
+    RectItem, EllipseItem, GroupItem, LineItem, TextItem, TriangleItem, SharedGeometry,
+)
+from shape_data import add_packed, rows_of, unpack
+from virtual_canvas import VIRTUAL_THRESHOLD
 
 
 _ROT_RE = re.compile(r"rotate\(([-0-9.]+)\s+([-0-9.]+)\s+([-0-9.]+)\)")
+_TRANSLATE_RE = re.compile(r"translate\(([-0-9.]+)\s+([-0-9.]+)\)")
+_GROUP_RE = re.compile(r"(_g\d+) = draw\.Group\(")
+_APPEND_RE = re.compile(r"(\w+)\.append\((\w+)\)$")
 
 
 def _parse_call(line: str) -> tuple[list[Any], dict[str, Any]]:
-    """Parse a drawsvg call line and return args and kwargs."""
+    """Parse a drawsvg call line and return args and kwargs.
+
+    Arguments are Python literals, such as text quoted with repr(), or
+    variable names, which are returned as strings.
+    """
     call_src = line.split("=", 1)[1].strip()
     node = ast.parse(call_src, mode="eval").body
     args = []
@@ -63,7 +78,236 @@ def _parse_rotate(val: str) -> float:
     return 0.0
 
 
-def import_drawsvg_py(scene: QtWidgets.QGraphicsScene, parent: QtWidgets.QWidget | None = None) -> None:
+def _parse_path_subpaths(cmd: str) -> list[list[QtCore.QPointF]]:
+    """Split an absolute "M x y L x y ... M ..." path into point lists."""
+    subpaths: list[list[QtCore.QPointF]] = []
+    parts = cmd.split()
+    i = 0
+    while i < len(parts):
+        token = parts[i]
+        if token == "M":
+            subpaths.append([])
+            i += 1
+        elif token == "L" and subpaths:
+            i += 1
+        elif subpaths and i + 1 < len(parts):
+            try:
+                x, y = float(parts[i]), float(parts[i + 1])
+            except ValueError:
+                break
+            subpaths[-1].append(QtCore.QPointF(x, y))
+            i += 2
+        else:
+            break
+    return [pts for pts in subpaths if len(pts) >= 2]
+
+
+def _build_rect(
+    args: list[Any], kwargs: dict[str, Any], pool: ItemPool
+) -> QtWidgets.QGraphicsItem:
+    x, y, w, h = map(float, args[:4])
+    rx = min(float(kwargs.get("rx", 0.0)), 50.0)
+    ry = min(float(kwargs.get("ry", 0.0)), 50.0)
+    if "rx" in kwargs and "ry" not in kwargs:
+        ry = rx
+    if "ry" in kwargs and "rx" not in kwargs:
+        rx = ry
+    item = pool.acquire(RectItem, x, y, w, h, rx, ry)
+    _apply_style(item, kwargs)
+    if "transform" in kwargs:
+        item.setRotation(_parse_rotate(kwargs["transform"]))
+    item.setData(0, "Rectangle")
+    return item
+
+
+def _build_ellipse(
+    args: list[Any], kwargs: dict[str, Any], pool: ItemPool
+) -> QtWidgets.QGraphicsItem:
+    cx, cy, rx, ry = map(float, args[:4])
+    item = pool.acquire(EllipseItem, cx - rx, cy - ry, 2 * rx, 2 * ry)
+    _apply_style(item, kwargs)
+    if "transform" in kwargs:
+        item.setRotation(_parse_rotate(kwargs["transform"]))
+    item.setData(0, "Ellipse")
+    return item
+
+
+def _build_circle(
+    args: list[Any], kwargs: dict[str, Any], pool: ItemPool
+) -> QtWidgets.QGraphicsItem:
+    cx, cy, r = map(float, args[:3])
+    item = pool.acquire(EllipseItem, cx - r, cy - r, 2 * r, 2 * r)
+    _apply_style(item, kwargs)
+    if "transform" in kwargs:
+        item.setRotation(_parse_rotate(kwargs["transform"]))
+    item.setData(0, "Circle")
+    return item
+
+
+def _build_triangle(
+    args: list[Any], kwargs: dict[str, Any], pool: ItemPool
+) -> QtWidgets.QGraphicsItem:
+    coords = [float(a) for a in args]
+    xs = coords[0::2]
+    ys = coords[1::2]
+    x = min(xs)
+    y = min(ys)
+    item = pool.acquire(TriangleItem, x, y, max(xs) - x, max(ys) - y)
+    _apply_style(item, kwargs)
+    if "transform" in kwargs:
+        item.setRotation(_parse_rotate(kwargs["transform"]))
+    item.setData(0, "Triangle")
+    return item
+
+
+def _build_polyline(
+    args: list[Any], kwargs: dict[str, Any], pool: ItemPool
+) -> QtWidgets.QGraphicsItem:
+    coords = list(map(float, args))
+    pts = [
+        QtCore.QPointF(coords[i], coords[i + 1])
+        for i in range(0, len(coords), 2)
+    ]
+    angle = 0.0
+    if "transform" in kwargs:
+        angle = _parse_rotate(kwargs["transform"])
+    item = pool.acquire(LineItem, 0.0, 0.0, points=pts)
+    _apply_style(item, kwargs)
+    item.setRotation(angle)
+    item.setData(0, "Line")
+    return item
+
+
+def _build_line(
+    args: list[Any], kwargs: dict[str, Any], pool: ItemPool
+) -> QtWidgets.QGraphicsItem:
+    x1, y1, x2, y2 = map(float, args[:4])
+    dx, dy = x2 - x1, y2 - y1
+    length = math.hypot(dx, dy)
+    angle = math.degrees(math.atan2(dy, dx))
+    if "transform" in kwargs:
+        angle = _parse_rotate(kwargs["transform"])
+    cx = (x1 + x2) / 2.0
+    cy = (y1 + y2) / 2.0
+    item = pool.acquire(LineItem, cx - length / 2.0, cy, length)
+    _apply_style(item, kwargs)
+    item.setRotation(angle)
+    item.setData(0, "Line")
+    return item
+
+
+def _build_text(
+    args: list[Any], kwargs: dict[str, Any], pool: ItemPool
+) -> QtWidgets.QGraphicsItem:
+    text = args[0]
+    size = float(args[1])
+    x = float(args[2])
+    baseline = float(args[3])
+    item = pool.acquire(TextItem, 0, 0, 0, 0)
+    item.setPlainText(text)
+    font = item.font()
+    font.setPointSizeF(size)
+    item.setFont(font)
+    _apply_style(item, kwargs)
+    br = item.boundingRect()
+    y = baseline - br.height()
+    item.setPos(x, y)
+    item.setTransformOriginPoint(br.width() / 2.0, br.height() / 2.0)
+    if "transform" in kwargs:
+        item.setRotation(_parse_rotate(kwargs["transform"]))
+    item.setData(0, "Text")
+    return item
+
+
+# Single-element lines as written by export_drawsvg, by line prefix.
+_BUILDERS = {
+    "_rect = draw.Rectangle(": _build_rect,
+    "_ell = draw.Ellipse(": _build_ellipse,
+    "_circ = draw.Circle(": _build_circle,
+    "_tri = draw.Lines(": _build_triangle,
+    "_line = draw.Lines(": _build_polyline,
+    "_line = draw.Line(": _build_line,
+    "_text = draw.Text(": _build_text,
+}
+
+_SYMBOL_RE = re.compile(r"(_sym\d+) = draw\.(\w+)\(")
+
+
+def _symbol_builder(call: str, kwargs: dict[str, Any]):
+    if call == "Rectangle":
+        return _build_rect
+    if call == "Ellipse":
+        return _build_ellipse
+    if call == "Circle":
+        return _build_circle
+    if call == "Text":
+        return _build_text
+    if call == "Lines":
+        return _build_triangle if kwargs.get("close") else _build_polyline
+    return None
+
+
+def _build_group(kwargs: dict[str, Any]) -> GroupItem:
+    transform = kwargs.get("transform", "")
+    group = GroupItem()
+    m = _TRANSLATE_RE.search(transform)
+    if m:
+        group.setPos(float(m.group(1)), float(m.group(2)))
+    m = _ROT_RE.search(transform)
+    if m:
+        group.setTransformOriginPoint(float(m.group(2)), float(m.group(3)))
+        group.setRotation(float(m.group(1)))
+    return group
+
+
+def _build_path_items(
+    args: list[Any], kwargs: dict[str, Any], pool: ItemPool
+) -> list[QtWidgets.QGraphicsItem]:
+    if not args:
+        return []
+    arrow_start = "marker_start" in kwargs
+    arrow_end = "marker_end" in kwargs
+    angle = 0.0
+    if "transform" in kwargs:
+        angle = _parse_rotate(kwargs["transform"])
+    items = []
+    # Merged line exports hold one M/L subpath per line.
+    for pts in _parse_path_subpaths(args[0]):
+        item = pool.acquire(
+            LineItem,
+            0.0,
+            0.0,
+            points=pts,
+            arrow_start=arrow_start,
+            arrow_end=arrow_end,
+        )
+        _apply_style(item, kwargs)
+        item.setRotation(angle)
+        item.setData(0, "Arrow" if arrow_start or arrow_end else "Line")
+        items.append(item)
+    return items
+
+
+def _clear_for_rows(scene: CanvasScene) -> None:
+    """Empty the scene before loading rows into its virtualizer."""
+    # Rows without items are outside undo, so the load is final.
+    scene.virtualizer.clear()
+    # Clear the history first: it would pool the discarded items again.
+    scene.undo_stack.clear()
+    scene.discard_items(scene.top_level_items())
+
+
+def _replace_items(scene: CanvasScene, items, text: str) -> None:
+    """Swap the scene content in two bulk steps, undoable as one command."""
+    scene.undo_stack.beginMacro(text)
+    old_items = scene.top_level_items()
+    if old_items:
+        scene.undo_stack.push(RemoveItemsCommand(scene, old_items))
+    scene.undo_stack.push(AddItemsCommand(scene, items))
+    scene.undo_stack.endMacro()
+
+
+def import_drawsvg_py(scene: CanvasScene, parent: QtWidgets.QWidget | None = None) -> None:
     path, _ = QtWidgets.QFileDialog.getOpenFileName(
         parent, "Load drawsvg-.py…", "", "Python (*.py)"
     )
@@ -72,9 +316,60 @@ def import_drawsvg_py(scene: QtWidgets.QGraphicsScene, parent: QtWidgets.QWidget
     try:
         with open(path, "r", encoding="utf-8") as f:
             lines = f.readlines()
-        scene.clear()
+        new_items: list[QtWidgets.QGraphicsItem] = []
+        # Large drawings on a virtualized canvas keep only document rows;
+        # each built item is dropped right after its row is taken.
+        pool = scene.item_pool
+        virtualizer = getattr(scene, "virtualizer", None)
+        # Groups need items, so drawings with groups are never virtualized.
+        virtual = virtualizer is not None and sum(
+            1 for raw in lines if raw.lstrip().startswith("d.append(")
+        ) >= VIRTUAL_THRESHOLD and not any("= draw.Group(" in raw for raw in lines)
+        rows = []
+
+        def keep(item: QtWidgets.QGraphicsItem) -> None:
+            if virtual:
+                rows.append(item.shape_row())
+                pool.release([item])
+            else:
+                new_items.append(item)
+
+        # Built items wait for the append line naming the group or drawing
+        # they go into; (variable, items) of the last built element.
+        built: tuple[str, list[QtWidgets.QGraphicsItem]] | None = None
+        # group variable -> (group, members), in creation order
+        groups: dict[str, tuple[GroupItem, list[QtWidgets.QGraphicsItem]]] = {}
+
+        def place(container: str, items: list[QtWidgets.QGraphicsItem]) -> None:
+            if container in groups:
+                groups[container][1].extend(items)
+            else:
+                for item in items:
+                    keep(item)
+
+        def build(name: str, items: list[QtWidgets.QGraphicsItem]) -> None:
+            nonlocal built
+            if built is not None:  # never appended: keep it in the drawing
+                place("d", built[1])
+            built = (name, items)
+
+        # name -> (builder, args, kwargs, shared geometry) of draw.Use symbols
+        symbols: dict[str, tuple[Any, list[Any], dict[str, Any], SharedGeometry]] = {}
         for raw in lines:
             line = raw.strip()
+            m = _APPEND_RE.match(line)
+            if m:
+                if built is not None and built[0] == m.group(2):
+                    place(m.group(1), built[1])
+                    built = None
+                continue
+            m = _GROUP_RE.match(line)
+            if m:
+                _, kwargs = _parse_call(line)
+                group = _build_group(kwargs)
+                groups[m.group(1)] = (group, [])
+                build(m.group(1), [group])
+                continue
             if line.startswith("d = draw.Drawing("):
                 args, kwargs = _parse_call(line)
                 if len(args) >= 2:
@@ -82,149 +377,83 @@ def import_drawsvg_py(scene: QtWidgets.QGraphicsScene, parent: QtWidgets.QWidget
                     if "origin" in kwargs and isinstance(kwargs["origin"], (tuple, list)):
                         ox, oy = map(float, kwargs["origin"][:2])
                     scene.setSceneRect(float(ox), float(oy), float(args[0]), float(args[1]))
-            elif line.startswith("_rect = draw.Rectangle("):
-                args, kwargs = _parse_call(line)
-                x, y, w, h = map(float, args[:4])
-                rx = min(float(kwargs.get("rx", 0.0)), 50.0)
-                ry = min(float(kwargs.get("ry", 0.0)), 50.0)
-                if "rx" in kwargs and "ry" not in kwargs:
-                    ry = rx
-                if "ry" in kwargs and "rx" not in kwargs:
-                    rx = ry
-                item = RectItem(x, y, w, h, rx, ry)
-                _apply_style(item, kwargs)
-                if "transform" in kwargs:
-                    item.setRotation(_parse_rotate(kwargs["transform"]))
-                item.setData(0, "Rectangle")
-                scene.addItem(item)
-            elif line.startswith("_ell = draw.Ellipse("):
-                args, kwargs = _parse_call(line)
-                cx, cy, rx, ry = map(float, args[:4])
-                x = cx - rx
-                y = cy - ry
-                w = 2 * rx
-                h = 2 * ry
-                item = EllipseItem(x, y, w, h)
-                _apply_style(item, kwargs)
-                if "transform" in kwargs:
-                    item.setRotation(_parse_rotate(kwargs["transform"]))
-                item.setData(0, "Ellipse")
-                scene.addItem(item)
-            elif line.startswith("_circ = draw.Circle("):
+                continue
+            if line.startswith("_path = draw.Path("):
                 args, kwargs = _parse_call(line)
-                cx, cy, r = map(float, args[:3])
-                x = cx - r
-                y = cy - r
-                w = h = 2 * r
-                item = EllipseItem(x, y, w, h)
-                _apply_style(item, kwargs)
-                if "transform" in kwargs:
-                    item.setRotation(_parse_rotate(kwargs["transform"]))
-                item.setData(0, "Circle")
-                scene.addItem(item)
-            elif line.startswith("_tri = draw.Lines("):
+                build("_path", _build_path_items(args, kwargs, pool))
+                continue
+            if line.startswith("_use = draw.Use("):
                 args, kwargs = _parse_call(line)
-                coords = [float(a) for a in args]
-                xs = coords[0::2]
-                ys = coords[1::2]
-                x = min(xs)
-                y = min(ys)
-                w = max(xs) - x
-                h = max(ys) - y
-                item = TriangleItem(x, y, w, h)
-                _apply_style(item, kwargs)
+                symbol = symbols.get(args[0]) if args else None
+                if symbol is None:
+                    continue
+                builder, sym_args, sym_kwargs, shared = symbol
+                item = builder(sym_args, sym_kwargs, pool)
+                item.moveBy(float(args[1]), float(args[2]))
                 if "transform" in kwargs:
                     item.setRotation(_parse_rotate(kwargs["transform"]))
-                item.setData(0, "Triangle")
-                scene.addItem(item)
-            elif line.startswith("_path = draw.Path("):
-                args, kwargs = _parse_call(line)
-                if args:
-                    cmd = args[0]
-                    parts = cmd.split()
-                    if len(parts) >= 6 and parts[0] == "M":
-                        coords: list[float] = []
-                        i = 1
-                        while i < len(parts):
-                            coords.append(float(parts[i]))
-                            coords.append(float(parts[i + 1]))
-                            i += 2
-                            if i < len(parts) and parts[i] == "L":
-                                i += 1
-                            else:
-                                break
-                        if len(coords) >= 4:
-                            pts = [
-                                QtCore.QPointF(coords[i], coords[i + 1])
-                                for i in range(0, len(coords), 2)
-                            ]
-                            arrow_start = "marker_start" in kwargs
-                            arrow_end = "marker_end" in kwargs
-                            angle = 0.0
-                            if "transform" in kwargs:
-                                angle = _parse_rotate(kwargs["transform"])
-                            item = LineItem(
-                                0.0,
-                                0.0,
-                                points=pts,
-                                arrow_start=arrow_start,
-                                arrow_end=arrow_end,
-                            )
-                            _apply_style(item, kwargs)
-                            item.setRotation(angle)
-                            item.setData(0, "Arrow" if arrow_start or arrow_end else "Line")
-                            scene.addItem(item)
-            elif line.startswith("_line = draw.Lines("):
-                args, kwargs = _parse_call(line)
-                coords = list(map(float, args))
-                pts = [
-                    QtCore.QPointF(coords[i], coords[i + 1])
-                    for i in range(0, len(coords), 2)
-                ]
-                angle = 0.0
-                if "transform" in kwargs:
-                    angle = _parse_rotate(kwargs["transform"])
-                item = LineItem(0.0, 0.0, points=pts)
-                _apply_style(item, kwargs)
-                item.setRotation(angle)
-                item.setData(0, "Line")
-                scene.addItem(item)
-            elif line.startswith("_line = draw.Line("):
-                args, kwargs = _parse_call(line)
-                x1, y1, x2, y2 = map(float, args[:4])
-                dx, dy = x2 - x1, y2 - y1
-                length = math.hypot(dx, dy)
-                angle = math.degrees(math.atan2(dy, dx))
-                if "transform" in kwargs:
-                    angle = _parse_rotate(kwargs["transform"])
-                cx = (x1 + x2) / 2.0
-                cy = (y1 + y2) / 2.0
-                item = LineItem(cx - length / 2.0, cy, length)
-                _apply_style(item, kwargs)
-                item.setRotation(angle)
-                item.setData(0, "Line")
-                scene.addItem(item)
-            elif line.startswith("_text = draw.Text("):
+                item.shared_geometry = shared
+                build("_use", [item])
+                continue
+            m = _SYMBOL_RE.match(line)
+            if m:
                 args, kwargs = _parse_call(line)
-                text = args[0]
-                size = float(args[1])
-                x = float(args[2])
-                baseline = float(args[3])
-                item = TextItem(0, 0, 0, 0)
-                item.setPlainText(text)
-                font = item.font()
-                font.setPointSizeF(size)
-                item.setFont(font)
-                _apply_style(item, kwargs)
-                br = item.boundingRect()
-                y = baseline - br.height()
-                item.setPos(x, y)
-                item.setTransformOriginPoint(br.width() / 2.0, br.height() / 2.0)
-                if "transform" in kwargs:
-                    item.setRotation(_parse_rotate(kwargs["transform"]))
-                item.setData(0, "Text")
-                scene.addItem(item)
+                builder = _symbol_builder(m.group(2), kwargs)
+                if builder is not None:
+                    symbols[m.group(1)] = (builder, args, kwargs, SharedGeometry())
+                continue
+            for prefix, builder in _BUILDERS.items():
+                if line.startswith(prefix):
+                    args, kwargs = _parse_call(line)
+                    build(prefix.split(" ", 1)[0], [builder(args, kwargs, pool)])
+                    break
+        if built is not None:
+            place("d", built[1])
+        # Inner groups are created after their parents; fill them first so
+        # each group's bounds include its complete members.
+        for group, members in reversed(list(groups.values())):
+            for z, item in enumerate(members):
+                group.add_member(item, item.x(), item.y(), item.rotation(), float(z))
+            group.update_bounds()
+        if virtual:
+            _clear_for_rows(scene)
+            virtualizer.load(rows)
+            message = f"Loaded: {path} ({len(rows)} shapes, virtualized)"
+        else:
+            _replace_items(scene, new_items, "Load drawsvg-.py")
+            message = f"Loaded: {path}"
         if parent is not None:
-            parent.statusBar().showMessage(f"Loaded: {path}", 5000)
+            parent.statusBar().showMessage(message, 5000)
     except Exception as e:
         QtWidgets.QMessageBox.critical(parent, "Error loading file", str(e))
+
+
+def open_shapes_file(scene: CanvasScene, parent: QtWidgets.QWidget | None = None) -> None:
+    """Replace the drawing by the shapes of a file written by
+    scene_api.Scene.save()."""
+    path, _ = QtWidgets.QFileDialog.getOpenFileName(
+        parent, "Open shapes…", "", "Canvas shapes (*.dsvc)"
+    )
+    if not path:
+        return
+    try:
+        with open(path, "rb") as f:
+            packed = unpack(f.read())
+        n = len(packed.ints)
+        # The rows go straight into the document on a virtualized canvas.
+        if (
+            getattr(scene, "virtualizer", None) is not None
+            and n >= VIRTUAL_THRESHOLD
+            and not packed.has_groups()
+        ):
+            _clear_for_rows(scene)
+            scene.virtualizer.load_rows(add_packed(scene.document, packed))
+            message = f"Opened: {path} ({n} shapes, virtualized)"
+        else:
+            rows, parents = rows_of(packed)
+            _replace_items(scene, build_items(rows, parents, scene.item_pool), "Open shapes")
+            message = f"Opened: {path}"
+        if parent is not None:
+            parent.statusBar().showMessage(message, 5000)
+    except Exception as e:
+        QtWidgets.QMessageBox.critical(parent, "Error opening file", str(e))
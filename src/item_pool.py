@@ -0,0 +1,127 @@
+from items import EllipseItem, LineItem, RectItem, TextItem, TriangleItem
+
+# Most spare items kept per type; items released beyond it are left to the
+# garbage collector.
+POOL_LIMIT = 50000
+
+# Shape types that can be reset to their constructor state.
+POOLED_TYPES = frozenset((RectItem, EllipseItem, TriangleItem, LineItem, TextItem))
+# Item type for the shape name of a document row.
+ROW_TYPES = {
+    "Rectangle": RectItem,
+    "Ellipse": EllipseItem,
+    "Circle": EllipseItem,
+    "Triangle": TriangleItem,
+    "Line": LineItem,
+    "Arrow": LineItem,
+    "Text": TextItem,
+}
+
+
+def new_item(cls):
+    """A placeholder item of cls, to be set up with apply_row()."""
+    if cls is LineItem:
+        return LineItem(0.0, 0.0, 1.0)
+    return cls(0.0, 0.0, 1.0, 1.0)
+
+
+class ItemPool:
+    """Spare shape items, per type, reused instead of building new ones.
+
+    Loading, clearing and virtualization release the items they drop and
+    take new ones from here, so reloading a drawing mostly reuses the
+    objects of the previous one. Spare items keep their handle children.
+    """
+
+    def __init__(self, limit: int = POOL_LIMIT):
+        self._free: dict[type, list] = {}
+        # id() of every spare item, so an item is never pooled twice.
+        self._pooled: set[int] = set()
+        self.limit = limit
+        self.created = 0
+        self.reused = 0
+        self.dropped = 0
+
+    def size(self) -> int:
+        """Number of spare items of all types."""
+        return sum(len(free) for free in self._free.values())
+
+    def summary(self) -> str:
+        return (
+            f"Item pool: {self.size()} spare items, {self.created} created, "
+            f"{self.reused} reused, {self.dropped} dropped (limit {self.limit} per type)"
+        )
+
+    def set_limit(self, limit: int) -> None:
+        """Change the high-water mark, dropping spare items above it."""
+        self.limit = limit
+        for free in self._free.values():
+            self.dropped += max(0, len(free) - limit)
+            for item in free[limit:]:
+                self._pooled.discard(id(item))
+            del free[limit:]
+
+    def take(self, cls):
+        """A spare item of cls as it was released, or None."""
+        free = self._free.get(cls)
+        if not free:
+            return None
+        self.reused += 1
+        item = free.pop()
+        self._pooled.discard(id(item))
+        return item
+
+    def acquire(self, cls, *args, **kwargs):
+        """An item set up as cls(*args, **kwargs) would be, reused when a
+        spare one is available."""
+        item = self.take(cls) if cls in POOLED_TYPES else None
+        if item is None:
+            self.created += 1
+            return cls(*args, **kwargs)
+        item.reset(*args, **kwargs)
+        return item
+
+    def acquire_row(self, row):
+        """An item showing the shape stored in a document row."""
+        cls = ROW_TYPES[row.shape]
+        item = self.take(cls)
+        if item is None:
+            self.created += 1
+            item = new_item(cls)
+        item.apply_row(row)
+        return item
+
+    def release(self, items) -> None:
+        """Keep items that nothing refers to any more for reuse.
+
+        Items still in a scene, group members, items already pooled and
+        types without a reset are skipped.
+        """
+        limit = self.limit
+        for item in items:
+            cls = type(item)
+            if (
+                cls not in POOLED_TYPES or item.scene() is not None
+                or item.parentItem() is not None or id(item) in self._pooled
+            ):
+                continue
+            free = self._free.setdefault(cls, [])
+            if len(free) >= limit:
+                self.dropped += 1
+                continue
+            # Only what differs is reset: every change runs itemChange().
+            if item.isSelected():
+                item.setSelected(False)
+            if not item.isVisible():
+                item.setVisible(True)
+            if item.rotation():
+                item.setRotation(0.0)
+            if item.zValue():
+                item.setZValue(0.0)
+            item.setData(0, None)
+            item.shared_geometry = None
+            hide_handles = getattr(item, "hide_handles", None)
+            if hide_handles is not None:
+                hide_handles()
+            free.append(item)
+            self._pooled.add(id(item))
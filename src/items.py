@@ -1,26 +1,218 @@
+import itertools
 import math
 
 from PySide6 import QtCore, QtGui, QtWidgets
 
-from constants import PEN_NORMAL, PEN_SELECTED
+from constants import GROUP, OVERLAY_Z, PEN_NORMAL, PEN_SELECTED
+from document import ARROW_END, ARROW_SIZE, ARROW_START, ShapeRow
+from frame_pacer import FramePacer
 
 
 HANDLE_COLOR = QtGui.QColor("#14b5ff")
 HANDLE_SIZE = 8.0
 HANDLE_OFFSET = 10.0
 
+_uid_counter = itertools.count(1)
+
 
 def snap_to_grid(item: QtWidgets.QGraphicsItem, pos: QtCore.QPointF) -> QtCore.QPointF:
-    """Return pos aligned to the view's grid, if available."""
+    """Return pos aligned to the scene's grid, or to nearby shapes while
+    item is dragged with object snapping on."""
+    scene = item.scene()
+    size = getattr(scene, "grid_size", 0)
+    if not size or scene.geometry_batch_depth:
+        return pos
+    session = scene.snap_session
+    if session is not None and item in session:
+        return session.snap(item, pos, size)
+    x = round(pos.x() / size) * size
+    y = round(pos.y() / size) * size
+    return QtCore.QPointF(x, y)
+
+
+def snap_point(item: QtWidgets.QGraphicsItem, pos: QtCore.QPointF) -> QtCore.QPointF:
+    """Like snap_to_grid, for a scene point edited on item (a line vertex)."""
+    scene = item.scene()
+    size = getattr(scene, "grid_size", 0)
+    if not size:
+        return pos
+    if scene.snap_session is not None:
+        return scene.snap_session.snap_point(pos, size)
+    return QtCore.QPointF(round(pos.x() / size) * size, round(pos.y() / size) * size)
+
+
+def in_geometry_batch(item: QtWidgets.QGraphicsItem) -> bool:
     scene = item.scene()
-    if scene:
-        views = scene.views()
-        if views:
-            size = getattr(views[0], "_grid_size", 20)
-            x = round(pos.x() / size) * size
-            y = round(pos.y() / size) * size
-            return QtCore.QPointF(x, y)
-    return pos
+    return bool(getattr(scene, "geometry_batch_depth", 0))
+
+
+class SharedGeometry:
+    """Identity token shared by shapes that differ only in placement.
+
+    Ctrl+drag clones and shapes imported from one draw.Use symbol reference
+    the same instance; changing a shape's geometry or style detaches it. The
+    export emits linked shapes as one symbol without comparing them again.
+    """
+
+    __slots__ = ()
+
+
+# Item changes looked up once: itemChange runs several times for every
+# moved item.
+_Change = QtWidgets.QGraphicsItem.GraphicsItemChange
+_POSITION_CHANGE = _Change.ItemPositionChange
+_SELECTED_CHANGED = _Change.ItemSelectedHasChanged
+# Changes that bump a shape's revision.
+_TOUCH_CHANGES = frozenset((
+    _Change.ItemPositionHasChanged,
+    _Change.ItemRotationHasChanged,
+    _Change.ItemZValueHasChanged,
+    _Change.ItemTransformOriginPointHasChanged,
+))
+# How each of those changes is written through to the shape's document row.
+_WRITE_THROUGH = {
+    _Change.ItemPositionHasChanged: lambda doc, it, v: doc.set_position(it, v.x(), v.y()),
+    _Change.ItemRotationHasChanged: lambda doc, it, v: doc.set_rotation(it, v),
+    _Change.ItemZValueHasChanged: lambda doc, it, v: doc.set_z(it, v),
+    _Change.ItemTransformOriginPointHasChanged: lambda doc, it, v: doc.set_origin(it, v.x(), v.y()),
+}
+# Changes after which visible handles are laid out again.
+_HANDLE_CHANGES = frozenset((
+    _Change.ItemPositionHasChanged,
+    _Change.ItemTransformHasChanged,
+))
+
+
+class RevisionMixin:
+    """Mixin giving shapes a stable uid and a revision bumped on every change
+    that affects export: geometry, style, rotation, text and z-order.
+
+    Each shape class defines shape_row(), giving its current values for its
+    document row, and _apply_geometry(row), taking over the size, style and
+    points of a row.
+    """
+
+    _uid = 0
+    _revision = 0
+    _style: tuple | None = None
+    shared_geometry: SharedGeometry | None = None
+
+    def uid(self) -> int:
+        if not self._uid:
+            self._uid = next(_uid_counter)
+        return self._uid
+
+    def revision(self) -> int:
+        return self._revision
+
+    def touch(self) -> None:
+        self._revision += 1
+        scene = self.scene()  # type: ignore[attr-defined]
+        if scene is not None and getattr(scene, "shape_index", None) is not None:
+            scene.shape_changed(self)
+
+    def touch_geometry(self) -> None:
+        """Record a geometry or style change, which also ends any sharing."""
+        self.shared_geometry = None
+        self.touch()
+        scene = self.scene()  # type: ignore[attr-defined]
+        document = getattr(scene, "document", None)
+        # A geometry batch writes its rows once when it is done.
+        if document is not None and not scene.geometry_batch_depth and self in document:
+            document.write(self, self.shape_row())  # type: ignore[attr-defined]
+
+    def apply_row(self, row: ShapeRow) -> None:
+        """Take over the shape stored in a document row, e.g. when an item
+        is recycled for another shape."""
+        self.setData(0, row.shape)  # type: ignore[attr-defined]
+        self._apply_geometry(row)  # type: ignore[attr-defined]
+        self.setPos(row.x, row.y)  # type: ignore[attr-defined]
+        self.setRotation(row.rotation)  # type: ignore[attr-defined]
+        self.setZValue(row.z)  # type: ignore[attr-defined]
+        self.setTransformOriginPoint(row.ox, row.oy)  # type: ignore[attr-defined]
+
+    def _make_row(self, w: float, h: float, style: tuple, **extra) -> ShapeRow:
+        pos = self.pos()  # type: ignore[attr-defined]
+        origin = self.transformOriginPoint()  # type: ignore[attr-defined]
+        return ShapeRow(
+            self.data(0), pos.x(), pos.y(), w, h,  # type: ignore[attr-defined]
+            self.rotation(), origin.x(), origin.y(), self.zValue(),  # type: ignore[attr-defined]
+            self.boundingRect().getRect(), style, **extra,  # type: ignore[attr-defined]
+        )
+
+    def setPen(self, pen):
+        super().setPen(pen)  # type: ignore[misc]
+        self._style = None
+        self.touch_geometry()
+
+    def setBrush(self, brush):
+        super().setBrush(brush)  # type: ignore[misc]
+        self._style = None
+        self.touch_geometry()
+
+    def itemChange(self, change, value):  # type: ignore[override]
+        if change in _TOUCH_CHANGES:
+            self.touch()
+            scene = self.scene()  # type: ignore[attr-defined]
+            document = getattr(scene, "document", None)
+            if document is not None and not scene.geometry_batch_depth:
+                _WRITE_THROUGH[change](document, self, value)
+        return super().itemChange(change, value)  # type: ignore[misc]
+
+
+def _shape_style(item) -> tuple:
+    """Style tuple of a pen-and-brush shape for its document row, cached
+    until the next setPen() or setBrush()."""
+    style = item._style
+    if style is not None:
+        return style
+    brush = item.brush()
+    if brush.style() == QtCore.Qt.BrushStyle.NoBrush:
+        fill, fill_opacity = None, 1.0
+    else:
+        fill, fill_opacity = brush.color().name(), brush.color().alphaF()
+    pen = item.pen()
+    item._style = fill, fill_opacity, pen.color().name(), pen.widthF(), 0.0
+    return item._style
+
+
+def _apply_shape_style(item, style: tuple) -> None:
+    fill, fill_opacity, stroke, stroke_width, _ = style
+    if fill is None:
+        item.setBrush(QtCore.Qt.BrushStyle.NoBrush)
+    else:
+        color = QtGui.QColor(fill)
+        color.setAlphaF(fill_opacity)
+        item.setBrush(color)
+    pen = QtGui.QPen(PEN_NORMAL)
+    pen.setColor(QtGui.QColor(stroke))
+    pen.setWidthF(stroke_width)
+    item.setPen(pen)
+    item._style = style
+
+
+def _flat_points(points) -> tuple[float, ...]:
+    flat: list[float] = []
+    for p in points:
+        flat.extend((p.x(), p.y()))
+    return tuple(flat)
+
+
+def arrow_head_polygon(
+    start: QtCore.QPointF, end: QtCore.QPointF, size: float
+) -> QtGui.QPolygonF:
+    """Triangle of an arrow head at end, pointing away from start."""
+    line = QtCore.QLineF(start, end)
+    angle = math.atan2(-line.dy(), line.dx())
+    p1 = end + QtCore.QPointF(
+        math.sin(angle - math.pi / 3) * size,
+        math.cos(angle - math.pi / 3) * size,
+    )
+    p2 = end + QtCore.QPointF(
+        math.sin(angle - math.pi + math.pi / 3) * size,
+        math.cos(angle - math.pi + math.pi / 3) * size,
+    )
+    return QtGui.QPolygonF([end, p1, p2])
 
 
 class ResizeHandle(QtWidgets.QGraphicsEllipseItem):
@@ -37,6 +229,7 @@ class ResizeHandle(QtWidgets.QGraphicsEllipseItem):
         self._start_pos = None
         self._parent_start_pos = None
         self._parent_was_movable = False
+        self._pacer = None
 
     @staticmethod
     def _cursor_for_direction(direction: str) -> QtCore.Qt.CursorShape:
@@ -75,7 +268,13 @@ class ResizeHandle(QtWidgets.QGraphicsEllipseItem):
         if self._start_pos is None:
             event.ignore()
             return
-        delta = event.scenePos() - self._start_pos
+        if self._pacer is None:
+            self._pacer = FramePacer(self._apply_resize)
+        self._pacer.push(event.scenePos())
+        event.accept()
+
+    def _apply_resize(self, scene_pos: QtCore.QPointF):
+        delta = scene_pos - self._start_pos
         parent = self.parentItem()
         rect = QtCore.QRectF(self._start_rect)
         pos = QtCore.QPointF(self._parent_start_pos)
@@ -115,9 +314,10 @@ class ResizeHandle(QtWidgets.QGraphicsEllipseItem):
         parent.setPos(pos)
         if hasattr(parent, "update_handles"):
             parent.update_handles()
-        event.accept()
 
     def mouseReleaseEvent(self, event: QtWidgets.QGraphicsSceneMouseEvent):
+        if self._pacer is not None:
+            self._pacer.flush()
         parent = self.parentItem()
         if self._parent_was_movable:
             parent.setFlag(
@@ -162,6 +362,7 @@ class RotationHandle(QtWidgets.QGraphicsPixmapItem):
         self._parent_was_movable = False
         self._angle_label: QtWidgets.QGraphicsSimpleTextItem | None = None
         self._angle_label_bg: QtWidgets.QGraphicsRectItem | None = None
+        self._pacer = None
 
     def mousePressEvent(self, event: QtWidgets.QGraphicsSceneMouseEvent):
         parent = self.parentItem()
@@ -182,13 +383,13 @@ class RotationHandle(QtWidgets.QGraphicsPixmapItem):
             scene = parent.scene()
             if self._angle_label is None:
                 self._angle_label = QtWidgets.QGraphicsSimpleTextItem()
-                self._angle_label.setZValue(1001)
+                self._angle_label.setZValue(OVERLAY_Z + 1)
                 scene.addItem(self._angle_label)
             if self._angle_label_bg is None:
                 self._angle_label_bg = QtWidgets.QGraphicsRectItem()
                 self._angle_label_bg.setBrush(QtGui.QColor(220, 220, 220))
                 self._angle_label_bg.setPen(QtGui.QPen(QtCore.Qt.PenStyle.NoPen))
-                self._angle_label_bg.setZValue(1000)
+                self._angle_label_bg.setZValue(OVERLAY_Z)
                 scene.addItem(self._angle_label_bg)
         self._update_label(parent.rotation())
         event.accept()
@@ -197,23 +398,29 @@ class RotationHandle(QtWidgets.QGraphicsPixmapItem):
         if self._start_angle is None:
             event.ignore()
             return
-        pos = event.scenePos()
+        if self._pacer is None:
+            self._pacer = FramePacer(self._apply_rotation)
+        self._pacer.push((event.scenePos(), event.modifiers()))
+        event.accept()
+
+    def _apply_rotation(self, state) -> None:
+        pos, mods = state
         angle = math.degrees(
             math.atan2(pos.y() - self._center.y(), pos.x() - self._center.x())
         )
         delta = angle - self._start_angle
         parent = self.parentItem()
         new_angle = self._start_rotation + delta
-        mods = QtWidgets.QApplication.keyboardModifiers()
         if not mods & QtCore.Qt.KeyboardModifier.AltModifier:
             new_angle = round(new_angle / 5.0) * 5.0
         parent.setRotation(new_angle)
         self._update_label(parent.rotation())
         if hasattr(parent, "update_handles"):
             parent.update_handles()
-        event.accept()
 
     def mouseReleaseEvent(self, event: QtWidgets.QGraphicsSceneMouseEvent):
+        if self._pacer is not None:
+            self._pacer.flush()
         parent = self.parentItem()
         if self._parent_was_movable:
             parent.setFlag(
@@ -319,20 +526,20 @@ class ResizableItem:
             self._rotation_handle.hide()
 
     def itemChange(self, change, value):  # type: ignore[override]
-        if change == QtWidgets.QGraphicsItem.GraphicsItemChange.ItemPositionChange:
+        if change == _POSITION_CHANGE:
             mods = QtWidgets.QApplication.keyboardModifiers()
             if not mods & QtCore.Qt.KeyboardModifier.AltModifier:
                 value = snap_to_grid(self, value)
-        elif change == QtWidgets.QGraphicsItem.GraphicsItemChange.ItemSelectedHasChanged:
-            if value:
+        elif change == _SELECTED_CHANGED:
+            note = getattr(self.scene(), "note_selection_change", None)
+            if note is not None:
+                note(self)
+            elif value:
                 self.show_handles()
             else:
                 self.hide_handles()
-        elif change in (
-            QtWidgets.QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged,
-            QtWidgets.QGraphicsItem.GraphicsItemChange.ItemTransformHasChanged,
-        ):
-            if self.isSelected():
+        elif change in _HANDLE_CHANGES:
+            if self.isSelected() and not in_geometry_batch(self):
                 self.update_handles()
         return super().itemChange(change, value)  # type: ignore[misc]
 
@@ -390,23 +597,68 @@ class LineHandle(QtWidgets.QGraphicsEllipseItem):
         event.accept()
 
 
-class RectItem(ResizableItem, QtWidgets.QGraphicsRectItem):
+class RectItem(RevisionMixin, ResizableItem, QtWidgets.QGraphicsRectItem):
     def __init__(self, x, y, w, h, rx: float = 0.0, ry: float = 0.0):
         QtWidgets.QGraphicsRectItem.__init__(self, 0, 0, w, h)
         ResizableItem.__init__(self)
-        self.setPos(x, y)
-        self.setTransformOriginPoint(w / 2.0, h / 2.0)
+        self.reset(x, y, w, h, rx, ry)
         self.setFlags(
             QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsMovable
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsFocusable
         )
+
+    def reset(self, x, y, w, h, rx: float = 0.0, ry: float = 0.0) -> None:
+        """Set the item up as the constructor does, e.g. when an ItemPool
+        hands it out again."""
+        self.setRect(0, 0, w, h)
+        self.setPos(x, y)
+        self.setTransformOriginPoint(w / 2.0, h / 2.0)
         self.setPen(PEN_NORMAL)
         self.setBrush(QtCore.Qt.BrushStyle.NoBrush)
         self.rx = rx
         self.ry = ry
 
+    @property
+    def rx(self) -> float:
+        return self._rx
+
+    @rx.setter
+    def rx(self, value: float) -> None:
+        self._rx = value
+        self.touch_geometry()
+
+    @property
+    def ry(self) -> float:
+        return self._ry
+
+    @ry.setter
+    def ry(self, value: float) -> None:
+        self._ry = value
+        self.touch_geometry()
+
+    def setRect(self, *args):
+        super().setRect(*args)
+        self.touch_geometry()
+
+    def size(self) -> tuple[float, float]:
+        r = self.rect()
+        return r.width(), r.height()
+
+    def set_size(self, w, h):
+        self.setRect(0, 0, w, h)
+        self.setTransformOriginPoint(w / 2.0, h / 2.0)
+
+    def shape_row(self) -> ShapeRow:
+        return self._make_row(*self.size(), _shape_style(self), rx=self._rx, ry=self._ry)
+
+    def _apply_geometry(self, row: ShapeRow) -> None:
+        self.set_size(row.w, row.h)
+        self.rx = row.rx
+        self.ry = row.ry
+        _apply_shape_style(self, row.style)
+
     def paint(self, painter, option, widget=None):
         if self.rx or self.ry:
             painter.setPen(self.pen())
@@ -425,21 +677,46 @@ class RectItem(ResizableItem, QtWidgets.QGraphicsRectItem):
             painter.restore()
 
 
-class EllipseItem(ResizableItem, QtWidgets.QGraphicsEllipseItem):
+class EllipseItem(RevisionMixin, ResizableItem, QtWidgets.QGraphicsEllipseItem):
     def __init__(self, x, y, w, h):
         QtWidgets.QGraphicsEllipseItem.__init__(self, 0, 0, w, h)
         ResizableItem.__init__(self)
-        self.setPos(x, y)
-        self.setTransformOriginPoint(w / 2.0, h / 2.0)
+        self.reset(x, y, w, h)
         self.setFlags(
             QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsMovable
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsFocusable
         )
+
+    def reset(self, x, y, w, h) -> None:
+        """Set the item up as the constructor does, e.g. when an ItemPool
+        hands it out again."""
+        self.setRect(0, 0, w, h)
+        self.setPos(x, y)
+        self.setTransformOriginPoint(w / 2.0, h / 2.0)
         self.setPen(PEN_NORMAL)
         self.setBrush(QtCore.Qt.BrushStyle.NoBrush)
 
+    def setRect(self, *args):
+        super().setRect(*args)
+        self.touch_geometry()
+
+    def size(self) -> tuple[float, float]:
+        r = self.rect()
+        return r.width(), r.height()
+
+    def set_size(self, w, h):
+        self.setRect(0, 0, w, h)
+        self.setTransformOriginPoint(w / 2.0, h / 2.0)
+
+    def shape_row(self) -> ShapeRow:
+        return self._make_row(*self.size(), _shape_style(self))
+
+    def _apply_geometry(self, row: ShapeRow) -> None:
+        self.set_size(row.w, row.h)
+        _apply_shape_style(self, row.style)
+
     def paint(self, painter, option, widget=None):
         super().paint(painter, option, widget)
         if self.isSelected():
@@ -450,21 +727,26 @@ class EllipseItem(ResizableItem, QtWidgets.QGraphicsEllipseItem):
             painter.restore()
 
 
-class TriangleItem(ResizableItem, QtWidgets.QGraphicsPolygonItem):
+class TriangleItem(RevisionMixin, ResizableItem, QtWidgets.QGraphicsPolygonItem):
     def __init__(self, x, y, w, h):
         QtWidgets.QGraphicsPolygonItem.__init__(self)
         ResizableItem.__init__(self)
-        self._w = w
-        self._h = h
-        self._update_polygon()
-        self.setPos(x, y)
-        self.setTransformOriginPoint(w / 2.0, h / 2.0)
+        self.reset(x, y, w, h)
         self.setFlags(
             QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsMovable
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsFocusable
         )
+
+    def reset(self, x, y, w, h) -> None:
+        """Set the item up as the constructor does, e.g. when an ItemPool
+        hands it out again."""
+        self._w = w
+        self._h = h
+        self._update_polygon()
+        self.setPos(x, y)
+        self.setTransformOriginPoint(w / 2.0, h / 2.0)
         self.setPen(PEN_NORMAL)
         self.setBrush(QtCore.Qt.BrushStyle.NoBrush)
 
@@ -477,6 +759,10 @@ class TriangleItem(ResizableItem, QtWidgets.QGraphicsPolygonItem):
             ]
         )
         self.setPolygon(poly)
+        self.touch_geometry()
+
+    def size(self) -> tuple[float, float]:
+        return self._w, self._h
 
     def set_size(self, w, h):
         self._w = w
@@ -484,6 +770,15 @@ class TriangleItem(ResizableItem, QtWidgets.QGraphicsPolygonItem):
         self._update_polygon()
         self.setTransformOriginPoint(w / 2.0, h / 2.0)
 
+    def shape_row(self) -> ShapeRow:
+        return self._make_row(
+            self._w, self._h, _shape_style(self), points=_flat_points(self.polygon())
+        )
+
+    def _apply_geometry(self, row: ShapeRow) -> None:
+        self.set_size(row.w, row.h)
+        _apply_shape_style(self, row.style)
+
     def paint(self, painter, option, widget=None):
         super().paint(painter, option, widget)
         if self.isSelected():
@@ -494,7 +789,7 @@ class TriangleItem(ResizableItem, QtWidgets.QGraphicsPolygonItem):
             painter.restore()
 
 
-class LineItem(QtWidgets.QGraphicsPathItem):
+class LineItem(RevisionMixin, QtWidgets.QGraphicsPathItem):
     def __init__(
         self,
         x: float,
@@ -505,24 +800,37 @@ class LineItem(QtWidgets.QGraphicsPathItem):
         points: list[QtCore.QPointF] | None = None,
     ):
         super().__init__()
-        self.setPos(x, y)
+        self._arrow_size = ARROW_SIZE
+        self._handles: list[LineHandle] = []
+        self._mid_handles: list[LineHandle] = []
+        self.reset(x, y, length, arrow_start, arrow_end, points)
         self.setFlags(
             QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsMovable
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsFocusable
         )
+
+    def reset(
+        self,
+        x: float,
+        y: float,
+        length: float | None = None,
+        arrow_start: bool = False,
+        arrow_end: bool = False,
+        points: list[QtCore.QPointF] | None = None,
+    ) -> None:
+        """Set the item up as the constructor does, e.g. when an ItemPool
+        hands it out again."""
+        self.setPos(x, y)
         self.setPen(PEN_NORMAL)
         self.arrow_start = arrow_start
         self.arrow_end = arrow_end
-        self._arrow_size = 10.0
         if points is not None:
             self._points = [QtCore.QPointF(p) for p in points]
         else:
             self._points = [QtCore.QPointF(0.0, 0.0), QtCore.QPointF(length or 0.0, 0.0)]
         self._moving_index: int | None = None
-        self._handles: list[LineHandle] = []
-        self._mid_handles: list[LineHandle] = []
         self._update_path()
         self.update_handles()
         self.hide_handles()
@@ -543,6 +851,7 @@ class LineItem(QtWidgets.QGraphicsPathItem):
         for p in self._points[1:]:
             path.lineTo(p)
         self.setPath(path)
+        self.touch_geometry()
         self._update_length()
         self.setTransformOriginPoint(self._compute_center())
 
@@ -556,7 +865,7 @@ class LineItem(QtWidgets.QGraphicsPathItem):
         mods = event.modifiers()
         new_pos = event.scenePos()
         if not mods & QtCore.Qt.KeyboardModifier.AltModifier:
-            new_pos = snap_to_grid(self, new_pos)
+            new_pos = snap_point(self, new_pos)
         self._points[self._moving_index] = self.mapFromScene(new_pos)
         self._update_path()
         self.update_handles()
@@ -566,14 +875,32 @@ class LineItem(QtWidgets.QGraphicsPathItem):
         if self.arrow_start != val:
             self.prepareGeometryChange()
             self.arrow_start = val
+            self.touch_geometry()
             self.update()
 
     def set_arrow_end(self, val: bool) -> None:
         if self.arrow_end != val:
             self.prepareGeometryChange()
             self.arrow_end = val
+            self.touch_geometry()
             self.update()
 
+    def shape_row(self) -> ShapeRow:
+        flags = (ARROW_START if self.arrow_start else 0) | (ARROW_END if self.arrow_end else 0)
+        return self._make_row(
+            0.0, 0.0, _shape_style(self), points=_flat_points(self._points), flags=flags
+        )
+
+    def _apply_geometry(self, row: ShapeRow) -> None:
+        pts = row.points
+        self._points = [QtCore.QPointF(pts[i], pts[i + 1]) for i in range(0, len(pts), 2)]
+        self.set_arrow_start(bool(row.flags & ARROW_START))
+        self.set_arrow_end(bool(row.flags & ARROW_END))
+        _apply_shape_style(self, row.style)
+        self._update_path()
+        self.update_handles()
+        self.hide_handles()
+
     def boundingRect(self):  # type: ignore[override]
         br = super().boundingRect()
         if self.arrow_start or self.arrow_end:
@@ -620,38 +947,27 @@ class LineItem(QtWidgets.QGraphicsPathItem):
             h.hide()
 
     def itemChange(self, change, value):  # type: ignore[override]
-        if change == QtWidgets.QGraphicsItem.GraphicsItemChange.ItemPositionChange:
+        if change == _POSITION_CHANGE:
             mods = QtWidgets.QApplication.keyboardModifiers()
             if not mods & QtCore.Qt.KeyboardModifier.AltModifier:
                 value = snap_to_grid(self, value)
-        elif change == QtWidgets.QGraphicsItem.GraphicsItemChange.ItemSelectedHasChanged:
-            if value:
+        elif change == _SELECTED_CHANGED:
+            note = getattr(self.scene(), "note_selection_change", None)
+            if note is not None:
+                note(self)
+            elif value:
                 self.show_handles()
             else:
                 self.hide_handles()
-        elif change in (
-            QtWidgets.QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged,
-            QtWidgets.QGraphicsItem.GraphicsItemChange.ItemTransformHasChanged,
-        ):
-            if self.isSelected():
+        elif change in _HANDLE_CHANGES:
+            if self.isSelected() and not in_geometry_batch(self):
                 self.update_handles()
         return super().itemChange(change, value)  # type: ignore[misc]
 
     def _draw_arrow_head(
         self, painter: QtGui.QPainter, start: QtCore.QPointF, end: QtCore.QPointF
     ) -> None:
-        line = QtCore.QLineF(start, end)
-        angle = math.atan2(-line.dy(), line.dx())
-        size = self._arrow_size
-        p1 = end + QtCore.QPointF(
-            math.sin(angle - math.pi / 3) * size,
-            math.cos(angle - math.pi / 3) * size,
-        )
-        p2 = end + QtCore.QPointF(
-            math.sin(angle - math.pi + math.pi / 3) * size,
-            math.cos(angle - math.pi + math.pi / 3) * size,
-        )
-        painter.drawPolygon(QtGui.QPolygonF([end, p1, p2]))
+        painter.drawPolygon(arrow_head_polygon(start, end, self._arrow_size))
 
     def paint(self, painter, option, widget=None):
         super().paint(painter, option, widget)
@@ -677,36 +993,387 @@ class LineItem(QtWidgets.QGraphicsPathItem):
             painter.restore()
 
 
-class TextItem(QtWidgets.QGraphicsTextItem):
-    def __init__(self, x, y, w, h):
-        super().__init__("Text")
-        self.setPos(x, y)
-        font = QtGui.QFont()
-        font.setPointSizeF(24.0)
-        self.setFont(font)
-        self.setDefaultTextColor(QtGui.QColor("#222"))
+# Margin QTextDocument puts around its text; the static text and the editor
+# use it so a text's box is the same whether or not it is being edited.
+TEXT_MARGIN = 4.0
+TEXT_METRICS_CACHE = 4096
+
+_text_metrics: dict[tuple[str, str], tuple[float, float]] = {}
+_metrics_document: QtGui.QTextDocument | None = None
+
+
+def text_metrics(text: str, font: QtGui.QFont) -> tuple[float, float]:
+    """Width and height of the box QGraphicsTextItem would give `text` in
+    `font`, laid out once per distinct text and font."""
+    global _metrics_document
+    key = (text, font.key())
+    size = _text_metrics.get(key)
+    if size is None:
+        if _metrics_document is None:
+            _metrics_document = QtGui.QTextDocument()
+            _metrics_document.setDocumentMargin(TEXT_MARGIN)
+        _metrics_document.setDefaultFont(font)
+        _metrics_document.setPlainText(text)
+        s = _metrics_document.size()
+        size = (s.width(), s.height())
+        if len(_text_metrics) >= TEXT_METRICS_CACHE:
+            _text_metrics.clear()
+        _text_metrics[key] = size
+    return size
+
+
+class TextEditor(QtWidgets.QGraphicsTextItem):
+    """Editable stand-in shown over a TextItem while it is being edited."""
+
+    def __init__(self, owner: "TextItem"):
+        super().__init__(owner.toPlainText(), owner)
+        self._owner = owner
+        self.document().setDocumentMargin(TEXT_MARGIN)
+        self.setFont(owner.font())
+        self.setDefaultTextColor(owner.defaultTextColor())
         self.setTextInteractionFlags(QtCore.Qt.TextInteractionFlag.TextEditorInteraction)
+        self.document().contentsChanged.connect(self._contents_changed)
+
+    def _contents_changed(self):
+        self._owner.setPlainText(self.toPlainText())
+
+    def keyPressEvent(self, event):
+        if event.key() == QtCore.Qt.Key.Key_Escape:
+            self.clearFocus()
+            event.accept()
+            return
+        super().keyPressEvent(event)
+
+    def focusOutEvent(self, event):
+        super().focusOutEvent(event)
+        # Not from inside the event handler: finishing removes this item.
+        QtCore.QTimer.singleShot(0, self._owner.finish_editing)
+
+
+class TextItem(RevisionMixin, QtWidgets.QGraphicsItem):
+    """Text drawn with QStaticText; a TextEditor is only created while the
+    text is edited after a double-click."""
+
+    def __init__(self, x, y, w, h):
+        super().__init__()
+        self._editor: TextEditor | None = None
+        self.reset(x, y, w, h)
         self.setFlags(
             QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsMovable
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsFocusable
         )
+
+    def reset(self, x, y, w, h) -> None:
+        """Set the item up as the constructor does, e.g. when an ItemPool
+        hands it out again."""
+        if self._editor is not None:
+            self._drop_editor()
+        self._text = "Text"
+        self._font = QtGui.QFont()
+        self._font.setPointSizeF(24.0)
+        self._color = QtGui.QColor("#222")
+        self._rect: QtCore.QRectF | None = None
+        self._static: list[QtGui.QStaticText] | None = None
+        self._text_changed()
+        self.setPos(x, y)
         br = self.boundingRect()
         self.setTransformOriginPoint(br.width() / 2.0, br.height() / 2.0)
 
+    def toPlainText(self) -> str:
+        return self._text
+
+    def setPlainText(self, text: str) -> None:
+        if text == self._text:
+            return
+        self._text = text
+        self._text_changed()
+        if self._editor is not None and self._editor.toPlainText() != text:
+            self._editor.setPlainText(text)
+
+    def font(self) -> QtGui.QFont:
+        return QtGui.QFont(self._font)
+
+    def setFont(self, font):
+        self._font = QtGui.QFont(font)
+        if self._editor is not None:
+            self._editor.setFont(font)
+        self._text_changed()
+
+    def defaultTextColor(self) -> QtGui.QColor:
+        return QtGui.QColor(self._color)
+
+    def setDefaultTextColor(self, color):
+        self._color = QtGui.QColor(color)
+        if self._editor is not None:
+            self._editor.setDefaultTextColor(color)
+        self.update()
+        self.touch_geometry()
+
+    def _text_changed(self) -> None:
+        self.prepareGeometryChange()
+        self._rect = None
+        self._static = None
+        self.touch_geometry()
+
+    def boundingRect(self) -> QtCore.QRectF:
+        if self._rect is None:
+            self._rect = QtCore.QRectF(0.0, 0.0, *text_metrics(self._text, self._font))
+        return self._rect
+
+    # --- Editing ---
+
+    def is_editing(self) -> bool:
+        return self._editor is not None
+
+    def start_editing(self, pos: QtCore.QPointF | None = None) -> None:
+        """Show an editor over the text and give it the keyboard focus,
+        with the cursor at `pos` (item coordinates) or at the end."""
+        if self._editor is None:
+            self._editor = TextEditor(self)
+            self.update()
+        editor = self._editor
+        cursor = editor.textCursor()
+        if pos is None:
+            cursor.movePosition(QtGui.QTextCursor.MoveOperation.End)
+        else:
+            layout = editor.document().documentLayout()
+            cursor.setPosition(max(0, layout.hitTest(pos, QtCore.Qt.HitTestAccuracy.FuzzyHit)))
+        editor.setTextCursor(cursor)
+        editor.setFocus(QtCore.Qt.FocusReason.MouseFocusReason)
+
+    def finish_editing(self) -> None:
+        """Drop the editor once it has lost the focus."""
+        editor = self._editor
+        if editor is None or editor.hasFocus():
+            return
+        self._drop_editor()
+
+    def _drop_editor(self) -> None:
+        editor = self._editor
+        self._editor = None
+        editor.document().contentsChanged.disconnect(editor._contents_changed)
+        scene = editor.scene()
+        if scene is not None:
+            scene.removeItem(editor)
+        else:
+            editor.setParentItem(None)
+        self.update()
+
+    def mouseDoubleClickEvent(self, event):
+        self.start_editing(event.pos())
+        event.accept()
+
+    # --- Document rows ---
+
+    def shape_row(self) -> ShapeRow:
+        br = self.boundingRect()
+        size = self._font.pointSizeF()
+        if size <= 0:  # fall back to pixel size when point size is unset
+            size = float(self._font.pixelSize())
+        color = self._color
+        return self._make_row(
+            br.width(), br.height(), (color.name(), color.alphaF(), None, 0.0, size),
+            text=self._text,
+        )
+
+    def _apply_geometry(self, row: ShapeRow) -> None:
+        fill, fill_opacity, _, _, size = row.style
+        self.setPlainText(row.text)
+        font = self.font()
+        font.setPointSizeF(size)
+        self.setFont(font)
+        color = QtGui.QColor(fill)
+        color.setAlphaF(fill_opacity)
+        self.setDefaultTextColor(color)
+
     def itemChange(self, change, value):  # type: ignore[override]
-        if change == QtWidgets.QGraphicsItem.GraphicsItemChange.ItemPositionChange:
+        if change == _POSITION_CHANGE:
             mods = QtWidgets.QApplication.keyboardModifiers()
             if not mods & QtCore.Qt.KeyboardModifier.AltModifier:
                 value = snap_to_grid(self, value)
         return super().itemChange(change, value)  # type: ignore[misc]
 
+    def _static_lines(self) -> list[QtGui.QStaticText]:
+        if self._static is None:
+            self._static = []
+            for line in self._text.split("\n"):
+                static = QtGui.QStaticText(line)
+                static.setTextFormat(QtCore.Qt.TextFormat.PlainText)
+                self._static.append(static)
+        return self._static
+
     def paint(self, painter, option, widget=None):
-        super().paint(painter, option, widget)
+        rect = self.boundingRect()
+        if self._editor is None and self._text:
+            lines = self._static_lines()
+            step = (rect.height() - 2.0 * TEXT_MARGIN) / len(lines)
+            painter.setFont(self._font)
+            painter.setPen(self._color)
+            for i, static in enumerate(lines):
+                painter.drawStaticText(QtCore.QPointF(TEXT_MARGIN, TEXT_MARGIN + i * step), static)
+        if self.isSelected():
+            painter.save()
+            painter.setPen(PEN_SELECTED)
+            painter.setBrush(QtCore.Qt.BrushStyle.NoBrush)
+            painter.drawRect(rect)
+            painter.restore()
+
+
+# Style column value of group rows; groups have no pen or brush of their own.
+_GROUP_STYLE = (None, 1.0, "#000000", 0.0, 0.0)
+_MEMBER_FLAGS = (
+    QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsMovable
+    | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable
+    | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsFocusable
+)
+
+
+def group_root(item: QtWidgets.QGraphicsItem) -> QtWidgets.QGraphicsItem:
+    """The outermost group item belongs to, or item itself if ungrouped."""
+    parent = item.parentItem()
+    while isinstance(parent, GroupItem) and parent.has_member(item):
+        item = parent
+        parent = item.parentItem()
+    return item
+
+
+class GroupItem(RevisionMixin, ResizableItem, QtWidgets.QGraphicsItem):
+    """Moves and rotates its member shapes as one item.
+
+    Members are child items that keep their geometry in the group's
+    coordinates, so moving or rotating the group changes one transform.
+    While grouped they take no mouse events and can't be selected. With
+    caching on, an unselected top-level group hides its members and paints
+    them itself into a device pixmap cache.
+    """
+
+    def __init__(self, x: float = 0.0, y: float = 0.0):
+        QtWidgets.QGraphicsItem.__init__(self)
+        ResizableItem.__init__(self)
+        # member -> its own flags and mouse buttons, restored on removal
+        self._members: dict = {}
+        self._rect = QtCore.QRectF()
+        self._cache_enabled = False
+        self._painting_members = False
+        self.setPos(x, y)
+        self.setFlags(
+            QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsMovable
+            | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable
+            | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges
+            | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsFocusable
+        )
+        self.setData(0, GROUP)
+
+    # --- Members ---
+
+    def has_member(self, item) -> bool:
+        return item in self._members
+
+    def members(self) -> list[QtWidgets.QGraphicsItem]:
+        """Members, bottom of the group's stacking order first."""
+        return sorted(self._members, key=lambda it: it.zValue())
+
+    def add_member(self, item, x: float, y: float, rotation: float, z: float) -> None:
+        """Make item a member placed at (x, y) in group coordinates."""
+        item.setSelected(False)
+        self._members[item] = (item.flags() & _MEMBER_FLAGS, item.acceptedMouseButtons())
+        item.setFlags(item.flags() & ~_MEMBER_FLAGS)
+        item.setAcceptedMouseButtons(QtCore.Qt.MouseButton.NoButton)
+        item.setParentItem(self)
+        item.setPos(x, y)
+        item.setRotation(rotation)
+        item.setZValue(z)
+        item.setVisible(not self._painting_members)
+        if isinstance(item, GroupItem):
+            item._update_cache()
+        # Its export now depends on the group it is in.
+        item.touch()
+
+    def remove_member(self, item) -> None:
+        """Detach a member, which becomes a parentless item."""
+        flags, buttons = self._members.pop(item)
+        item.setParentItem(None)
+        item.setFlags(item.flags() | flags)
+        item.setAcceptedMouseButtons(buttons)
+        item.setVisible(True)
+        if isinstance(item, GroupItem):
+            item._update_cache()
+        item.touch()
+
+    def update_bounds(self) -> None:
+        """Fit the group's rect to its members; an unrotated group also
+        recentres its transform origin."""
+        rect = QtCore.QRectF()
+        for it in self._members:
+            rect = rect.united(it.mapRectToParent(it.boundingRect()))
+        self.prepareGeometryChange()
+        self._rect = rect
+        if not self.rotation():
+            self.setTransformOriginPoint(rect.center())
+        self.touch_geometry()
+
+    def boundingRect(self) -> QtCore.QRectF:
+        return self._rect
+
+    # --- Rendering cache ---
+
+    def set_cache_rendering(self, enabled: bool) -> None:
+        self._cache_enabled = enabled
+        self._update_cache()
+
+    def _update_cache(self) -> None:
+        cache = self._cache_enabled and not self.isSelected() and self.parentItem() is None
+        if cache == self._painting_members:
+            return
+        self._painting_members = cache
+        for it in self._members:
+            it.setVisible(not cache)
+        self.setCacheMode(
+            QtWidgets.QGraphicsItem.CacheMode.DeviceCoordinateCache if cache
+            else QtWidgets.QGraphicsItem.CacheMode.NoCache
+        )
+        self.update()
+
+    def _paint_members(self, painter, option, widget) -> None:
+        for it in self.members():
+            painter.save()
+            painter.setTransform(it.itemTransform(self)[0], True)
+            it.paint(painter, option, widget)
+            if isinstance(it, GroupItem):
+                it._paint_members(painter, option, widget)
+            painter.restore()
+
+    def paint(self, painter, option, widget=None):
+        if self._painting_members:
+            self._paint_members(painter, option, widget)
         if self.isSelected():
             painter.save()
             painter.setPen(PEN_SELECTED)
             painter.setBrush(QtCore.Qt.BrushStyle.NoBrush)
-            painter.drawRect(self.boundingRect())
+            painter.drawRect(self._rect)
             painter.restore()
+
+    # --- Handles and rows ---
+
+    def _ensure_handles(self):
+        # Groups can be rotated, not resized.
+        if self._rotation_handle is None:
+            self._rotation_handle = RotationHandle(self)
+            self._rotation_handle.hide()
+
+    def shape_row(self) -> ShapeRow:
+        return self._make_row(self._rect.width(), self._rect.height(), _GROUP_STYLE)
+
+    def _apply_geometry(self, row: ShapeRow) -> None:
+        # The row only holds the frame; members are added with add_member().
+        self.prepareGeometryChange()
+        self._rect = QtCore.QRectF(*row.bounds)
+        self.touch_geometry()
+
+    def itemChange(self, change, value):  # type: ignore[override]
+        result = super().itemChange(change, value)
+        if change == _SELECTED_CHANGED:
+            self._update_cache()
+        return result
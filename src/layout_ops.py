@@ -0,0 +1,62 @@
+import numpy as np
+
+# Bounds arrays have one row per item: left, top, right, bottom.
+LEFT, TOP, RIGHT, BOTTOM = range(4)
+
+
+def align_offsets(bounds: np.ndarray, mode: str) -> np.ndarray:
+    """(dx, dy) per row that aligns all bounds on one edge or centre line."""
+    offsets = np.zeros((len(bounds), 2))
+    if mode == "left":
+        offsets[:, 0] = bounds[:, LEFT].min() - bounds[:, LEFT]
+    elif mode == "hcenter":
+        centers = (bounds[:, LEFT] + bounds[:, RIGHT]) / 2.0
+        offsets[:, 0] = centers.mean() - centers
+    elif mode == "right":
+        offsets[:, 0] = bounds[:, RIGHT].max() - bounds[:, RIGHT]
+    elif mode == "top":
+        offsets[:, 1] = bounds[:, TOP].min() - bounds[:, TOP]
+    elif mode == "vcenter":
+        centers = (bounds[:, TOP] + bounds[:, BOTTOM]) / 2.0
+        offsets[:, 1] = centers.mean() - centers
+    elif mode == "bottom":
+        offsets[:, 1] = bounds[:, BOTTOM].max() - bounds[:, BOTTOM]
+    else:
+        raise ValueError(f"unknown alignment {mode!r}")
+    return offsets
+
+
+def grid_offsets(points: np.ndarray, size: float) -> np.ndarray:
+    """(dx, dy) per row that moves each point (x, y) onto the grid."""
+    return np.round(points / size) * size - points
+
+
+def distribute_offsets(bounds: np.ndarray, axis: str) -> np.ndarray:
+    """(dx, dy) per row that spaces bounds evenly along axis ("x" or "y").
+
+    The outermost items stay put and the gaps between neighbours become
+    equal; with fewer than three items nothing moves.
+    """
+    offsets = np.zeros((len(bounds), 2))
+    if len(bounds) < 3:
+        return offsets
+    lo, hi, col = (LEFT, RIGHT, 0) if axis == "x" else (TOP, BOTTOM, 1)
+    order = np.argsort(bounds[:, lo], kind="stable")
+    starts = bounds[order, lo]
+    sizes = bounds[order, hi] - starts
+    span = bounds[:, hi].max() - starts[0]
+    gap = (span - sizes.sum()) / (len(bounds) - 1)
+    targets = starts[0] + np.concatenate(([0.0], np.cumsum(sizes[:-1] + gap)))
+    offsets[order, col] = targets - starts
+    return offsets
+
+
+def matched_sizes(sizes: np.ndarray, mode: str) -> np.ndarray:
+    """Copy of sizes (rows of width, height) with width, height or both set
+    to the largest in the selection."""
+    result = sizes.copy()
+    if mode in ("width", "both"):
+        result[:, 0] = sizes[:, 0].max()
+    if mode in ("height", "both"):
+        result[:, 1] = sizes[:, 1].max()
+    return result
@@ -1,9 +1,15 @@
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from canvas_scene import INDEX_BSP, INDEX_NONE
 from canvas_view import CanvasView
 from palette import PaletteList
-from export_drawsvg import export_drawsvg_py
-from import_drawsvg import import_drawsvg_py
+import frame_pacer
+from cleanup_dialog import clean_up
+from clipboard import settle_clipboard
+from find_panel import FindPanel
+from export_drawsvg import ExportCache, export_drawsvg_py, cancel_running_exports
+from import_drawsvg import import_drawsvg_py, open_shapes_file
+from raster_export import export_png, cancel_running_png_exports
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -19,6 +25,10 @@ class MainWindow(QtWidgets.QMainWindow):
         self.palette.setMinimumWidth(220)
 
         self.canvas = CanvasView()
+        # Second view of the same scene shown by View → Split view.
+        self.split_canvas: CanvasView | None = None
+        self._export_cache = ExportCache()
+        self._bsp_depth = 0
 
         self.splitter.addWidget(self.palette)
         self.splitter.addWidget(self.canvas)
@@ -26,6 +36,13 @@ class MainWindow(QtWidgets.QMainWindow):
         self.splitter.setStretchFactor(1, 1)
         self.setCentralWidget(self.splitter)
 
+        self.find_panel = FindPanel(self.canvas)
+        self.find_dock = QtWidgets.QDockWidget("Find", self)
+        self.find_dock.setObjectName("find_dock")
+        self.find_dock.setWidget(self.find_panel)
+        self.addDockWidget(QtCore.Qt.DockWidgetArea.RightDockWidgetArea, self.find_dock)
+        self.find_dock.hide()
+
         self._build_menu()
         self.statusBar().showMessage(
             "Tip: Ctrl+drag duplicates selected objects, Alt+mouse wheel zooms"
@@ -38,10 +55,26 @@ class MainWindow(QtWidgets.QMainWindow):
         act_load_py.triggered.connect(self.load_drawsvg_py)
         file_menu.addAction(act_load_py)
 
+        act_open_shapes = QtGui.QAction("Open shapes…", self)
+        act_open_shapes.triggered.connect(self.open_shapes)
+        file_menu.addAction(act_open_shapes)
+
         act_save_py = QtGui.QAction("Save drawsvg-.py", self)
         act_save_py.triggered.connect(self.export_drawsvg_py)
         file_menu.addAction(act_save_py)
 
+        act_export_png = QtGui.QAction("Export PNG…", self)
+        act_export_png.triggered.connect(self.export_png)
+        file_menu.addAction(act_export_png)
+
+        options_menu = file_menu.addMenu("Export options")
+        self.act_coalesce_lines = QtGui.QAction("Merge same-style lines into paths", self)
+        self.act_coalesce_lines.setCheckable(True)
+        options_menu.addAction(self.act_coalesce_lines)
+        self.act_instance_symbols = QtGui.QAction("Reuse identical shapes via draw.Use", self)
+        self.act_instance_symbols.setCheckable(True)
+        options_menu.addAction(self.act_instance_symbols)
+
         file_menu.addSeparator()
         act_quit = QtGui.QAction("Quit", self)
         act_quit.setShortcut(QtGui.QKeySequence(QtGui.QKeySequence.StandardKey.Quit))
@@ -49,12 +82,240 @@ class MainWindow(QtWidgets.QMainWindow):
         file_menu.addAction(act_quit)
 
         edit_menu = self.menuBar().addMenu("&Edit")
+        undo_stack = self.canvas.scene().undo_stack
+        act_undo = undo_stack.createUndoAction(self, "&Undo")
+        act_undo.setShortcut(QtGui.QKeySequence(QtGui.QKeySequence.StandardKey.Undo))
+        edit_menu.addAction(act_undo)
+        act_redo = undo_stack.createRedoAction(self, "&Redo")
+        act_redo.setShortcut(QtGui.QKeySequence(QtGui.QKeySequence.StandardKey.Redo))
+        edit_menu.addAction(act_redo)
+        edit_menu.addSeparator()
+        # Shortcuts that also work in detached view windows.
+        self._view_actions = [act_undo, act_redo]
+
+        for label, key, slot in (
+            ("Cu&t", QtGui.QKeySequence.StandardKey.Cut, lambda: self.current_canvas().cut_selection()),
+            ("&Copy", QtGui.QKeySequence.StandardKey.Copy, lambda: self.current_canvas().copy_selection()),
+            ("&Paste", QtGui.QKeySequence.StandardKey.Paste, lambda: self.current_canvas().paste()),
+        ):
+            act = QtGui.QAction(label, self)
+            act.setShortcut(QtGui.QKeySequence(key))
+            act.triggered.connect(slot)
+            edit_menu.addAction(act)
+            self._view_actions.append(act)
+        edit_menu.addSeparator()
+
+        act_select_all = QtGui.QAction("Select all", self)
+        act_select_all.setShortcut(QtGui.QKeySequence(QtGui.QKeySequence.StandardKey.SelectAll))
+        act_select_all.triggered.connect(self.canvas.scene().select_all)
+        edit_menu.addAction(act_select_all)
+
+        act_find = QtGui.QAction("Find…", self)
+        act_find.setShortcut(QtGui.QKeySequence(QtGui.QKeySequence.StandardKey.Find))
+        act_find.triggered.connect(self.show_find)
+        edit_menu.addAction(act_find)
+
+        act_group = QtGui.QAction("Group", self)
+        act_group.setShortcut(QtGui.QKeySequence("Ctrl+G"))
+        act_group.triggered.connect(lambda: self.current_canvas().group_selection())
+        edit_menu.addAction(act_group)
+
+        act_ungroup = QtGui.QAction("Ungroup", self)
+        act_ungroup.setShortcut(QtGui.QKeySequence("Ctrl+Shift+G"))
+        act_ungroup.triggered.connect(lambda: self.current_canvas().ungroup_selection())
+        edit_menu.addAction(act_ungroup)
+        self._view_actions += [act_select_all, act_group, act_ungroup]
+
+        act_clean_up = QtGui.QAction("Clean up…", self)
+        act_clean_up.triggered.connect(self.clean_up)
+        edit_menu.addAction(act_clean_up)
+
         act_clear_canvas = QtGui.QAction("Clear canvas", self)
-        act_clear_canvas.triggered.connect(self.canvas.clear_canvas)
+        act_clear_canvas.triggered.connect(lambda: self.current_canvas().clear_canvas())
         edit_menu.addAction(act_clear_canvas)
 
+        view_menu = self.menuBar().addMenu("&View")
+        self.act_snap_objects = QtGui.QAction("Snap to objects", self)
+        self.act_snap_objects.setCheckable(True)
+        self.act_snap_objects.toggled.connect(self.canvas.scene().set_object_snapping)
+        view_menu.addAction(self.act_snap_objects)
+        self.act_guides = QtGui.QAction("Alignment guides", self)
+        self.act_guides.setCheckable(True)
+        self.act_guides.toggled.connect(self._set_show_guides)
+        view_menu.addAction(self.act_guides)
+        self.act_split_view = QtGui.QAction("Split view", self)
+        self.act_split_view.setCheckable(True)
+        self.act_split_view.toggled.connect(self.set_split_view)
+        view_menu.addAction(self.act_split_view)
+        act_view_window = QtGui.QAction("New view window", self)
+        act_view_window.triggered.connect(self.open_view_window)
+        view_menu.addAction(act_view_window)
+        self.act_virtualize = QtGui.QAction("Virtualize large drawings", self)
+        self.act_virtualize.setCheckable(True)
+        self.act_virtualize.toggled.connect(self.canvas.scene().set_virtualized)
+        view_menu.addAction(self.act_virtualize)
+        self.act_cache_groups = QtGui.QAction("Cache group rendering", self)
+        self.act_cache_groups.setCheckable(True)
+        self.act_cache_groups.toggled.connect(self.canvas.scene().set_group_caching)
+        view_menu.addAction(self.act_cache_groups)
+        act_virtual_stats = QtGui.QAction("Show virtualization statistics", self)
+        act_virtual_stats.triggered.connect(self._show_virtual_stats)
+        view_menu.addAction(act_virtual_stats)
+        act_pool_limit = QtGui.QAction("Item pool limit…", self)
+        act_pool_limit.triggered.connect(self._ask_pool_limit)
+        view_menu.addAction(act_pool_limit)
+        act_pool_stats = QtGui.QAction("Show item pool statistics", self)
+        act_pool_stats.triggered.connect(
+            lambda: self.statusBar().showMessage(self.canvas.scene().item_pool.summary())
+        )
+        view_menu.addAction(act_pool_stats)
+
+        rate_menu = view_menu.addMenu("Edit rate limit")
+        rate_group = QtGui.QActionGroup(self)
+        for label, hz in (("Display refresh rate", 0), ("120 Hz", 120), ("60 Hz", 60), ("30 Hz", 30)):
+            act = QtGui.QAction(label, self)
+            act.setCheckable(True)
+            act.setChecked(hz == frame_pacer.edit_rate_cap())
+            act.setData(hz)
+            rate_group.addAction(act)
+            rate_menu.addAction(act)
+        rate_group.triggered.connect(lambda act: frame_pacer.set_edit_rate_cap(act.data()))
+        act_pacing = QtGui.QAction("Show edit pacing statistics", self)
+        act_pacing.triggered.connect(
+            lambda: self.statusBar().showMessage(frame_pacer.STATS.summary())
+        )
+        view_menu.addAction(act_pacing)
+        index_menu = view_menu.addMenu("Scene index")
+        index_group = QtGui.QActionGroup(self)
+        self.act_index_bsp = QtGui.QAction("BSP tree (automatic depth)", self)
+        self.act_index_bsp_depth = QtGui.QAction("BSP tree with fixed depth…", self)
+        self.act_index_none = QtGui.QAction("No index", self)
+        for act in (self.act_index_bsp, self.act_index_bsp_depth, self.act_index_none):
+            act.setCheckable(True)
+            index_group.addAction(act)
+            index_menu.addAction(act)
+        self.act_index_bsp.setChecked(True)
+        self.act_index_bsp_depth.triggered.connect(self._ask_bsp_depth)
+        index_group.triggered.connect(self._index_action_triggered)
+        index_menu.addSeparator()
+        self.act_suspend_index = QtGui.QAction("Suspend index while dragging", self)
+        self.act_suspend_index.setCheckable(True)
+        self.act_suspend_index.toggled.connect(self._apply_index_strategy)
+        index_menu.addAction(self.act_suspend_index)
+        self.act_grid_index = QtGui.QAction("Grid index for area selection", self)
+        self.act_grid_index.setCheckable(True)
+        self.act_grid_index.toggled.connect(self._apply_index_strategy)
+        index_menu.addAction(self.act_grid_index)
+
+    # --- Views ---
+    def current_canvas(self) -> CanvasView:
+        """The view with keyboard focus, or the main canvas."""
+        widget = QtWidgets.QApplication.focusWidget()
+        while widget is not None and not isinstance(widget, CanvasView):
+            widget = widget.parentWidget()
+        return widget if widget is not None else self.canvas
+
+    def _new_view(self, parent=None) -> CanvasView:
+        """Another view of the canvas scene, starting at the main view's
+        zoom and centre."""
+        view = CanvasView(self.canvas.scene(), parent)
+        view.setTransform(self.canvas.transform())
+        view.set_show_guides(self.act_guides.isChecked())
+        center = self.canvas.mapToScene(self.canvas.viewport().rect().center())
+        # Centre once the view has its size.
+        QtCore.QTimer.singleShot(0, view, lambda: view.centerOn(center))
+        return view
+
+    def set_split_view(self, enabled: bool):
+        if enabled and self.split_canvas is None:
+            self.split_canvas = self._new_view()
+            self.splitter.addWidget(self.split_canvas)
+            self.splitter.setStretchFactor(2, 1)
+        elif not enabled and self.split_canvas is not None:
+            self.split_canvas.hide()
+            self.split_canvas.deleteLater()
+            self.split_canvas = None
+
+    def open_view_window(self):
+        view = self._new_view(self)
+        view.setWindowFlag(QtCore.Qt.WindowType.Window)
+        view.setAttribute(QtCore.Qt.WidgetAttribute.WA_DeleteOnClose)
+        view.setWindowTitle(f"{self.windowTitle()} – view")
+        view.addActions(self._view_actions)
+        view.resize(800, 600)
+        view.show()
+
+    def _set_show_guides(self, enabled: bool):
+        for view in self.canvas.scene().views():
+            view.set_show_guides(enabled)
+
+    def _show_virtual_stats(self):
+        virtualizer = self.canvas.scene().virtualizer
+        if virtualizer is None:
+            self.statusBar().showMessage("Virtualization is off")
+        else:
+            self.statusBar().showMessage(virtualizer.summary())
+
+    def _ask_pool_limit(self):
+        pool = self.canvas.scene().item_pool
+        val, ok = QtWidgets.QInputDialog.getInt(
+            self, "Item pool limit", "Spare items kept per shape type:", pool.limit, 0, 10000000
+        )
+        if ok:
+            pool.set_limit(val)
+
+    def _ask_bsp_depth(self):
+        val, ok = QtWidgets.QInputDialog.getInt(
+            self, "BSP tree depth", "Depth:", self._bsp_depth or 8, 1, 32
+        )
+        if ok:
+            self._bsp_depth = val
+        elif not self._bsp_depth:
+            self.act_index_bsp.setChecked(True)
+        self._apply_index_strategy()
+
+    def _index_action_triggered(self, act: QtGui.QAction):
+        # The fixed-depth choice is applied by _ask_bsp_depth() once the
+        # depth has been asked for.
+        if act is not self.act_index_bsp_depth:
+            self._apply_index_strategy()
+
+    def _apply_index_strategy(self):
+        self.canvas.scene().set_index_strategy(
+            INDEX_NONE if self.act_index_none.isChecked() else INDEX_BSP,
+            bsp_depth=self._bsp_depth if self.act_index_bsp_depth.isChecked() else 0,
+            suspend_on_move=self.act_suspend_index.isChecked(),
+            grid=self.act_grid_index.isChecked(),
+        )
+
+    def show_find(self):
+        self.find_dock.show()
+        self.find_dock.raise_()
+        self.find_panel.focus_text()
+
+    def closeEvent(self, event: QtGui.QCloseEvent):
+        cancel_running_exports()
+        cancel_running_png_exports()
+        settle_clipboard()
+        super().closeEvent(event)
+
     def export_drawsvg_py(self):
-        export_drawsvg_py(self.canvas.scene(), self)
+        export_drawsvg_py(
+            self.canvas.scene(),
+            self,
+            self._export_cache,
+            coalesce_lines=self.act_coalesce_lines.isChecked(),
+            instance_symbols=self.act_instance_symbols.isChecked(),
+        )
+
+    def export_png(self):
+        export_png(self.canvas.scene(), self)
+
+    def clean_up(self):
+        clean_up(self.current_canvas(), self)
 
     def load_drawsvg_py(self):
         import_drawsvg_py(self.canvas.scene(), self)
+
+    def open_shapes(self):
+        open_shapes_file(self.canvas.scene(), self)
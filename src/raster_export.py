@@ -0,0 +1,383 @@
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from export_drawsvg import ExportSnapshot, snapshot_scene
+from items import ARROW_SIZE, arrow_head_polygon
+from shape_records import ShapeRecord, flatten_groups
+
+# Scene units are CSS pixels, i.e. 96 per inch.
+SCENE_DPI = 96.0
+TILE_SIZE = 512
+TEXT_MARGIN = 4.0  # QTextDocument's default document margin
+
+
+class RasterOptions(NamedTuple):
+    dpi: float = 300.0
+    background: str | None = "#ffffff"  # None -> transparent
+    antialiasing: bool = True
+    tile_size: int = TILE_SIZE
+    threads: int = 0  # 0 -> one per CPU
+
+
+def raster_size(snapshot: ExportSnapshot, dpi: float) -> tuple[int, int]:
+    scale = dpi / SCENE_DPI
+    return max(1, round(snapshot.width * scale)), max(1, round(snapshot.height * scale))
+
+
+def _pen(rec: ShapeRecord) -> QtGui.QPen:
+    pen = QtGui.QPen(QtGui.QColor(rec.stroke))
+    pen.setWidthF(rec.stroke_width)
+    return pen
+
+
+def _brush(rec: ShapeRecord) -> QtGui.QBrush:
+    if rec.fill is None:
+        return QtGui.QBrush(QtCore.Qt.BrushStyle.NoBrush)
+    color = QtGui.QColor(rec.fill)
+    color.setAlphaF(rec.fill_opacity)
+    return QtGui.QBrush(color)
+
+
+def _points(rec: ShapeRecord) -> list[QtCore.QPointF]:
+    pts = rec.points
+    return [QtCore.QPointF(pts[i], pts[i + 1]) for i in range(0, len(pts), 2)]
+
+
+def paint_record(painter: QtGui.QPainter, rec: ShapeRecord) -> None:
+    """Paint rec in scene coordinates, as the canvas item would look."""
+    painter.save()
+    if abs(rec.angle) > 1e-6:
+        painter.translate(rec.cx, rec.cy)
+        painter.rotate(rec.angle)
+        painter.translate(-rec.cx, -rec.cy)
+    if rec.shape == "Text":
+        font = QtGui.QFont()
+        font.setPointSizeF(rec.font_size)
+        color = QtGui.QColor(rec.fill)
+        color.setAlphaF(rec.fill_opacity)
+        painter.setFont(font)
+        painter.setPen(color)
+        rect = QtCore.QRectF(rec.x, rec.y, rec.w, rec.h).adjusted(
+            TEXT_MARGIN, TEXT_MARGIN, -TEXT_MARGIN, -TEXT_MARGIN
+        )
+        painter.drawText(rect, QtCore.Qt.AlignmentFlag.AlignLeft | QtCore.Qt.AlignmentFlag.AlignTop, rec.text)
+    elif rec.shape in ("Line", "Arrow"):
+        pts = _points(rec)
+        painter.setPen(_pen(rec))
+        painter.setBrush(QtCore.Qt.BrushStyle.NoBrush)
+        painter.drawPolyline(QtGui.QPolygonF(pts))
+        if len(pts) >= 2 and (rec.arrow_start or rec.arrow_end):
+            painter.setBrush(QtGui.QColor(rec.stroke))
+            if rec.arrow_start:
+                painter.drawPolygon(arrow_head_polygon(pts[1], pts[0], ARROW_SIZE))
+            if rec.arrow_end:
+                painter.drawPolygon(arrow_head_polygon(pts[-2], pts[-1], ARROW_SIZE))
+    else:
+        painter.setPen(_pen(rec))
+        painter.setBrush(_brush(rec))
+        rect = QtCore.QRectF(rec.x, rec.y, rec.w, rec.h)
+        if rec.shape == "Rectangle":
+            if rec.rx or rec.ry:
+                painter.drawRoundedRect(rect, rec.rx, rec.ry)
+            else:
+                painter.drawRect(rect)
+        elif rec.shape in ("Ellipse", "Circle"):
+            painter.drawEllipse(rect)
+        elif rec.shape == "Triangle":
+            painter.drawPolygon(QtGui.QPolygonF(_points(rec)))
+    painter.restore()
+
+
+def _record_bounds(rec: ShapeRecord) -> tuple[float, float, float, float]:
+    """Conservative scene bounds of rec including stroke, arrows and rotation."""
+    if rec.points:
+        xs = rec.points[0::2]
+        ys = rec.points[1::2]
+        x0, y0, x1, y1 = min(xs), min(ys), max(xs), max(ys)
+    else:
+        x0, y0, x1, y1 = rec.x, rec.y, rec.x + rec.w, rec.y + rec.h
+    pad = rec.stroke_width + (ARROW_SIZE if rec.arrow_start or rec.arrow_end else 0.0)
+    x0 -= pad
+    y0 -= pad
+    x1 += pad
+    y1 += pad
+    if abs(rec.angle) > 1e-6:
+        r = max(
+            ((x - rec.cx) ** 2 + (y - rec.cy) ** 2) ** 0.5
+            for x in (x0, x1)
+            for y in (y0, y1)
+        )
+        x0, y0, x1, y1 = rec.cx - r, rec.cy - r, rec.cx + r, rec.cy + r
+    return x0, y0, x1, y1
+
+
+def _bucket_records(records, scale, ox, oy, cols, rows, tile) -> list[list[ShapeRecord]]:
+    """Assign each record to every tile its bounds touch, keeping z-order."""
+    buckets: list[list[ShapeRecord]] = [[] for _ in range(cols * rows)]
+    for rec in records:
+        x0, y0, x1, y1 = _record_bounds(rec)
+        c0 = max(0, int((x0 - ox) * scale) // tile)
+        c1 = min(cols - 1, int((x1 - ox) * scale) // tile)
+        r0 = max(0, int((y0 - oy) * scale) // tile)
+        r1 = min(rows - 1, int((y1 - oy) * scale) // tile)
+        for r in range(r0, r1 + 1):
+            row = r * cols
+            for c in range(c0, c1 + 1):
+                buckets[row + c].append(rec)
+    return buckets
+
+
+def _render_tile(records, scale, ox, oy, tx, ty, tw, th, options: RasterOptions) -> tuple[bytes, int]:
+    """Render one tile and return its pixel rows and bytes per line."""
+    opaque = options.background is not None
+    img = QtGui.QImage(tw, th, QtGui.QImage.Format.Format_ARGB32_Premultiplied)
+    img.setDotsPerMeterX(round(SCENE_DPI / 0.0254))
+    img.setDotsPerMeterY(round(SCENE_DPI / 0.0254))
+    if opaque:
+        img.fill(QtGui.QColor(options.background))
+    else:
+        img.fill(QtCore.Qt.GlobalColor.transparent)
+    if records:
+        painter = QtGui.QPainter(img)
+        painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing, options.antialiasing)
+        painter.setRenderHint(QtGui.QPainter.RenderHint.TextAntialiasing, options.antialiasing)
+        painter.translate(-tx, -ty)
+        painter.scale(scale, scale)
+        painter.translate(-ox, -oy)
+        for rec in records:
+            paint_record(painter, rec)
+        painter.end()
+    fmt = QtGui.QImage.Format.Format_RGB888 if opaque else QtGui.QImage.Format.Format_RGBA8888
+    img = img.convertToFormat(fmt)
+    return bytes(img.constBits()), img.bytesPerLine()
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def render_png(
+    snapshot: ExportSnapshot,
+    path: str,
+    options: RasterOptions = RasterOptions(),
+    progress: Callable[[int, int], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> bool:
+    """Render snapshot to a PNG file tile by tile; returns False if cancelled.
+
+    Tiles of one row are rendered in parallel, then their scanlines are
+    compressed and appended to the file, so memory use is bounded by one
+    row of tiles regardless of the image size. Only needs a QGuiApplication,
+    which may run on the offscreen platform.
+    """
+    progress = progress or (lambda done, total: None)
+    is_cancelled = is_cancelled or (lambda: False)
+    scale = options.dpi / SCENE_DPI
+    width, height = raster_size(snapshot, options.dpi)
+    tile = max(16, options.tile_size)
+    cols = (width + tile - 1) // tile
+    rows = (height + tile - 1) // tile
+    buckets = _bucket_records(flatten_groups(snapshot.records), scale, snapshot.ox, snapshot.oy, cols, rows, tile)
+    opaque = options.background is not None
+    channels = 3 if opaque else 4
+    ppm = round(options.dpi / 0.0254)
+    compressor = zlib.compressobj(6)
+    workers = options.threads or os.cpu_count() or 1
+    ok = False
+    try:
+        with open(path, "wb") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+            f.write(b"\x89PNG\r\n\x1a\n")
+            f.write(_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2 if opaque else 6, 0, 0, 0)))
+            f.write(_chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1)))
+            for r in range(rows):
+                if is_cancelled():
+                    return False
+                ty = r * tile
+                th = min(tile, height - ty)
+                futures = []
+                for c in range(cols):
+                    tx = c * tile
+                    tw = min(tile, width - tx)
+                    futures.append(pool.submit(
+                        _render_tile, buckets[r * cols + c], scale,
+                        snapshot.ox, snapshot.oy, tx, ty, tw, th, options,
+                    ))
+                tiles = [fut.result() for fut in futures]
+                band = bytearray()
+                for y in range(th):
+                    band.append(0)  # filter type: none
+                    for c, (data, bpl) in enumerate(tiles):
+                        tw = min(tile, width - c * tile)
+                        start = y * bpl
+                        band += data[start:start + tw * channels]
+                out = compressor.compress(bytes(band))
+                if out:
+                    f.write(_chunk(b"IDAT", out))
+                progress(r + 1, rows)
+            f.write(_chunk(b"IDAT", compressor.flush()))
+            f.write(_chunk(b"IEND", b""))
+        ok = True
+    finally:
+        if not ok and os.path.exists(path):
+            os.remove(path)
+    return True
+
+
+class RasterExportThread(QtCore.QThread):
+    """Renders a PNG from a snapshot without blocking the GUI thread."""
+
+    progress = QtCore.Signal(int, int)
+    succeeded = QtCore.Signal(str)
+    failed = QtCore.Signal(str)
+    cancelled = QtCore.Signal()
+
+    def __init__(self, snapshot: ExportSnapshot, path: str, options: RasterOptions, parent=None):
+        super().__init__(parent)
+        self._snapshot = snapshot
+        self._path = path
+        self._options = options
+        self._cancel_requested = False
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def run(self):
+        try:
+            done = render_png(
+                self._snapshot, self._path, self._options,
+                self.progress.emit, lambda: self._cancel_requested,
+            )
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        if done:
+            self.succeeded.emit(self._path)
+        else:
+            self.cancelled.emit()
+
+
+class RasterExportDialog(QtWidgets.QDialog):
+    def __init__(self, snapshot: ExportSnapshot, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export PNG")
+        self._snapshot = snapshot
+        self._background = QtGui.QColor("#ffffff")
+
+        layout = QtWidgets.QFormLayout(self)
+
+        self.dpi = QtWidgets.QSpinBox()
+        self.dpi.setRange(24, 2400)
+        self.dpi.setValue(300)
+        self.dpi.valueChanged.connect(self._update_size)
+        layout.addRow("DPI", self.dpi)
+
+        self.size_label = QtWidgets.QLabel()
+        layout.addRow("Size", self.size_label)
+
+        self.transparent = QtWidgets.QCheckBox("Transparent")
+        self.color_btn = QtWidgets.QPushButton(self._background.name())
+        self.color_btn.clicked.connect(self._pick_color)
+        self.transparent.toggled.connect(self.color_btn.setDisabled)
+        bg_layout = QtWidgets.QHBoxLayout()
+        bg_layout.addWidget(self.color_btn)
+        bg_layout.addWidget(self.transparent)
+        layout.addRow("Background", bg_layout)
+
+        self.antialiasing = QtWidgets.QCheckBox()
+        self.antialiasing.setChecked(True)
+        layout.addRow("Antialiasing", self.antialiasing)
+
+        buttons = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel
+        )
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+        self._update_size()
+
+    def _update_size(self):
+        w, h = raster_size(self._snapshot, self.dpi.value())
+        self.size_label.setText(f"{w} × {h} px")
+
+    def _pick_color(self):
+        color = QtWidgets.QColorDialog.getColor(self._background, self, "Background color")
+        if color.isValid():
+            self._background = color
+            self.color_btn.setText(color.name())
+
+    def options(self) -> RasterOptions:
+        return RasterOptions(
+            dpi=float(self.dpi.value()),
+            background=None if self.transparent.isChecked() else self._background.name(),
+            antialiasing=self.antialiasing.isChecked(),
+        )
+
+
+# Keeps raster threads alive until they finish.
+_running: set[RasterExportThread] = set()
+
+
+def export_png(
+    scene: QtWidgets.QGraphicsScene, parent: QtWidgets.QWidget | None = None
+) -> RasterExportThread | None:
+    snapshot = snapshot_scene(scene)
+    dlg = RasterExportDialog(snapshot, parent)
+    if dlg.exec() != QtWidgets.QDialog.DialogCode.Accepted:
+        return None
+    options = dlg.options()
+    path, _ = QtWidgets.QFileDialog.getSaveFileName(
+        parent, "Export PNG…", "canvas.png", "PNG image (*.png)"
+    )
+    if not path:
+        return None
+
+    thread = RasterExportThread(snapshot, path, options, parent)
+    progress_dlg = QtWidgets.QProgressDialog("Rendering PNG…", "Cancel", 0, 1, parent)
+    progress_dlg.setWindowTitle("Export PNG")
+    progress_dlg.setWindowModality(QtCore.Qt.WindowModality.NonModal)
+    progress_dlg.setMinimumDuration(300)
+    progress_dlg.setAutoClose(False)
+    progress_dlg.setAutoReset(False)
+    progress_dlg.canceled.connect(thread.cancel)
+
+    def on_progress(done: int, total: int):
+        progress_dlg.setMaximum(max(1, total))
+        progress_dlg.setValue(done)
+
+    def on_succeeded(p: str):
+        if parent is not None:
+            w, h = raster_size(snapshot, options.dpi)
+            parent.statusBar().showMessage(f"Exported: {p} ({w} × {h} px)", 5000)
+
+    def on_failed(msg: str):
+        QtWidgets.QMessageBox.critical(parent, "Error saving file", msg)
+
+    def on_cancelled():
+        if parent is not None:
+            parent.statusBar().showMessage("Export cancelled", 5000)
+
+    def on_finished():
+        progress_dlg.close()
+        progress_dlg.deleteLater()
+        _running.discard(thread)
+        thread.deleteLater()
+
+    thread.progress.connect(on_progress)
+    thread.succeeded.connect(on_succeeded)
+    thread.failed.connect(on_failed)
+    thread.cancelled.connect(on_cancelled)
+    thread.finished.connect(on_finished)
+    _running.add(thread)
+    thread.start()
+    return thread
+
+
+def cancel_running_png_exports():
+    for thread in list(_running):
+        thread.cancel()
+        thread.wait()
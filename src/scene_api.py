@@ -0,0 +1,206 @@
+import numpy as np
+
+from document import ARROW_END, ARROW_SIZE, ARROW_START, Document
+from drawsvg_code import ExportSnapshot, generate_drawsvg_code
+from shape_data import pack_rows
+
+# Like document, this module stays free of Qt: scenes can be built and saved
+# by scripts that never create a QApplication.
+
+# fill, fill_opacity, stroke, stroke_width, font_size of new shapes, as in
+# the editor.
+DEFAULT_STYLE = (None, 1.0, "#222222", 2.0, 0.0)
+_KEEP = object()
+
+
+def _column(values) -> np.ndarray:
+    if isinstance(values, (np.ndarray, list, tuple)) or np.isscalar(values):
+        return np.asarray(values, dtype=float)
+    return np.fromiter(values, dtype=float)
+
+
+def _columns(*values) -> list[np.ndarray]:
+    """Float columns of equal length; scalars apply to every shape."""
+    return [np.atleast_1d(c) for c in np.broadcast_arrays(*map(_column, values))]
+
+
+def _factorize(values, n: int) -> tuple[list, np.ndarray]:
+    """Distinct values and the index of each row's value; a single value
+    applies to all n rows."""
+    if values is None or np.isscalar(values):
+        return [values], np.zeros(n, dtype=np.int64)
+    if isinstance(values, np.ndarray) and values.dtype != object:
+        distinct, codes = np.unique(values, return_inverse=True)
+        return distinct.tolist(), codes.reshape(-1)
+    lookup: dict = {}
+    codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int64)
+    return list(lookup), codes
+
+
+class Scene:
+    """Shapes built in bulk, without the editor or a QApplication.
+
+    The shapes are rows of a Document, the columnar model the editor keeps
+    for its canvas. The add_*() methods take whole columns at once: NumPy
+    arrays, other iterables, or scalars that apply to every new shape. They
+    return the row numbers of the new shapes, for set_styles(). Shapes stack
+    in the order they were added.
+
+    save() writes a shapes file that the editor opens with File → Open
+    shapes…; export_drawsvg() writes the same drawsvg code as the editor's
+    export.
+    """
+
+    def __init__(self):
+        self.document = Document()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _add(self, kinds, kind, columns: dict, **extra) -> np.ndarray:
+        n = len(kind)
+        columns["z"] = np.arange(self._count, self._count + n, dtype=float)
+        self._count += n
+        return self.document.add_columns(
+            kinds, kind, [DEFAULT_STYLE], np.zeros(n, dtype=np.int64), columns, **extra
+        )
+
+    def _add_boxes(self, shape, x, y, w, h, rotation, rx=0.0, ry=0.0) -> np.ndarray:
+        x, y, w, h, rotation, rx, ry = _columns(x, y, w, h, rotation, rx, ry)
+        pad = DEFAULT_STYLE[3] / 2.0
+        return self._add([shape], np.zeros(len(x), dtype=np.int64), {
+            "x": x, "y": y, "w": w, "h": h, "rotation": rotation,
+            "ox": w / 2.0, "oy": h / 2.0, "rx": rx, "ry": ry,
+            "bx": np.full(len(x), -pad), "by": np.full(len(x), -pad),
+            "bw": w + 2 * pad, "bh": h + 2 * pad,
+        })
+
+    def add_rects(self, x, y, w, h, rotation=0.0, rx=0.0, ry=0.0) -> np.ndarray:
+        """Add rectangles with top-left corners x, y and sizes w, h, rotated
+        by rotation degrees about their centres."""
+        return self._add_boxes("Rectangle", x, y, w, h, rotation, rx, ry)
+
+    def add_ellipses(self, x, y, w, h, rotation=0.0) -> np.ndarray:
+        """Add ellipses inscribed in the boxes x, y, w, h."""
+        return self._add_boxes("Ellipse", x, y, w, h, rotation)
+
+    def add_lines(self, points, counts=2, arrow_start=False, arrow_end=False) -> np.ndarray:
+        """Add lines and polylines from an arena of vertices.
+
+        points holds the vertices of all lines back to back, as an (m, 2)
+        array or flat x0, y0, x1, y1, ... values; counts is the number of
+        vertices of each line, or one count for all of them. Lines with an
+        arrow flag are added as arrows.
+        """
+        flat = _column(points).reshape(-1)
+        m = len(flat) // 2
+        if len(flat) != 2 * m:
+            raise ValueError("points must have an even number of values")
+        if np.isscalar(counts):
+            if int(counts) < 2 or m % int(counts):
+                raise ValueError(f"{m} vertices cannot form lines of {int(counts)} vertices")
+            counts = np.full(m // int(counts), int(counts), dtype=np.int64)
+        else:
+            counts = _column(counts).astype(np.int64)
+            if counts.min(initial=2) < 2 or counts.sum() != m:
+                raise ValueError("counts must be at least 2 and add up to the number of vertices")
+        n = len(counts)
+        starts = np.cumsum(counts) - counts
+        xs = flat[0::2]
+        ys = flat[1::2]
+        x0 = np.minimum.reduceat(xs, starts) if n else xs[:0]
+        x1 = np.maximum.reduceat(xs, starts) if n else xs[:0]
+        y0 = np.minimum.reduceat(ys, starts) if n else ys[:0]
+        y1 = np.maximum.reduceat(ys, starts) if n else ys[:0]
+        flags = np.zeros(n, dtype=np.int64)
+        flags |= np.where(np.broadcast_to(np.asarray(arrow_start, dtype=bool), n), ARROW_START, 0)
+        flags |= np.where(np.broadcast_to(np.asarray(arrow_end, dtype=bool), n), ARROW_END, 0)
+        # Square caps reach half the stroke width past every end, arrow
+        # heads their own size; sharp joins may reach a little further.
+        pad = DEFAULT_STYLE[3] / 2.0 + np.where(flags != 0, ARROW_SIZE, 0.0)
+        zeros = np.zeros(n)
+        # Like polylines loaded by the editor, lines sit at the origin and
+        # keep their vertices in scene coordinates.
+        return self._add(["Line", "Arrow"], (flags != 0).astype(np.int64), {
+            "x": zeros, "y": zeros,
+            "ox": (x0 + x1) / 2.0, "oy": (y0 + y1) / 2.0,
+            "bx": x0 - pad, "by": y0 - pad,
+            "bw": x1 - x0 + 2 * pad, "bh": y1 - y0 + 2 * pad,
+        }, flags=flags, points=flat, pts_len=2 * counts)
+
+    def set_styles(
+        self, rows, fill=_KEEP, fill_opacity=_KEEP, stroke=_KEEP, stroke_width=_KEEP
+    ) -> None:
+        """Change the style of the given rows; each value is one for all
+        rows or a sequence with one per row. A fill of None means no fill."""
+        document = self.document
+        rows = np.asarray(rows, dtype=np.int64)
+        n = len(rows)
+        old = document.style[rows]
+        fields = []
+        # One code per row for each distinct combination of old style and
+        # new values, renumbered after each field so it stays small.
+        key = old
+        for position, value in enumerate((fill, fill_opacity, stroke, stroke_width)):
+            if value is not _KEEP:
+                distinct, code = _factorize(value, n)
+                if len(code) != n:
+                    raise ValueError(f"expected {n} values, got {len(code)}")
+                fields.append((position, distinct, code))
+                key = np.unique(key * len(distinct) + code, return_inverse=True)[1].reshape(-1)
+        if not fields:
+            return
+        _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        styles = document.styles
+        new_ids = []
+        for i in first.tolist():
+            style = list(styles.styles[old[i]])
+            for position, distinct, code in fields:
+                value = distinct[code[i]]
+                style[position] = value if position in (0, 2) else float(value)
+            new_ids.append(styles.intern(tuple(style)))
+        new = np.asarray(new_ids, dtype=np.int64)[inverse.reshape(-1)]
+        # Bounds include half the stroke width.
+        widths = np.array([s[3] for s in styles.styles])
+        grow = (widths[new] - widths[old]) / 2.0
+        document.style[rows] = new
+        document.bx[rows] -= grow
+        document.by[rows] -= grow
+        document.bw[rows] += 2 * grow
+        document.bh[rows] += 2 * grow
+        document.invalidate()
+
+    def bounds(self) -> tuple[float, float, float, float]:
+        """Left, top, right and bottom of all shapes."""
+        b = self.document.scene_bounds(self.document.live_rows())
+        if not len(b):
+            return 0.0, 0.0, 0.0, 0.0
+        return float(b[:, 0].min()), float(b[:, 1].min()), float(b[:, 2].max()), float(b[:, 3].max())
+
+    def save(self, path: str) -> None:
+        """Write the shapes in the binary format of shape_data, for the
+        editor's File → Open shapes…."""
+        with open(path, "wb") as f:
+            f.write(pack_rows(self.document, self.document.live_rows()))
+
+    def export_drawsvg(
+        self, path: str | None = None, coalesce_lines: bool = False, instance_symbols: bool = False
+    ) -> str:
+        """Return the drawsvg code of the scene, also writing it to path if
+        given.
+
+        Scenes of many shapes are formatted in a process pool, so scripts
+        calling this need the usual ``if __name__ == "__main__":`` guard.
+        """
+        left, top, right, bottom = self.bounds()
+        snapshot = ExportSnapshot(
+            int(right - left), int(bottom - top), int(left), int(top),
+            tuple(self.document.records(self.document.live_rows())),
+            coalesce_lines=coalesce_lines, instance_symbols=instance_symbols,
+        )
+        code = generate_drawsvg_code(snapshot)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(code)
+        return code
@@ -0,0 +1,160 @@
+import json
+import struct
+from typing import NamedTuple
+
+import numpy as np
+
+from document import ShapeRow
+
+# Like document, this module stays free of Qt, so shapes can be packed and
+# unpacked by the headless scene API as well as by the editor.
+
+# Binary shapes format of the clipboard and of shape files: a header, a JSON
+# table of the shape kinds, styles and texts, then little-endian columns of
+# all rows and the points of all rows back to back. Group members follow the
+# group they belong to and name its row as their parent.
+_MAGIC = b"DSVC"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHII")  # magic, version, row count, table size
+_FLOATS = ("x", "y", "w", "h", "rotation", "ox", "oy", "z", "rx", "ry", "bx", "by", "bw", "bh")
+# kind, style, flags, parent row (-1 for top-level rows), number of points
+_INTS = 5
+
+
+class PackedShapes(NamedTuple):
+    """The columns of unpacked shape data."""
+
+    kinds: list[str]
+    styles: list[tuple]
+    text: list[str]
+    values: np.ndarray  # (n, len(_FLOATS))
+    ints: np.ndarray  # (n, _INTS)
+    points: np.ndarray
+
+    def has_groups(self) -> bool:
+        return bool((self.ints[:, 3] >= 0).any())
+
+
+def pack_rows(document, rows, members=(), member_parents=()) -> bytes:
+    """Serialise document rows, given bottom first, followed by group
+    members given as ShapeRows with the index of their group's row. The
+    document rows are sliced from its columns, so packing many shapes costs
+    a few array operations."""
+    rows = np.asarray(rows, dtype=np.int64)
+    n = len(rows) + len(members)
+
+    kind_ids, kind_index = np.unique(document.kind[rows], return_inverse=True)
+    kinds = [document.kinds[k] for k in kind_ids.tolist()]
+    style_ids, style_index = np.unique(document.style[rows], return_inverse=True)
+    styles = [document.styles.styles[s] for s in style_ids.tolist()]
+    kind_lookup = {name: i for i, name in enumerate(kinds)}
+    style_lookup = {style: i for i, style in enumerate(styles)}
+
+    floats = np.empty((n, len(_FLOATS)))
+    ints = np.empty((n, _INTS), dtype=np.int32)
+    top = len(rows)
+    for c, name in enumerate(_FLOATS):
+        floats[:top, c] = getattr(document, name)[rows]
+    ints[:top, 0] = kind_index
+    ints[:top, 1] = style_index
+    ints[:top, 2] = document.flags[rows]
+    ints[:top, 3] = -1
+    lens = document.pts_len[rows]
+    ints[:top, 4] = lens
+    starts = document.pts_start[rows]
+    # Arena offsets of every point of the rows, in row order.
+    ends = np.cumsum(lens)
+    offsets = np.arange(int(ends[-1]) if top else 0) - np.repeat(ends - lens - starts, lens)
+    points = [document.points[offsets]]
+    texts = [document.text[r] for r in rows.tolist()]
+
+    for i, (row, parent) in enumerate(zip(members, member_parents), top):
+        kind = kind_lookup.get(row.shape)
+        if kind is None:
+            kind = kind_lookup[row.shape] = len(kinds)
+            kinds.append(row.shape)
+        style = style_lookup.get(row.style)
+        if style is None:
+            style = style_lookup[row.style] = len(styles)
+            styles.append(row.style)
+        floats[i] = (
+            row.x, row.y, row.w, row.h, row.rotation, row.ox, row.oy, row.z,
+            row.rx, row.ry, *row.bounds,
+        )
+        ints[i] = (kind, style, row.flags, parent, len(row.points))
+        points.append(np.asarray(row.points, dtype=float))
+        texts.append(row.text)
+
+    table = json.dumps({"kinds": kinds, "styles": styles, "text": texts}).encode("utf-8")
+    return b"".join((
+        _HEADER.pack(_MAGIC, _VERSION, n, len(table)),
+        table,
+        floats.astype("<f8").tobytes(),
+        ints.astype("<i4").tobytes(),
+        np.concatenate(points).astype("<f8").tobytes(),
+    ))
+
+
+def unpack(data: bytes) -> PackedShapes:
+    """Columns of pack_rows() data; raises ValueError for data in another
+    format."""
+    if len(data) < _HEADER.size:
+        raise ValueError("shape data is truncated")
+    magic, version, n, table_size = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("unsupported shape data")
+    offset = _HEADER.size
+    table = json.loads(data[offset : offset + table_size].decode("utf-8"))
+    offset += table_size
+    size = n * (len(_FLOATS) * 8 + _INTS * 4)
+    if len(data) < offset + size:
+        raise ValueError("shape data is truncated")
+    floats = np.frombuffer(data, "<f8", n * len(_FLOATS), offset).reshape(n, len(_FLOATS))
+    offset += floats.nbytes
+    ints = np.frombuffer(data, "<i4", n * _INTS, offset).reshape(n, _INTS)
+    offset += ints.nbytes
+    count = int(ints[:, 4].sum())
+    if len(data) < offset + count * 8:
+        raise ValueError("shape data is truncated")
+    points = np.frombuffer(data, "<f8", count, offset)
+    # JSON turns the style tuples into lists.
+    styles = [tuple(s) for s in table["styles"]]
+    return PackedShapes(table["kinds"], styles, table["text"], floats, ints, points)
+
+
+def unpack_rows(data: bytes) -> tuple[list[ShapeRow], list[int]]:
+    """Rows and parent row indices (-1 for top level) from pack_rows()
+    data; raises ValueError for data in another format."""
+    return rows_of(unpack(data))
+
+
+def rows_of(packed: PackedShapes) -> tuple[list[ShapeRow], list[int]]:
+    """Rows and parent row indices (-1 for top level) of unpacked shapes."""
+    kinds = packed.kinds
+    styles = packed.styles
+    points = packed.points.tolist()
+    rows = []
+    start = 0
+    for values, (kind, style, flags, _, count), text in zip(
+        packed.values.tolist(), packed.ints.tolist(), packed.text
+    ):
+        x, y, w, h, rotation, ox, oy, z, rx, ry, bx, by, bw, bh = values
+        rows.append(ShapeRow(
+            kinds[kind], x, y, w, h, rotation, ox, oy, z, (bx, by, bw, bh),
+            styles[style], rx, ry, tuple(points[start : start + count]), flags, text,
+        ))
+        start += count
+    return rows, packed.ints[:, 3].tolist()
+
+
+def add_packed(document, packed: PackedShapes) -> np.ndarray:
+    """Append unpacked shapes to document as rows without items; returns
+    their row indices. Groups need items, so packed must have none."""
+    if packed.has_groups():
+        raise ValueError("shape data with groups cannot be stored as rows")
+    return document.add_columns(
+        packed.kinds, packed.ints[:, 0], packed.styles, packed.ints[:, 1],
+        {name: packed.values[:, c] for c, name in enumerate(_FLOATS)},
+        flags=packed.ints[:, 2], points=packed.points, pts_len=packed.ints[:, 4],
+        text=list(packed.text),
+    )
@@ -0,0 +1,421 @@
+import math
+from typing import NamedTuple
+
+# This module must stay free of Qt imports: records are formatted in worker
+# threads and worker processes, which only receive plain Python data.
+
+
+class ShapeRecord(NamedTuple):
+    """Immutable description of one shape as it will be exported."""
+
+    shape: str
+    x: float
+    y: float
+    w: float = 0.0
+    h: float = 0.0
+    angle: float = 0.0
+    cx: float = 0.0
+    cy: float = 0.0
+    fill: str | None = None  # None -> fill='none'
+    fill_opacity: float = 1.0
+    stroke: str = "#222222"
+    stroke_width: float = 2.0
+    rx: float = 0.0
+    ry: float = 0.0
+    points: tuple[float, ...] = ()  # absolute scene coordinates x0, y0, x1, y1, ...
+    arrow_start: bool = False
+    arrow_end: bool = False
+    text: str = ""  # for a Group: the variable its members are appended to
+    font_size: float = 0.0
+    container: str = "d"  # variable of the group the shape is in, or the drawing
+
+
+def drawing_header(width: int, height: int, ox: int, oy: int) -> list[str]:
+    return [
+        "# Auto-generated from PySide6 Canvas to drawsvg",
+        "import drawsvg as draw",
+        "",
+        "def build_drawing():",
+        f"    d = draw.Drawing({width}, {height}, origin=({ox}, {oy}))",
+        "",
+    ]
+
+
+def drawing_footer() -> list[str]:
+    return [
+        "    return d",
+        "",
+        "if __name__ == '__main__':",
+        "    d = build_drawing()",
+        "    # Creates an SVG file next to the script:",
+        "    d.save_svg('canvas.svg')",
+    ]
+
+
+def _rotation(rec: ShapeRecord) -> str:
+    if abs(rec.angle) > 1e-6:
+        return f", transform='rotate({rec.angle:.2f} {rec.cx:.2f} {rec.cy:.2f})'"
+    return ""
+
+
+def _fill_stroke_attrs(rec: ShapeRecord) -> list[str]:
+    attrs = []
+    if rec.fill is None:
+        attrs.append("fill='none'")
+    else:
+        attrs.append(f"fill='{rec.fill}'")
+        attrs.append(f"fill_opacity={rec.fill_opacity:.2f}")
+    attrs.append(f"stroke='{rec.stroke}'")
+    attrs.append(f"stroke_width={rec.stroke_width:.2f}")
+    return attrs
+
+
+def _format_rect(rec: ShapeRecord) -> list[str]:
+    attrs = _fill_stroke_attrs(rec)
+    if rec.rx:
+        attrs.append(f"rx={rec.rx:.2f}")
+    if rec.ry:
+        attrs.append(f"ry={rec.ry:.2f}")
+    attr_str = ", ".join(attrs)
+    return [
+        f"    _rect = draw.Rectangle({rec.x:.2f}, {rec.y:.2f}, {rec.w:.2f}, {rec.h:.2f}, {attr_str}{_rotation(rec)})",
+        f"    {rec.container}.append(_rect)",
+        "",
+    ]
+
+
+def _format_ellipse(rec: ShapeRecord) -> list[str]:
+    attr_str = ", ".join(_fill_stroke_attrs(rec))
+    rx = rec.w / 2.0
+    ry = rec.h / 2.0
+    return [
+        f"    _ell = draw.Ellipse({rec.cx:.2f}, {rec.cy:.2f}, {rx:.2f}, {ry:.2f}, {attr_str}{_rotation(rec)})",
+        f"    {rec.container}.append(_ell)",
+        "",
+    ]
+
+
+def _format_circle(rec: ShapeRecord) -> list[str]:
+    attr_str = ", ".join(_fill_stroke_attrs(rec))
+    radius = (rec.w + rec.h) / 4.0
+    return [
+        f"    _circ = draw.Circle({rec.cx:.2f}, {rec.cy:.2f}, {radius:.2f}, {attr_str}{_rotation(rec)})",
+        f"    {rec.container}.append(_circ)",
+        "",
+    ]
+
+
+def _format_triangle(rec: ShapeRecord) -> list[str]:
+    attr_str = ", ".join(_fill_stroke_attrs(rec))
+    coord_str = ", ".join(f"{v:.2f}" for v in rec.points)
+    return [
+        f"    _tri = draw.Lines({coord_str}, close=True, {attr_str}{_rotation(rec)})",
+        f"    {rec.container}.append(_tri)",
+        "",
+    ]
+
+
+def _format_line(rec: ShapeRecord) -> list[str]:
+    pts = rec.points
+    if rec.arrow_start or rec.arrow_end:
+        path_cmd = "M " + " L ".join(
+            f"{pts[i]:.2f} {pts[i+1]:.2f}" for i in range(0, len(pts), 2)
+        )
+        attrs = [
+            f"stroke='{rec.stroke}'",
+            f"stroke_width={rec.stroke_width:.2f}",
+            "fill='none'",
+        ]
+        if rec.arrow_start:
+            attrs.append("marker_start=_arrow")
+        if rec.arrow_end:
+            attrs.append("marker_end=_arrow")
+        attr_str = ", ".join(attrs)
+        return [
+            "    _arrow = draw.Marker(-0.1, -0.51, 0.9, 0.5, scale=4, orient='auto')",
+            f"    _arrow.append(draw.Lines(-0.1, 0.5, -0.1, -0.5, 0.9, 0, fill='{rec.stroke}', close=True))",
+            f"    _path = draw.Path('{path_cmd}', {attr_str}{_rotation(rec)})",
+            "    d.append(_arrow)",
+            f"    {rec.container}.append(_path)",
+            "",
+        ]
+    attr_str = f"stroke='{rec.stroke}', stroke_width={rec.stroke_width:.2f}"
+    if len(pts) == 4:
+        x1, y1, x2, y2 = pts
+        call = f"draw.Line({x1:.2f}, {y1:.2f}, {x2:.2f}, {y2:.2f}, {attr_str}{_rotation(rec)})"
+    else:
+        coord_str = ", ".join(f"{v:.2f}" for v in pts)
+        call = f"draw.Lines({coord_str}, {attr_str}{_rotation(rec)})"
+    return [f"    _line = {call}", f"    {rec.container}.append(_line)", ""]
+
+
+def _format_text(rec: ShapeRecord) -> list[str]:
+    attrs = [f"fill='{rec.fill}'"]
+    if rec.fill_opacity < 1.0:
+        attrs.append(f"fill_opacity={rec.fill_opacity:.2f}")
+    attr_str = ", ".join(attrs)
+    baseline = rec.y + rec.h
+    # repr() quotes and escapes the text, so quotes and backslashes in it
+    # still give valid code.
+    return [
+        f"    _text = draw.Text({rec.text!r}, {rec.font_size:.2f}, {rec.x:.2f}, {baseline:.2f}, {attr_str}{_rotation(rec)})",
+        f"    {rec.container}.append(_text)",
+        "",
+    ]
+
+
+def _format_group(rec: ShapeRecord) -> list[str]:
+    transform = f"translate({rec.x:.2f} {rec.y:.2f})"
+    if abs(rec.angle) > 1e-6:
+        transform += f" rotate({rec.angle:.2f} {rec.cx:.2f} {rec.cy:.2f})"
+    return [
+        f"    {rec.text} = draw.Group(transform='{transform}')",
+        f"    {rec.container}.append({rec.text})",
+        "",
+    ]
+
+
+_FORMATTERS = {
+    "Rectangle": _format_rect,
+    "Ellipse": _format_ellipse,
+    "Circle": _format_circle,
+    "Triangle": _format_triangle,
+    "Line": _format_line,
+    "Arrow": _format_line,
+    "Text": _format_text,
+    "Group": _format_group,
+}
+
+
+def format_record(rec: ShapeRecord) -> str:
+    """Return the drawsvg code fragment (lines joined by newlines) for rec."""
+    return "\n".join(_FORMATTERS[rec.shape](rec))
+
+
+def format_records(records) -> list[str]:
+    """Format a chunk of records; used as the process pool entry point."""
+    return [format_record(rec) for rec in records]
+
+
+def _is_plain_line(rec: ShapeRecord) -> bool:
+    return (
+        rec.shape in ("Line", "Arrow")
+        and not rec.arrow_start
+        and not rec.arrow_end
+        and abs(rec.angle) <= 1e-6
+    )
+
+
+def line_runs(records) -> list[tuple[int, int]]:
+    """Return (start, stop) ranges of adjacent lines that can share one path.
+
+    Only unrotated, marker-free lines with the same stroke color and width
+    in the same group are merged, and only when nothing else lies between
+    them in z-order, so the stacking order of the drawing is preserved.
+    """
+    runs = []
+    start = 0
+    n = len(records)
+    while start < n:
+        rec = records[start]
+        stop = start + 1
+        if _is_plain_line(rec):
+            style = (rec.stroke, round(rec.stroke_width, 2), rec.container)
+            while (
+                stop < n
+                and _is_plain_line(records[stop])
+                and (
+                    records[stop].stroke,
+                    round(records[stop].stroke_width, 2),
+                    records[stop].container,
+                ) == style
+            ):
+                stop += 1
+            if stop - start >= 2:
+                runs.append((start, stop))
+        start = stop
+    return runs
+
+
+def format_line_run(records) -> str:
+    """Format several plain lines as one draw.Path with an M/L subpath each."""
+    first = records[0]
+    subpaths = []
+    for rec in records:
+        pts = rec.points
+        subpaths.append(
+            "M " + " L ".join(f"{pts[i]:.2f} {pts[i+1]:.2f}" for i in range(0, len(pts), 2))
+        )
+    path_cmd = " ".join(subpaths)
+    return "\n".join([
+        f"    _path = draw.Path('{path_cmd}', stroke='{first.stroke}', stroke_width={first.stroke_width:.2f}, fill='none')",
+        f"    {first.container}.append(_path)",
+        "",
+    ])
+
+
+def instance_key(rec: ShapeRecord) -> tuple | None:
+    """Fingerprint of rec's geometry and style, independent of its placement.
+
+    Values are rounded to the precision of the generated code, so shapes
+    that would export identically up to translation and rotation share a
+    key. Lines with markers and groups are never instanced.
+    """
+    if rec.arrow_start or rec.arrow_end or rec.shape == "Group":
+        return None
+    rel = tuple(
+        round(v - (rec.x if i % 2 == 0 else rec.y), 2) for i, v in enumerate(rec.points)
+    )
+    fill_opacity = round(rec.fill_opacity, 2) if rec.fill is not None else None
+    return (
+        "Line" if rec.shape == "Arrow" else rec.shape,
+        round(rec.w, 2), round(rec.h, 2), round(rec.rx, 2), round(rec.ry, 2),
+        rel, rec.text, round(rec.font_size, 2),
+        rec.fill, fill_opacity, rec.stroke, round(rec.stroke_width, 2),
+    )
+
+
+class ExportPlan(NamedTuple):
+    """Optimisations decided for one export, computed from records only."""
+
+    runs: list[tuple[int, int]]  # merged line runs as (start, stop)
+    symbols: list[int]  # index of the record whose geometry defines each symbol
+    instances: dict[int, int]  # record index -> symbol number
+
+    def skipped(self) -> set[int]:
+        """Indices whose standalone fragment is not part of the output."""
+        out = set(self.instances)
+        for start, stop in self.runs:
+            out.update(range(start, stop))
+        return out
+
+
+def plan_export(
+    records, coalesce_lines: bool = False, instance_symbols: bool = False, links=()
+) -> ExportPlan:
+    """Decide which lines to merge and which shapes to emit as symbols.
+
+    links gives, per record, a number shared by shapes linked as copies of
+    each other, or 0. Linked shapes take the fingerprint of the first of
+    them without being compared again; the others are fingerprinted with
+    instance_key().
+    """
+    runs = line_runs(records) if coalesce_lines else []
+    symbols: list[int] = []
+    instances: dict[int, int] = {}
+    if instance_symbols:
+        merged = set()
+        for start, stop in runs:
+            merged.update(range(start, stop))
+        groups: dict[tuple, list[int]] = {}
+        link_keys: dict[int, tuple | None] = {}
+        for i, rec in enumerate(records):
+            if i in merged:
+                continue
+            link = links[i] if links else 0
+            if not link:
+                key = instance_key(rec)
+            elif link in link_keys:
+                key = link_keys[link]
+            else:
+                key = link_keys[link] = instance_key(rec)
+            if key is not None:
+                groups.setdefault(key, []).append(i)
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            number = len(symbols)
+            symbols.append(members[0])
+            for i in members:
+                instances[i] = number
+    return ExportPlan(runs, symbols, instances)
+
+
+def format_symbol_def(number: int, rec: ShapeRecord) -> str:
+    """Format rec's geometry, moved to the origin, as a reusable definition."""
+    name = f"_sym{number}"
+    if rec.shape == "Rectangle":
+        attrs = _fill_stroke_attrs(rec)
+        if rec.rx:
+            attrs.append(f"rx={rec.rx:.2f}")
+        if rec.ry:
+            attrs.append(f"ry={rec.ry:.2f}")
+        call = f"draw.Rectangle(0.00, 0.00, {rec.w:.2f}, {rec.h:.2f}, {', '.join(attrs)})"
+    elif rec.shape == "Ellipse":
+        attr_str = ", ".join(_fill_stroke_attrs(rec))
+        call = f"draw.Ellipse({rec.w / 2.0:.2f}, {rec.h / 2.0:.2f}, {rec.w / 2.0:.2f}, {rec.h / 2.0:.2f}, {attr_str})"
+    elif rec.shape == "Circle":
+        attr_str = ", ".join(_fill_stroke_attrs(rec))
+        call = f"draw.Circle({rec.w / 2.0:.2f}, {rec.h / 2.0:.2f}, {(rec.w + rec.h) / 4.0:.2f}, {attr_str})"
+    elif rec.shape == "Text":
+        attrs = [f"fill='{rec.fill}'"]
+        if rec.fill_opacity < 1.0:
+            attrs.append(f"fill_opacity={rec.fill_opacity:.2f}")
+        call = f"draw.Text({rec.text!r}, {rec.font_size:.2f}, 0.00, {rec.h:.2f}, {', '.join(attrs)})"
+    else:  # Triangle and lines
+        coord_str = ", ".join(
+            f"{v - (rec.x if i % 2 == 0 else rec.y):.2f}" for i, v in enumerate(rec.points)
+        )
+        if rec.shape == "Triangle":
+            call = f"draw.Lines({coord_str}, close=True, {', '.join(_fill_stroke_attrs(rec))})"
+        else:
+            call = f"draw.Lines({coord_str}, stroke='{rec.stroke}', stroke_width={rec.stroke_width:.2f})"
+    # An explicit id is required: drawsvg only generates ids for elements it
+    # collects into <defs> itself, not for ones added with append_def.
+    call = f"{call[:-1]}, id='sym{number}')"
+    return "\n".join([f"    {name} = {call}", f"    d.append_def({name})", ""])
+
+
+def format_use(number: int, rec: ShapeRecord) -> str:
+    """Format a reference to symbol number placed and rotated like rec."""
+    return "\n".join([
+        f"    _use = draw.Use(_sym{number}, {rec.x:.2f}, {rec.y:.2f}{_rotation(rec)})",
+        f"    {rec.container}.append(_use)",
+        "",
+    ])
+
+
+def _rigid_apply(t: tuple[float, float, float], x: float, y: float) -> tuple[float, float]:
+    angle, tx, ty = t
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    return c * x - s * y + tx, s * x + c * y + ty
+
+
+def flatten_groups(records) -> list[ShapeRecord]:
+    """Replace group records by their members placed in drawing coordinates.
+
+    Group transforms are rigid, so each member keeps its own shape and only
+    gains the group's rotation about its mapped rotation centre.
+    """
+    # group variable -> (angle, tx, ty) mapping its coordinates to the drawing's
+    placements: dict[str, tuple[float, float, float]] = {}
+    out = []
+    for rec in records:
+        parent = placements.get(rec.container)
+        if rec.shape == "Group":
+            c = math.cos(math.radians(rec.angle))
+            s = math.sin(math.radians(rec.angle))
+            # translate(x y) rotate(angle cx cy)
+            local = (
+                rec.angle,
+                rec.x + rec.cx - (c * rec.cx - s * rec.cy),
+                rec.y + rec.cy - (s * rec.cx + c * rec.cy),
+            )
+            if parent is not None:
+                tx, ty = _rigid_apply(parent, local[1], local[2])
+                local = (parent[0] + local[0], tx, ty)
+            placements[rec.text] = local
+            continue
+        if parent is None:
+            out.append(rec)
+            continue
+        cx, cy = _rigid_apply(parent, rec.cx, rec.cy)
+        dx = cx - rec.cx
+        dy = cy - rec.cy
+        out.append(rec._replace(
+            x=rec.x + dx, y=rec.y + dy, angle=rec.angle + parent[0], cx=cx, cy=cy,
+            points=tuple(v + (dx if i % 2 == 0 else dy) for i, v in enumerate(rec.points)),
+            container="d",
+        ))
+    return out
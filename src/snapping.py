@@ -0,0 +1,112 @@
+from PySide6 import QtCore, QtWidgets
+
+from spatial_index import GridIndex
+
+# Snap distance in screen pixels; converted to scene units per drag.
+SNAP_TOLERANCE_PX = 8.0
+
+
+def snap_lines(item: QtWidgets.QGraphicsItem) -> tuple[tuple[float, ...], tuple[float, ...]]:
+    """x and y coordinates other shapes can snap to: bounding box edges and
+    centre, plus the vertices of lines."""
+    r = item.sceneBoundingRect()
+    xs = [r.left(), r.center().x(), r.right()]
+    ys = [r.top(), r.center().y(), r.bottom()]
+    points = getattr(item, "_points", None)
+    if points is not None:
+        for p in points:
+            sp = item.mapToScene(p)
+            xs.append(sp.x())
+            ys.append(sp.y())
+    return tuple(xs), tuple(ys)
+
+
+def _best_offset(sources, targets, tol: float) -> float | None:
+    """Smallest target - source offset within tol, or None."""
+    best = None
+    for s in sources:
+        for t in targets:
+            d = t - s
+            if abs(d) <= tol and (best is None or abs(d) < abs(best)):
+                best = d
+    return best
+
+
+class SnapSession:
+    """Object snapping for one drag gesture.
+
+    Nearby shapes come from the scene's incrementally maintained GridIndex,
+    so a query only looks at the cells around the moving bounds. Their snap
+    lines are cached for the rest of the gesture, since nothing but the
+    dragged items moves meanwhile. All dragged items share one offset, so a
+    multi-selection keeps its layout.
+    """
+
+    def __init__(self, index: GridIndex, items, tolerance: float):
+        self._index = index
+        self._tolerance = tolerance
+        self._start = {it: QtCore.QPointF(it.pos()) for it in items}
+        bounds = QtCore.QRectF()
+        for it in items:
+            bounds = bounds.united(it.sceneBoundingRect())
+        self._bounds = bounds
+        self._targets: dict = {}
+        self._last_delta = None
+        self._last_offset = (None, None)
+
+    def __contains__(self, item) -> bool:
+        return item in self._start
+
+    def _nearby(self, rect: QtCore.QRectF):
+        tol = self._tolerance
+        box = (rect.left() - tol, rect.top() - tol, rect.right() + tol, rect.bottom() + tol)
+        targets = self._targets
+        for it in self._index.query(box):
+            if it in self._start:
+                continue
+            lines = targets.get(it)
+            if lines is None:
+                lines = targets[it] = snap_lines(it)
+            yield lines
+
+    def offset(self, rect: QtCore.QRectF) -> tuple[float | None, float | None]:
+        """Correction (dx, dy) that snaps rect to nearby shapes; None for an
+        axis with nothing in range."""
+        xs = (rect.left(), rect.center().x(), rect.right())
+        ys = (rect.top(), rect.center().y(), rect.bottom())
+        dx = dy = None
+        tol = self._tolerance
+        for txs, tys in self._nearby(rect):
+            d = _best_offset(xs, txs, tol)
+            if d is not None and (dx is None or abs(d) < abs(dx)):
+                dx = d
+            d = _best_offset(ys, tys, tol)
+            if d is not None and (dy is None or abs(d) < abs(dy)):
+                dy = d
+        return dx, dy
+
+    def snap(self, item, pos: QtCore.QPointF, grid_size: float) -> QtCore.QPointF:
+        """Snapped position for a dragged item; axes without an object to
+        snap to fall back to the grid."""
+        start = self._start[item]
+        delta = (pos.x() - start.x(), pos.y() - start.y())
+        if delta != self._last_delta:
+            self._last_delta = delta
+            self._last_offset = self.offset(self._bounds.translated(*delta))
+        dx, dy = self._last_offset
+        if dx is None:
+            x = round(pos.x() / grid_size) * grid_size
+        else:
+            x = pos.x() + dx
+        if dy is None:
+            y = round(pos.y() / grid_size) * grid_size
+        else:
+            y = pos.y() + dy
+        return QtCore.QPointF(x, y)
+
+    def snap_point(self, pos: QtCore.QPointF, grid_size: float) -> QtCore.QPointF:
+        """Snap a single scene point, e.g. a line vertex being dragged."""
+        dx, dy = self.offset(QtCore.QRectF(pos, pos))
+        x = round(pos.x() / grid_size) * grid_size if dx is None else pos.x() + dx
+        y = round(pos.y() / grid_size) * grid_size if dy is None else pos.y() + dy
+        return QtCore.QPointF(x, y)
@@ -0,0 +1,103 @@
+import math
+
+# Side of a grid cell in scene units. A few default-sized shapes per cell
+# keeps both the per-item insert cost and the per-query candidate count low.
+DEFAULT_CELL_SIZE = 256.0
+
+
+class GridIndex:
+    """Uniform grid hash of axis-aligned boxes.
+
+    Boxes are (x0, y0, x1, y1) tuples stored under any hashable key. Every
+    key is listed in each cell its box overlaps, so inserts, removals and
+    updates only touch those cells and a query only visits the cells under
+    the query box.
+    """
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = float(cell_size)
+        self._cells: dict[tuple[int, int], set] = {}
+        self._boxes: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, key) -> bool:
+        return key in self._boxes
+
+    def box(self, key):
+        return self._boxes.get(key)
+
+    def keys(self):
+        return self._boxes.keys()
+
+    def _cell_range(self, box) -> tuple[int, int, int, int]:
+        s = self.cell_size
+        return (
+            math.floor(box[0] / s),
+            math.floor(box[1] / s),
+            math.floor(box[2] / s),
+            math.floor(box[3] / s),
+        )
+
+    def insert(self, key, box) -> None:
+        """Add key with box, replacing any box it already had."""
+        old = self._boxes.get(key)
+        if old is not None:
+            if old == box:
+                return
+            self.remove(key)
+        self._boxes[key] = box
+        cells = self._cells
+        cx0, cy0, cx1, cy1 = self._cell_range(box)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = {key}
+                else:
+                    bucket.add(key)
+
+    update = insert
+
+    def remove(self, key) -> None:
+        box = self._boxes.pop(key, None)
+        if box is None:
+            return
+        cells = self._cells
+        cx0, cy0, cx1, cy1 = self._cell_range(box)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del cells[(cx, cy)]
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._boxes.clear()
+
+    def query(self, box) -> set:
+        """Keys whose boxes overlap box (edges touching count)."""
+        x0, y0, x1, y1 = box
+        cx0, cy0, cx1, cy1 = self._cell_range(box)
+        cells = self._cells
+        found = set()
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(cells):
+            # Query larger than the occupied area: walk the cells instead.
+            for (cx, cy), bucket in cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    found.update(bucket)
+        else:
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket:
+                        found.update(bucket)
+        boxes = self._boxes
+        return {
+            k for k in found
+            if boxes[k][0] <= x1 and boxes[k][2] >= x0
+            and boxes[k][1] <= y1 and boxes[k][3] >= y0
+        }
@@ -0,0 +1,208 @@
+import numpy as np
+from PySide6 import QtCore
+
+from document import ShapeRow
+from item_pool import ROW_TYPES, new_item
+
+# Drawings with at least this many shapes are loaded virtualized when the
+# canvas has a Virtualizer.
+VIRTUAL_THRESHOLD = 20000
+# Items are kept for this much of the visible area's size around it, so
+# short pans don't create items at the border every frame.
+VIEW_MARGIN = 0.5
+
+
+class RowStandIn:
+    """Holds the z-order key of a document row that has no item."""
+
+    __slots__ = ("document", "row")
+
+    def __init__(self, document, row: int):
+        self.document = document
+        self.row = row
+
+    def zValue(self) -> float:
+        return float(self.document.z[self.row])
+
+    def setZValue(self, z: float) -> None:
+        self.document.z[self.row] = z
+
+
+class Virtualizer(QtCore.QObject):
+    """Keeps items only for the document rows near the visible part of the
+    scene's views.
+
+    Rows passed to load() stay plain document rows until they come into
+    view. Items leaving the view are detached from their row and released to
+    the scene's item pool for reuse by the next rows that scroll in. Selected and focused items stay;
+    an item that has been edited is handed over to the scene for good, so
+    undo commands never refer to a recycled item.
+    """
+
+    def __init__(self, scene, margin: float = VIEW_MARGIN):
+        super().__init__(scene)
+        self._scene = scene
+        self._margin = margin
+        self._stand_ins: dict[int, RowStandIn] = {}
+        # Items created here, with their revision when they were placed.
+        self._managed: dict = {}
+        # Covers every row without an item; grows as items are retired.
+        self.bounds = QtCore.QRectF()
+        self.created = 0
+        self.recycled = 0
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.refresh)
+
+    def row_count(self) -> int:
+        """Number of shapes that currently have no item."""
+        return len(self._stand_ins)
+
+    def summary(self) -> str:
+        return (
+            f"Virtualized canvas: {len(self._managed)} live items, "
+            f"{self.row_count()} shapes without an item, "
+            f"{self.created} items created, {self.recycled} recycled"
+        )
+
+    def load(self, rows) -> None:
+        """Add shapes as document rows without creating items for them."""
+        document = self._scene.document
+        self.load_rows([document.add_row(row) for row in rows])
+
+    def load_rows(self, indices) -> None:
+        """Take over document rows that have no item, e.g. ones added with
+        Document.add_columns()."""
+        indices = np.asarray(indices, dtype=np.int64)
+        document = self._scene.document
+        zorder = self._scene.zorder
+        stand_ins = self._stand_ins
+        for index in indices.tolist():
+            stand_in = RowStandIn(document, index)
+            zorder.insert(stand_in)
+            stand_ins[index] = stand_in
+        if len(indices):
+            b = document.scene_bounds(indices)
+            self.bounds = self.bounds.united(QtCore.QRectF(
+                QtCore.QPointF(b[:, 0].min(), b[:, 1].min()),
+                QtCore.QPointF(b[:, 2].max(), b[:, 3].max()),
+            ))
+        self.schedule()
+
+    def clear(self) -> None:
+        """Drop all rows without an item."""
+        document = self._scene.document
+        zorder = self._scene.zorder
+        for index, stand_in in self._stand_ins.items():
+            zorder.discard(stand_in)
+            document.remove_row(index)
+        self._stand_ins.clear()
+        self._managed.clear()
+        self.bounds = QtCore.QRectF()
+
+    def materialize_rows(self, indices, for_good: bool = True) -> list:
+        """Create items for the given rows without an item.
+
+        With for_good, the items are handed to the scene for good, e.g. so
+        an undo command can hold them; otherwise they are retired like the
+        others once they are out of view and neither selected nor focused.
+        """
+        items = []
+        with self._scene.bulk_update():
+            for index in np.asarray(indices, dtype=np.int64).tolist():
+                item = self._materialize(index)
+                if for_good:
+                    del self._managed[item]
+                items.append(item)
+        return items
+
+    def schedule(self) -> None:
+        """Refresh once control returns to the event loop."""
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _visible_boxes(self) -> list[tuple[float, float, float, float]]:
+        """Visible area of each view with its margin, as (x0, y0, x1, y1).
+
+        Views are kept apart: one box around two distant views would cover
+        everything between them.
+        """
+        boxes = []
+        for view in self._scene.views():
+            r = view.mapToScene(view.viewport().rect()).boundingRect()
+            if r.isNull():
+                continue
+            mx = r.width() * self._margin
+            my = r.height() * self._margin
+            r = r.adjusted(-mx, -my, mx, my)
+            boxes.append((r.left(), r.top(), r.right(), r.bottom()))
+        return boxes
+
+    def refresh(self) -> None:
+        """Create items for rows that came into view and retire the ones
+        that left it."""
+        scene = self._scene
+        document = scene.document
+        boxes = self._visible_boxes()
+        if not boxes:
+            return
+        retire = []
+        for item, revision in list(self._managed.items()):
+            if item.scene() is not scene or item.revision() != revision:
+                del self._managed[item]
+            elif not (item.isSelected() or item.hasFocus()):
+                retire.append(item)
+        if retire:
+            b = document.scene_bounds(document.rows_of(retire))
+            outside = np.ones(len(retire), dtype=bool)
+            for x0, y0, x1, y1 in boxes:
+                outside &= (b[:, 0] > x1) | (b[:, 2] < x0) | (b[:, 1] > y1) | (b[:, 3] < y0)
+            retire = [it for it, out in zip(retire, outside.tolist()) if out]
+        rows = np.unique(np.concatenate([document.rows_in_box(box) for box in boxes]))
+        show = [index for index in rows.tolist() if index in self._stand_ins]
+        if not retire and not show:
+            return
+        with scene.bulk_update():
+            for item in retire:
+                self._retire(item)
+            for index in show:
+                self._materialize(index)
+
+    def materialize_all(self) -> None:
+        """Create items for every row, e.g. before virtualization is
+        switched off."""
+        with self._scene.bulk_update():
+            for index in list(self._stand_ins):
+                self._materialize(index)
+        self._managed.clear()
+
+    def _materialize(self, index: int):
+        scene = self._scene
+        document = scene.document
+        row: ShapeRow = document.row(index)
+        cls = ROW_TYPES[row.shape]
+        item = scene.item_pool.take(cls)
+        if item is not None:
+            self.recycled += 1
+        else:
+            item = new_item(cls)
+            self.created += 1
+        item.apply_row(row)
+        scene.zorder.discard(self._stand_ins.pop(index))
+        document.bind(item, index)
+        scene.addItem(item)
+        self._managed[item] = item.revision()
+        return item
+
+    def _retire(self, item) -> None:
+        scene = self._scene
+        document = scene.document
+        del self._managed[item]
+        self.bounds = self.bounds.united(item.sceneBoundingRect())
+        index = document.unbind(item)
+        scene.removeItem(item)
+        stand_in = RowStandIn(document, index)
+        scene.zorder.insert(stand_in)
+        self._stand_ins[index] = stand_in
+        scene.item_pool.release([item])
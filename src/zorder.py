@@ -0,0 +1,152 @@
+import bisect
+
+from PySide6 import QtWidgets
+
+# Distance between neighbouring keys after a rebalance. Moving an item puts
+# it at the midpoint of a gap, so each gap absorbs ~50 moves before the keys
+# have to be spread out again.
+Z_STEP = 1.0
+
+
+class ZOrder:
+    """Stacking order of the shapes in a scene, stored as sparse z keys.
+
+    Every registered item has a unique zValue() that doubles as its key.
+    Moving an item picks a key between its new neighbours, so only the
+    moved items get a new zValue; the whole order is renumbered only when
+    a gap runs out of float precision.
+
+    Besides items, any object with zValue() and setZValue() can hold a key,
+    e.g. a stand-in for a shape that currently has no item.
+    """
+
+    def __init__(self):
+        self._keys: list[float] = []
+        self._items: dict[float, QtWidgets.QGraphicsItem] = {}
+        self._stand_ins = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def entries(self) -> list:
+        """Registered items and stand-ins, bottom first."""
+        items = self._items
+        return [items[k] for k in self._keys]
+
+    def items(self) -> list[QtWidgets.QGraphicsItem]:
+        """Registered items, bottom first."""
+        entries = self.entries()
+        if self._stand_ins:
+            return [it for it in entries if isinstance(it, QtWidgets.QGraphicsItem)]
+        return entries
+
+    def insert(self, item: QtWidgets.QGraphicsItem) -> None:
+        """Register item, keeping its z if free, otherwise placing it on top."""
+        z = item.zValue()
+        if z in self._items:
+            z = self._keys[-1] + Z_STEP
+            item.setZValue(z)
+        bisect.insort(self._keys, z)
+        self._items[z] = item
+        if not isinstance(item, QtWidgets.QGraphicsItem):
+            self._stand_ins += 1
+
+    def discard(self, item: QtWidgets.QGraphicsItem) -> None:
+        z = item.zValue()
+        if self._items.get(z) is item:
+            del self._items[z]
+            del self._keys[bisect.bisect_left(self._keys, z)]
+            if not isinstance(item, QtWidgets.QGraphicsItem):
+                self._stand_ins -= 1
+
+    def _move(self, item, lo: float | None, hi: float | None) -> bool:
+        """Give item a key strictly between lo and hi (None = open end).
+
+        Returns False if the gap is exhausted and a rebalance is needed.
+        """
+        if lo is None and hi is None:
+            z = 0.0
+        elif lo is None:
+            z = hi - Z_STEP
+        elif hi is None:
+            z = lo + Z_STEP
+        else:
+            z = (lo + hi) / 2.0
+            if not lo < z < hi:
+                return False
+        self.discard(item)
+        item.setZValue(z)
+        bisect.insort(self._keys, z)
+        self._items[z] = item
+        return True
+
+    def rebalance(self) -> None:
+        """Spread all keys Z_STEP apart, keeping the order."""
+        items = self.entries()
+        self._keys = [i * Z_STEP for i in range(len(items))]
+        self._items = dict(zip(self._keys, items))
+        for z, it in self._items.items():
+            it.setZValue(z)
+
+    def slot_keys(self, item, n: int) -> list[float]:
+        """n increasing keys for items that are to take item's place, e.g.
+        the members of an ungrouped group; the last is item's own key."""
+        rebalanced = False
+        while True:
+            z = item.zValue()
+            i = bisect.bisect_left(self._keys, z)
+            lo = self._keys[i - 1] if i else z - Z_STEP
+            step = (z - lo) / n
+            keys = [lo + step * (k + 1) for k in range(n - 1)] + [z]
+            if rebalanced or all(a < b for a, b in zip([lo] + keys, keys)):
+                return keys
+            self.rebalance()
+            rebalanced = True
+
+    def top_keys(self, n: int) -> list[float]:
+        """n increasing keys above every registered one, e.g. for pasted
+        items."""
+        top = self._keys[-1] if self._keys else -Z_STEP
+        return [top + Z_STEP * (k + 1) for k in range(n)]
+
+    def _sorted(self, items) -> list[QtWidgets.QGraphicsItem]:
+        return sorted(
+            (it for it in items if self._items.get(it.zValue()) is it),
+            key=lambda it: it.zValue(),
+        )
+
+    def bring_to_front(self, items) -> None:
+        for it in self._sorted(items):
+            self._move(it, self._keys[-1], None)
+
+    def send_to_back(self, items) -> None:
+        for it in reversed(self._sorted(items)):
+            self._move(it, None, self._keys[0])
+
+    def bring_forward(self, items) -> None:
+        """Move each item above the next unselected item above it."""
+        moving = self._sorted(items)
+        ids = {id(it) for it in moving}
+        for it in reversed(moving):
+            while True:
+                i = bisect.bisect_left(self._keys, it.zValue())
+                if i + 1 >= len(self._keys) or id(self._items[self._keys[i + 1]]) in ids:
+                    break
+                hi = self._keys[i + 2] if i + 2 < len(self._keys) else None
+                if self._move(it, self._keys[i + 1], hi):
+                    break
+                self.rebalance()
+
+    def send_backward(self, items) -> None:
+        """Move each item below the next unselected item below it."""
+        moving = self._sorted(items)
+        ids = {id(it) for it in moving}
+        for it in moving:
+            while True:
+                i = bisect.bisect_left(self._keys, it.zValue())
+                if i == 0 or id(self._items[self._keys[i - 1]]) in ids:
+                    break
+                lo = self._keys[i - 2] if i >= 2 else None
+                if self._move(it, lo, self._keys[i - 1]):
+                    break
+                self.rebalance()
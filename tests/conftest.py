@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# Qt widgets are created without a display.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PySide6 import QtWidgets
+
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def view(qapp):
+    from canvas_view import CanvasView
+
+    view = CanvasView()
+    yield view
+    view.deleteLater()
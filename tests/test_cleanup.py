@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from PySide6 import QtWidgets
+
+import import_drawsvg
+from cleanup import find_duplicates, find_hidden
+from cleanup_dialog import CleanupDialog
+from document import ShapeRow
+from scene_api import Scene
+
+
+def test_the_lower_of_two_near_copies_is_a_duplicate():
+    scene = Scene()
+    scene.add_rects([0, 0.3, 100], [0, -0.2, 0], 20, 10)
+    assert find_duplicates(scene.document).tolist() == [0]
+    assert find_duplicates(scene.document, tolerance=0.1).tolist() == []
+
+
+def test_stacks_keep_their_topmost_copy():
+    scene = Scene()
+    scene.add_rects([5, 5, 5, 5], 5, 20, 10)
+    assert find_duplicates(scene.document).tolist() == [0, 1, 2]
+
+
+def test_rotations_are_compared_across_a_full_turn():
+    scene = Scene()
+    scene.add_rects([0, 0], 0, 20, 10, rotation=[359.8, 0.1])
+    assert find_duplicates(scene.document).tolist() == [0]
+
+
+def test_style_and_vertices_must_match():
+    scene = Scene()
+    rects = scene.add_rects([0, 0], 0, 20, 10)
+    scene.set_styles(rects[1:], fill="#ff0000")
+    scene.add_lines([0, 0, 10, 10, 0, 0, 10, 10.2, 0, 0, 10, 13])
+    assert find_duplicates(scene.document).tolist() == [2]
+
+
+def test_groups_are_never_duplicates():
+    scene = Scene()
+    frame = ShapeRow("Group", 0, 0, 10, 10, 0, 5, 5, 0, (0, 0, 10, 10), (None, 1.0, "#000000", 0.0, 0.0))
+    scene.document.add_row(frame)
+    scene.document.add_row(frame._replace(z=1))
+    assert find_duplicates(scene.document).tolist() == []
+
+
+def test_shapes_below_an_opaque_cover_are_hidden():
+    scene = Scene()
+    scene.add_rects([10, 200, 10], [10, 10, 10], [20, 20, 50], [10, 10, 50])
+    cover = scene.add_rects(0, 0, 100, 100)
+    scene.set_styles(cover, fill="#ffffff")
+    assert find_hidden(scene.document).tolist() == [0, 2]
+
+
+def test_only_opaque_shapes_above_hide():
+    scene = Scene()
+    below = scene.add_rects(0, 0, 100, 100)
+    scene.set_styles(below, fill="#ffffff")
+    scene.add_rects([10, 310, 610], 10, 20, 10)
+    faint = scene.add_rects(300, 0, 100, 100)
+    scene.set_styles(faint, fill="#ffffff", fill_opacity=0.5)
+    scene.add_rects(600, 0, 100, 100)
+    assert find_hidden(scene.document).tolist() == []
+    opaque = scene.add_rects(600, 0, 100, 100)
+    scene.set_styles(opaque, fill="#ffffff")
+    assert find_hidden(scene.document).tolist() == [3]
+
+
+def test_round_and_rotated_covers_are_exact():
+    scene = Scene()
+    # A box in the corner of a circle's bounds lies outside the circle.
+    scene.add_rects([0, 40], [0, 40], 10, 10)
+    circle = scene.add_ellipses(-2, -2, 104, 104)
+    # The corner of a square turned by 45 degrees is cut off.
+    scene.add_rects([300, 345], [0, 45], 10, 10)
+    turned = scene.add_rects(300, 0, 100, 100, rotation=45)
+    scene.set_styles(np.concatenate([circle, turned]), fill="#ffffff")
+    assert find_hidden(scene.document).tolist() == [1, 4]
+
+
+@pytest.fixture
+def virtual_view(view, tmp_path, monkeypatch):
+    """A view that opened 2000 shapes virtualized, every tenth one stacked
+    on a copy."""
+    scene = Scene()
+    rng = np.random.default_rng(3)
+    x = rng.uniform(0, 20000, 1800).round()
+    y = rng.uniform(0, 20000, 1800).round()
+    scene.add_rects(np.concatenate([x, x[:200]]), np.concatenate([y, y[:200]]), 20, 20)
+    path = tmp_path / "shapes.dsvc"
+    scene.save(str(path))
+    monkeypatch.setattr(import_drawsvg, "VIRTUAL_THRESHOLD", 1000)
+    monkeypatch.setattr(
+        QtWidgets.QFileDialog, "getOpenFileName", staticmethod(lambda *a, **k: (str(path), ""))
+    )
+    view.scene().set_virtualized(True)
+    import_drawsvg.open_shapes_file(view.scene())
+    return view
+
+
+def test_clean_up_remove_is_undoable_on_a_virtualized_drawing(virtual_view):
+    scene = virtual_view.scene()
+    document = scene.document
+    assert scene.virtualizer.row_count() == 2000
+    duplicates = find_duplicates(document)
+    assert len(duplicates) == 200
+
+    CleanupDialog(virtual_view).remove()
+    assert len(document.live_rows()) == 1800
+    assert len(find_duplicates(document)) == 0
+    assert scene.undo_stack.canUndo()
+
+    scene.undo_stack.undo()
+    assert len(document.live_rows()) == 2000
+    assert len(find_duplicates(document)) == 200
+    scene.undo_stack.redo()
+    assert len(document.live_rows()) == 1800
+
+
+def test_select_reaches_shapes_without_an_item(virtual_view):
+    scene = virtual_view.scene()
+    CleanupDialog(virtual_view).select()
+    assert len(scene.selectedItems()) == 200
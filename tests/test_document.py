@@ -0,0 +1,95 @@
+import numpy as np
+from PySide6 import QtCore, QtGui
+
+from document import ARROW_END, FREE, Document, ShapeRow
+from export_drawsvg import snapshot_item
+from items import EllipseItem, LineItem, RectItem, TextItem, TriangleItem
+
+STYLE = (None, 1.0, "#222222", 2.0, 0.0)
+
+
+def _line(x: float, y: float, points, flags: int = 0) -> ShapeRow:
+    return ShapeRow("Line", x, y, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, (0.0, 0.0, 1.0, 1.0), STYLE,
+                    points=tuple(points), flags=flags)
+
+
+def _points(document: Document, row: int) -> tuple:
+    return document.row(row).points
+
+
+def test_rows_keep_their_points():
+    document = Document()
+    a = document.add_row(_line(0, 0, (0, 0, 10, 10)))
+    b = document.add_row(_line(5, 5, (1, 2, 3, 4, 5, 6)))
+    assert _points(document, a) == (0, 0, 10, 10)
+    assert _points(document, b) == (1, 2, 3, 4, 5, 6)
+    assert document.pts_len[b] == 6
+
+
+def test_edits_reuse_or_move_a_row_points():
+    document = Document()
+    owner = object()
+    a = document.add(owner, _line(0, 0, (0, 0, 10, 10, 20, 0)))
+    b = document.add_row(_line(0, 0, (7, 7, 8, 8)))
+    start = document.pts_start[a]
+    document.write(owner, _line(0, 0, (1, 1, 2, 2)))
+    assert document.pts_start[a] == start
+    document.write(owner, _line(0, 0, tuple(range(10))))
+    assert _points(document, a) == tuple(range(10))
+    assert _points(document, b) == (7, 7, 8, 8)
+
+
+def test_arena_is_compacted_instead_of_growing_without_bound():
+    document = Document()
+    owner = object()
+    rows = [document.add(owner, _line(0, 0, (0, 0, 1, 1)))]
+    rows += [document.add_row(_line(0, 0, (k, k, k + 1, k + 1))) for k in range(1, 20)]
+    for n in range(1, 400):
+        # Each longer vertex list leaves the previous slots behind.
+        document.write(owner, _line(0, 0, tuple(float(v) for v in range(2 * (n % 8 + 2)))))
+    assert len(document.points) <= 4 * (20 * 4 + 2 * 9)
+    for k, row in enumerate(rows[1:], 1):
+        assert _points(document, row) == (k, k, k + 1, k + 1)
+
+
+def test_removed_rows_free_their_slot_and_points():
+    document = Document()
+    a = document.add_row(_line(0, 0, (0, 0, 10, 10)))
+    b = document.add_row(_line(0, 0, (1, 1, 2, 2)))
+    document.remove_row(a)
+    assert document.kind[a] == FREE
+    assert document.live_rows().tolist() == [b]
+    assert document.add_row(_line(0, 0, (3, 3, 4, 4))) == a
+
+
+def test_records_translate_points_to_the_scene():
+    document = Document()
+    row = document.add_row(_line(100, 50, (0, 0, 10, 20), flags=ARROW_END))
+    (record,) = document.records([row])
+    assert record.points == (100, 50, 110, 70)
+    assert record.arrow_end and not record.arrow_start
+    assert document.records(np.zeros(0, dtype=np.int64)) == []
+
+
+def test_records_match_the_items(view):
+    scene = view.scene()
+    rect = RectItem(10, 20, 100, 50, 5, 5)
+    rect.setBrush(QtGui.QColor("#ff0000"))
+    points = [QtCore.QPointF(0, 0), QtCore.QPointF(50, 20), QtCore.QPointF(80, 0)]
+    items = [
+        (rect, "Rectangle"),
+        (EllipseItem(0, 100, 80, 40), "Ellipse"),
+        (EllipseItem(100, 100, 60, 60), "Circle"),
+        (TriangleItem(200, 100, 60, 40), "Triangle"),
+        (LineItem(0, 240, points=points), "Line"),
+        (LineItem(0, 300, 120, arrow_end=True), "Arrow"),
+        (TextItem(300, 300, 100, 30), "Text"),
+    ]
+    for k, (item, shape) in enumerate(items):
+        item.setData(0, shape)
+        item.setRotation(10.0 * k)
+        scene.addItem(item)
+    items = [item for item, _ in items]
+    items[-1].setPlainText("Hello")
+    document = scene.document
+    assert document.records(document.rows_of(items)) == [snapshot_item(it) for it in items]
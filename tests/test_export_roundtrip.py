@@ -0,0 +1,123 @@
+import re
+
+import pytest
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from canvas_view import CanvasView
+from drawsvg_code import generate_drawsvg_code
+from export_drawsvg import snapshot_scene
+from import_drawsvg import import_drawsvg_py
+from items import EllipseItem, GroupItem, LineItem, RectItem, TextItem, TriangleItem
+
+
+def _add(scene, item, shape, rotation=0.0):
+    item.setData(0, shape)
+    item.setRotation(rotation)
+    scene.addItem(item)
+    return item
+
+
+def _populate(scene):
+    rect = _add(scene, RectItem(10, 20, 100, 50, 5, 5), "Rectangle")
+    rect.setBrush(QtGui.QColor("#ff0000"))
+    _add(scene, RectItem(200, 20, 100, 50), "Rectangle", 30)
+    _add(scene, EllipseItem(0, 100, 80, 40), "Ellipse")
+    _add(scene, EllipseItem(100, 100, 60, 60), "Circle", 10)
+    _add(scene, TriangleItem(200, 100, 60, 40), "Triangle")
+    # Consecutive plain lines of one style, which coalesce_lines merges.
+    for k in range(3):
+        _add(scene, LineItem(0, 200 + 20 * k, 100), "Line")
+    points = [QtCore.QPointF(0, 0), QtCore.QPointF(50, 20), QtCore.QPointF(80, 0)]
+    _add(scene, LineItem(0, 280, points=points), "Line", 15)
+    _add(scene, LineItem(0, 320, 120, arrow_end=True), "Arrow")
+    text = _add(scene, TextItem(300, 300, 100, 30), "Text")
+    text.setPlainText("Hello")
+    # Identical shapes up to placement, which instance_symbols shares.
+    for k in range(3):
+        copy = _add(scene, RectItem(500 + 40 * k, 200, 30, 20), "Rectangle", 45 * k)
+        copy.setBrush(QtGui.QColor("#00aa00"))
+    for k, words in enumerate(("it's", 'say "hi"', "back\\slash")):
+        quoted = _add(scene, TextItem(300, 340 + 40 * k, 100, 30), "Text")
+        quoted.setPlainText(words)
+    group = GroupItem(400, 40)
+    for k in range(2):
+        member = RectItem(0, 0, 20, 10)
+        member.setData(0, "Rectangle")
+        group.add_member(member, 30 * k, 5, 0.0, float(k))
+    group.update_bounds()
+    group.setRotation(20)
+    scene.addItem(group)
+    return scene
+
+
+def _export(scene, **options):
+    code = generate_drawsvg_code(snapshot_scene(scene, **options))
+    # Group variables are named after item uids; number them in order.
+    names = {}
+    return re.sub(r"\b_g\d+\b", lambda m: names.setdefault(m.group(), f"_g{len(names)}"), code)
+
+
+def _reimport(code, tmp_path, monkeypatch):
+    path = tmp_path / "drawing.py"
+    path.write_text(code, encoding="utf-8")
+    monkeypatch.setattr(
+        QtWidgets.QFileDialog, "getOpenFileName", staticmethod(lambda *a, **k: (str(path), ""))
+    )
+    monkeypatch.setattr(
+        QtWidgets.QMessageBox, "critical", staticmethod(lambda parent, title, text: pytest.fail(text))
+    )
+    view = CanvasView()
+    import_drawsvg_py(view.scene())
+    return view
+
+
+OPTIONS = [
+    {},
+    {"coalesce_lines": True},
+    {"instance_symbols": True},
+    {"coalesce_lines": True, "instance_symbols": True},
+]
+
+
+@pytest.mark.parametrize("options", OPTIONS)
+def test_export_import_export_is_identical(view, tmp_path, monkeypatch, options):
+    code = _export(_populate(view.scene()), **options)
+    again = _reimport(code, tmp_path, monkeypatch)
+    assert _export(again.scene(), **options) == code
+
+
+@pytest.mark.parametrize("options", OPTIONS)
+def test_exported_code_builds_a_drawing(view, options):
+    code = _export(_populate(view.scene()), **options)
+    namespace = {}
+    exec(compile(code, "drawing.py", "exec"), namespace)
+    assert "<svg" in namespace["build_drawing"]().as_svg()
+
+
+def test_coalesce_lines_merges_the_line_run(view):
+    scene = _populate(view.scene())
+    plain = _export(scene)
+    merged = _export(scene, coalesce_lines=True)
+    assert merged.count("draw.Path(") == plain.count("draw.Path(") + 1
+    assert plain.count("draw.Line(") - merged.count("draw.Line(") == 3
+
+
+def test_instance_symbols_share_repeated_shapes(view):
+    code = _export(_populate(view.scene()), instance_symbols=True)
+    symbol = re.search(r"(_sym\d+) = draw\.Rectangle\([^\n]*fill='#00aa00'", code).group(1)
+    assert code.count(f"draw.Use({symbol},") == 3
+
+
+def test_linked_copies_export_like_matched_ones(view):
+    scene = _populate(view.scene())
+    symbols = _export(scene, instance_symbols=True).count("d.append_def(")
+    source = next(it for it in scene.items() if isinstance(it, TriangleItem))
+    for k in range(2):
+        clone = view._clone_item(source)
+        clone.setPos(source.pos() + QtCore.QPointF(0, 100 + 60 * k))
+        scene.addItem(clone)
+    snapshot = snapshot_scene(scene, instance_symbols=True)
+    assert len({link for link in snapshot.links if link}) == 1
+    code = generate_drawsvg_code(snapshot)
+    assert code == generate_drawsvg_code(snapshot._replace(links=()))
+    assert code.count("d.append_def(") == symbols + 1
@@ -0,0 +1,56 @@
+from commands import AddItemsCommand, RemoveItemsCommand
+from item_pool import ItemPool
+from items import EllipseItem, RectItem
+
+
+def _take_all(pool: ItemPool, cls) -> list:
+    taken = []
+    item = pool.take(cls)
+    while item is not None:
+        taken.append(item)
+        item = pool.take(cls)
+    return taken
+
+
+def test_an_item_released_twice_is_pooled_once(qapp):
+    pool = ItemPool()
+    rect = RectItem(0, 0, 10, 10)
+    pool.release([rect])
+    pool.release([rect])
+    assert pool.size() == 1
+    assert pool.take(RectItem) is rect
+    assert pool.take(RectItem) is None
+
+
+def test_take_never_hands_out_an_object_twice(qapp):
+    pool = ItemPool()
+    rects = [RectItem(0, 0, 10, 10) for _ in range(5)]
+    ellipse = EllipseItem(0, 0, 10, 10)
+    pool.release(rects + rects[::2] + [ellipse, ellipse])
+    pool.release(rects[1:3])
+    taken = _take_all(pool, RectItem)
+    assert len(taken) == len({id(it) for it in taken}) == 5
+    assert _take_all(pool, EllipseItem) == [ellipse]
+
+
+def test_an_item_taken_again_can_be_released_again(qapp):
+    pool = ItemPool()
+    rect = RectItem(0, 0, 10, 10)
+    pool.release([rect])
+    assert pool.take(RectItem) is rect
+    pool.release([rect])
+    assert pool.take(RectItem) is rect
+
+
+def test_dropped_undo_commands_pool_shared_items_once(view):
+    scene = view.scene()
+    rect = RectItem(0, 0, 10, 10)
+    rect.setData(0, "Rectangle")
+    scene.add_items([rect])
+    # Three commands hold the same removed item.
+    scene.undo_stack.push(RemoveItemsCommand(scene, [rect]))
+    scene.undo_stack.push(AddItemsCommand(scene, [rect]))
+    scene.undo_stack.push(RemoveItemsCommand(scene, [rect]))
+    assert rect.scene() is None
+    scene.undo_stack.clear()
+    assert _take_all(scene.item_pool, RectItem) == [rect]
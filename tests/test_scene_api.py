@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from PySide6 import QtWidgets
+
+from drawsvg_code import generate_drawsvg_code
+from export_drawsvg import snapshot_scene
+from import_drawsvg import open_shapes_file
+from scene_api import Scene
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+
+
+def _scene() -> Scene:
+    scene = Scene()
+    rects = scene.add_rects([0, 40, 80], 10, [20, 30, 40], 15, rotation=[0, 30, 0], rx=[0, 0, 4])
+    scene.add_ellipses(0, 100, 50, 25)
+    lines = scene.add_lines([[0, 200], [50, 220], [100, 200], [0, 250], [60, 250]], counts=[3, 2])
+    scene.add_lines([0, 300, 80, 300], arrow_end=True)
+    scene.set_styles(rects, fill=["#ff0000", None, "#00ff00"], stroke_width=3)
+    scene.set_styles(lines, stroke="#0000ff")
+    return scene
+
+
+def test_scene_api_runs_without_qt(tmp_path):
+    script = (
+        "import sys\n"
+        "from scene_api import Scene\n"
+        "scene = Scene()\n"
+        "scene.add_rects(range(10), 0, 5, 5)\n"
+        "scene.add_lines([0, 0, 10, 10])\n"
+        f"scene.save({str(tmp_path / 'shapes.dsvc')!r})\n"
+        "assert 'draw.Rectangle(' in scene.export_drawsvg()\n"
+        "assert not [m for m in sys.modules if m.startswith('PySide6')]\n"
+    )
+    env = dict(os.environ, PYTHONPATH=SRC)
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_shapes_and_styles_land_in_the_document():
+    scene = _scene()
+    document = scene.document
+    assert len(scene) == len(document.live_rows()) == 7
+    assert [document.kind_of(r) for r in range(7)] == [
+        "Rectangle", "Rectangle", "Rectangle", "Ellipse", "Line", "Line", "Arrow",
+    ]
+    assert [document.row(r).style[0] for r in range(3)] == ["#ff0000", None, "#00ff00"]
+    assert {document.row(r).style[3] for r in range(3)} == {3.0}
+    assert document.row(4).points == (0, 200, 50, 220, 100, 200)
+    assert document.z[:7].tolist() == list(range(7))
+
+
+def test_saved_scene_exports_like_the_editor(view, tmp_path, monkeypatch):
+    scene = _scene()
+    path = tmp_path / "shapes.dsvc"
+    scene.save(str(path))
+    monkeypatch.setattr(
+        QtWidgets.QFileDialog, "getOpenFileName", staticmethod(lambda *a, **k: (str(path), ""))
+    )
+    monkeypatch.setattr(
+        QtWidgets.QMessageBox, "critical", staticmethod(lambda parent, title, text: pytest.fail(text))
+    )
+    open_shapes_file(view.scene())
+    assert generate_drawsvg_code(snapshot_scene(view.scene())) == scene.export_drawsvg()
+
+
+@pytest.mark.parametrize("call", [
+    lambda scene: scene.add_lines([0, 0, 10]),
+    lambda scene: scene.add_lines([0, 0, 10, 10, 20, 20], counts=2),
+    lambda scene: scene.add_lines([0, 0, 10, 10], counts=[1, 1]),
+    lambda scene: scene.set_styles(scene.add_rects([0, 1], 0, 1, 1), fill=["#ff0000"]),
+])
+def test_bad_columns_are_rejected(call):
+    with pytest.raises(ValueError):
+        call(Scene())
+
+
+def test_columns_broadcast_scalars():
+    scene = Scene()
+    rows = scene.add_rects(np.arange(4.0), 7, 2, 3)
+    assert rows.tolist() == [0, 1, 2, 3]
+    assert scene.document.y[rows].tolist() == [7.0] * 4
+    assert scene.bounds() == (-1.0, 6.0, 6.0, 11.0)
@@ -0,0 +1,63 @@
+import pytest
+
+from document import ARROW_START, Document, ShapeRow
+from shape_data import add_packed, pack_rows, unpack, unpack_rows
+
+STYLE = ("#ff0000", 0.5, "#222222", 2.0, 0.0)
+TEXT_STYLE = ("#000000", 1.0, "#222222", 2.0, 14.0)
+
+
+def _document() -> tuple[Document, list[int]]:
+    document = Document()
+    rows = [
+        ShapeRow("Rectangle", 10, 20, 100, 50, 30, 50, 25, 0, (-1, -1, 102, 52), STYLE, rx=5, ry=4),
+        ShapeRow("Arrow", 0, 0, 0, 0, 0, 40, 10, 1, (-11, -11, 102, 42), STYLE,
+                 points=(0, 0, 80, 20), flags=ARROW_START),
+        ShapeRow("Triangle", 5, 6, 60, 40, 0, 30, 20, 2, (0, 0, 60, 40), STYLE,
+                 points=(30, 0, 60, 40, 0, 40)),
+        ShapeRow("Text", 300, 300, 100, 30, 0, 50, 15, 3, (0, 0, 100, 30), TEXT_STYLE,
+                 text="it's \"quoted\"\nü"),
+    ]
+    return document, [document.add_row(row) for row in rows]
+
+
+def test_pack_and_unpack_give_the_same_rows():
+    document, rows = _document()
+    unpacked, parents = unpack_rows(pack_rows(document, rows))
+    assert unpacked == [document.row(r) for r in rows]
+    assert parents == [-1] * len(rows)
+
+
+def test_group_members_follow_with_their_parent():
+    document, rows = _document()
+    member = ShapeRow("Ellipse", 1, 2, 3, 4, 0, 1.5, 2, 0, (0, 0, 3, 4), STYLE)
+    unpacked, parents = unpack_rows(pack_rows(document, rows[:1], [member, member], [0, 0]))
+    assert unpacked == [document.row(rows[0]), member, member]
+    assert parents == [-1, 0, 0]
+    assert unpack(pack_rows(document, rows[:1], [member], [0])).has_groups()
+
+
+def test_packed_rows_can_be_added_to_another_document():
+    document, rows = _document()
+    other = Document()
+    added = add_packed(other, unpack(pack_rows(document, rows)))
+    assert [other.row(r) for r in added.tolist()] == [document.row(r) for r in rows]
+    assert other.records(added) == document.records(rows)
+
+
+def test_groups_cannot_be_added_as_rows():
+    document, rows = _document()
+    member = document.row(rows[0])
+    with pytest.raises(ValueError):
+        add_packed(Document(), unpack(pack_rows(document, rows[:1], [member], [0])))
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: b"XXXX" + data[4:],
+    lambda data: data[:10],
+    lambda data: data[:-8],
+])
+def test_other_data_is_rejected(damage):
+    document, rows = _document()
+    with pytest.raises(ValueError):
+        unpack(damage(pack_rows(document, rows)))
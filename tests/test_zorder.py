@@ -0,0 +1,108 @@
+from PySide6 import QtWidgets
+
+from zorder import Z_STEP, ZOrder
+
+
+class Key:
+    """Holds a z key like the stand-ins of virtualized shapes."""
+
+    def __init__(self, z: float):
+        self.z = z
+
+    def zValue(self) -> float:
+        return self.z
+
+    def setZValue(self, z: float) -> None:
+        self.z = z
+
+
+def _order(*entries) -> ZOrder:
+    zorder = ZOrder()
+    for entry in entries:
+        zorder.insert(entry)
+    return zorder
+
+
+def _assert_consistent(zorder: ZOrder) -> None:
+    keys = [entry.zValue() for entry in zorder.entries()]
+    assert keys == sorted(set(keys))
+    assert len(keys) == len(zorder)
+
+
+def test_insert_keeps_free_keys_and_puts_taken_ones_on_top():
+    a, b, c = Key(5.0), Key(1.0), Key(5.0)
+    zorder = _order(a, b, c)
+    assert zorder.entries() == [b, a, c]
+    assert c.zValue() == 5.0 + Z_STEP
+
+
+def test_moves_only_touch_the_moved_entries():
+    a, b, c, d = Key(0.0), Key(1.0), Key(2.0), Key(3.0)
+    zorder = _order(a, b, c, d)
+    zorder.bring_to_front([a])
+    zorder.send_to_back([d])
+    assert zorder.entries() == [d, b, c, a]
+    assert (b.zValue(), c.zValue()) == (1.0, 2.0)
+    zorder.bring_forward([b])
+    zorder.send_backward([a])
+    assert zorder.entries() == [d, c, a, b]
+    _assert_consistent(zorder)
+
+
+def test_exhausted_gaps_are_rebalanced(monkeypatch):
+    calls = []
+    rebalance = ZOrder.rebalance
+
+    def counted(self):
+        calls.append(self)
+        rebalance(self)
+
+    monkeypatch.setattr(ZOrder, "rebalance", counted)
+    a, b, c = Key(0.0), Key(1.0), Key(2.0)
+    zorder = _order(a, b, c)
+    # Each move halves the gap below c until float precision runs out.
+    for _ in range(100):
+        zorder.bring_forward([zorder.entries()[0]])
+    assert calls
+    assert zorder.entries() == [a, b, c]
+    _assert_consistent(zorder)
+
+
+def test_rebalance_spreads_keys_and_keeps_the_order():
+    entries = [Key(k / 1000.0) for k in range(5)]
+    zorder = _order(*reversed(entries))
+    zorder.rebalance()
+    assert zorder.entries() == entries
+    assert [e.zValue() for e in entries] == [k * Z_STEP for k in range(5)]
+
+
+def test_slot_keys_fit_below_the_item():
+    a, b = Key(0.0), Key(1.0)
+    zorder = _order(a, b)
+    keys = zorder.slot_keys(b, 4)
+    assert keys[-1] == b.zValue()
+    assert a.zValue() < keys[0] < keys[1] < keys[2] < keys[3]
+
+
+def test_slot_keys_rebalance_a_narrow_gap():
+    a, b = Key(0.0), Key(5e-324)
+    zorder = _order(a, b)
+    keys = zorder.slot_keys(b, 3)
+    assert a.zValue() < keys[0] < keys[1] < keys[2] == b.zValue()
+
+
+def test_top_keys_are_above_everything():
+    zorder = _order(Key(0.0), Key(7.5))
+    assert zorder.top_keys(3) == [7.5 + Z_STEP, 7.5 + 2 * Z_STEP, 7.5 + 3 * Z_STEP]
+    assert ZOrder().top_keys(1) == [0.0]
+
+
+def test_items_skip_stand_ins(qapp):
+    item = QtWidgets.QGraphicsRectItem()
+    item.setZValue(1.0)
+    stand_in = Key(0.0)
+    zorder = _order(item, stand_in)
+    assert zorder.entries() == [stand_in, item]
+    assert zorder.items() == [item]
+    zorder.discard(stand_in)
+    assert zorder.items() == zorder.entries() == [item]